@@ -0,0 +1,168 @@
+# Generators of synthetic Python corpora, each stressing a different shape of input.
+# Every generator returns a dict of relative file path -> source, and is deterministic.
+import random
+
+def generate_function(name: str, rng: random.Random) -> list[str]:
+    a = str(rng.randint(1, 100));
+    b = str(rng.randint(1, 100));
+
+    return [
+        "def " + name + "(target, amount):",
+        "    \"Applies amount to target\"",
+        "    health = target.Health - amount * " + a,
+        "    if health < " + b + ":",
+        "        dead = True",
+        "    else:",
+        "        dead = False",
+        "    for i in range(amount):",
+        "        print(i, len(target.Children))",
+        "    return health",
+    ];
+
+# Lots of small modules, like a typical place split into many scripts
+def many_small_modules(files: int = 400, functions: int = 4, seed: int = 1) -> dict[str, str]:
+    rng = random.Random(seed);
+    corpus = {};
+
+    for i in range(files):
+        lines = [];
+        for j in range(functions):
+            lines.extend(generate_function("f" + str(j), rng));
+        lines.append("result = f0(workspace.Part, " + str(i) + ")");
+
+        folder = ["server", "client", "shared"][i % 3];
+        suffix = {"server": ".server.py", "client": ".client.py", "shared": ".py"}[folder];
+        corpus[folder + "/module_" + str(i) + suffix] = "\n".join(lines) + "\n";
+
+    return corpus;
+
+# A single module with thousands of functions
+def huge_module(functions: int = 3000, seed: int = 2) -> dict[str, str]:
+    rng = random.Random(seed);
+    lines = [];
+
+    for j in range(functions):
+        lines.extend(generate_function("f" + str(j), rng));
+
+    return { "shared/huge.py": "\n".join(lines) + "\n" };
+
+# Blocks nested close to the parser's indentation limit, many times over
+def deep_nesting(depth: int = 90, repeats: int = 40) -> dict[str, str]:
+    lines = [];
+
+    for r in range(repeats):
+        lines.append("def nested_" + str(r) + "(x):");
+        for level in range(1, depth + 1):
+            indent = "    " * level;
+            keyword = ["if x > " + str(level) + ":", "while x < " + str(level) + ":", "for i in range(" + str(level) + "):"][level % 3];
+            lines.append(indent + keyword);
+            lines.append(indent + "    y = x + " + str(level));
+        lines.append("    " * (depth + 1) + "print(y)");
+
+    return { "shared/deep.py": "\n".join(lines) + "\n" };
+
+# Long chains of binary operators and calls
+def long_expressions(statements: int = 300, terms: int = 150, seed: int = 3) -> dict[str, str]:
+    rng = random.Random(seed);
+    lines = [];
+
+    for i in range(statements):
+        parts = [];
+        for t in range(terms):
+            parts.append(rng.choice(["a", "b", "c", "f(a)", str(rng.randint(1, 9))]));
+        operators = [rng.choice([" + ", " - ", " * "]) for _ in range(terms - 1)];
+        expression = parts[0] + "".join(operators[t] + parts[t + 1] for t in range(terms - 1));
+        lines.append("v" + str(i) + " = " + expression);
+
+    return { "shared/expressions.py": "\n".join(lines) + "\n" };
+
+# Code made mostly of list comprehensions and generator expressions
+def comprehension_heavy(functions: int = 500) -> dict[str, str]:
+    lines = [];
+
+    for j in range(functions):
+        lines.extend([
+            "def c" + str(j) + "(items):",
+            "    doubled = [x * 2 for x in items]",
+            "    positive = [x for x in doubled if x > 0]",
+            "    total = sum(x * x for x in positive)",
+            "    squares = [y * y for y in range(" + str(j % 50 + 1) + ")]",
+            "    return total",
+        ]);
+
+    return { "shared/comprehensions.py": "\n".join(lines) + "\n" };
+
+# Large functions whose variables are first assigned inside branches, so all of them get hoisted
+def branch_locals(functions: int = 20, variables: int = 400) -> dict[str, str]:
+    lines = [];
+
+    for j in range(functions):
+        lines.append("def b" + str(j) + "(flag):");
+        lines.append("    \"Every variable is declared at the top of the function\"");
+        for v in range(variables):
+            lines.append("    if flag > " + str(v) + ":");
+            lines.append("        local_" + str(v) + " = flag * " + str(v));
+        lines.append("    return flag");
+
+    return { "shared/branch_locals.py": "\n".join(lines) + "\n" };
+
+# Thousands of locals and calls in one module, stresses name lookups during emission
+def many_locals(variables: int = 4000) -> dict[str, str]:
+    lines = ["def helper(a):", "    \"Returns a\"", "    return a", "def main(seed):"];
+
+    for v in range(variables):
+        lines.append("    value_" + str(v) + " = helper(seed + " + str(v) + ")");
+        if v % 10 == 0: lines.append("    help(helper)");
+
+    lines.append("    return seed");
+
+    return { "shared/many_locals.py": "\n".join(lines) + "\n" };
+
+# A single expression of 100k terms, as one run of operators and as one and/or chain
+def huge_expressions(terms: int = 100000, seed: int = 4) -> dict[str, str]:
+    rng = random.Random(seed);
+    parts = [rng.choice(["a", "b", "f(a)", str(rng.randint(1, 9))]) + rng.choice([" + ", " - "]) for _ in range(terms - 1)];
+    conditions = ["a > " + str(t) for t in range(terms)];
+
+    lines = [
+        "a = 1",
+        "b = 2",
+        "def f(x):",
+        "    return x",
+        "total = " + "".join(parts) + "a",
+        "ready = " + " and ".join(conditions),
+    ];
+
+    return { "shared/huge_expressions.py": "\n".join(lines) + "\n" };
+
+# Constructs nested 1,000 deep. Python's parser stops at 100 indented blocks and 200 brackets, so the depth comes
+# from what nests without either: elif chains, conditional expressions, unary operators and attribute chains
+def deep_chains(depth: int = 1000) -> dict[str, str]:
+    lines = ["def classify(x, a):"];
+
+    lines.append("    if x == 0:");
+    lines.append("        return 0");
+    for level in range(1, depth):
+        lines.append("    elif x == " + str(level) + ":");
+        lines.append("        return " + str(level));
+
+    lines.append("    label = " + "".join(str(level) + " if x < " + str(level) + " else " for level in range(depth)) + "-1");
+    lines.append("    flag = " + "not " * depth + "x");
+    lines.append("    negative = " + "-" * depth + "x");
+    lines.append("    value = a" + "".join(".child" if level % 2 == 0 else "[" + str(level) + "]" for level in range(depth)));
+    lines.append("    nested = " + "[" * 190 + "x" + "]" * 190);
+    lines.append("    return label");
+
+    return { "shared/deep_chains.py": "\n".join(lines) + "\n" };
+
+corpora = {
+    "many_small_modules": many_small_modules,
+    "huge_module": huge_module,
+    "deep_nesting": deep_nesting,
+    "long_expressions": long_expressions,
+    "comprehension_heavy": comprehension_heavy,
+    "branch_locals": branch_locals,
+    "many_locals": many_locals,
+    "huge_expressions": huge_expressions,
+    "deep_chains": deep_chains,
+};
@@ -0,0 +1,53 @@
+# Shows that emitting a module is linear in its size: the time per KB of output
+# should stay flat as the module grows.
+# Run from the repository root: python -m benchmarks.emitter
+from src.roblox_py.util import transpilation as transpilation_util
+
+import ast
+import time
+
+def generate_module(functions: int) -> str:
+    lines = [];
+
+    for i in range(functions):
+        lines.append("def function_" + str(i) + "(a, b):");
+        lines.append("    c = a + b * " + str(i));
+        lines.append("    if c > 10:");
+        lines.append("        d = [a, b, c]");
+        lines.append("        while d:");
+        lines.append("            c = c - 1");
+        lines.append("    for x in range(c):");
+        lines.append("        print(x, len(d))");
+        lines.append("    return c");
+
+    return "\n".join(lines) + "\n";
+
+def measure(functions: int, repeats: int = 3) -> tuple[float, int]:
+    module = ast.parse(generate_module(functions));
+    best = None;
+    output = "";
+
+    for _ in range(repeats):
+        start_time = time.perf_counter();
+        output = transpilation_util.transpile_module(module);
+        elapsed = time.perf_counter() - start_time;
+
+        if best is None or elapsed < best: best = elapsed;
+
+    return best, len(output);
+
+def main():
+    print("functions  output KB      ms   us/KB");
+
+    per_kb = [];
+
+    for functions in [250, 500, 1000, 2000, 4000, 8000]:
+        elapsed, size = measure(functions);
+        per_kb.append(elapsed * 1e6 / (size / 1024));
+        print(str(functions).rjust(9) + str(round(size / 1024)).rjust(11) + str(round(elapsed * 1000, 1)).rjust(8) + str(round(per_kb[-1], 1)).rjust(8));
+
+    # Linear scaling keeps this close to 1, quadratic scaling would make it grow with the size ratio (32x)
+    print("cost per KB, largest / smallest module: " + str(round(per_kb[-1] / per_kb[0], 2)));
+
+if __name__ == "__main__":
+    main();
@@ -0,0 +1,131 @@
+# Runs every corpus of benchmarks/corpora.py through the transpiler and records throughput and peak memory.
+# Run from the repository root:
+#   python -m benchmarks.suite --output results.json                  measure and save the results
+#   python -m benchmarks.suite --baseline baseline.json               also fail (exit code 1) on regressions
+#   python -m benchmarks.suite --baseline baseline.json --threshold 0.1
+from src.roblox_py.transpiler import transpiler
+from . import corpora
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+def write_corpus(corpus: dict[str, str], folder: str) -> None:
+    for relative_name in corpus:
+        full_name = os.path.join(folder, relative_name);
+        os.makedirs(os.path.dirname(full_name), exist_ok=True);
+
+        with open(full_name, "w") as f:
+            f.write(corpus[relative_name]);
+
+# A full build of the corpus: transpile, write the outputs and ropy.lua. Repeats build into the same
+# output folder, so after the first only outputs that changed are written, like rebuilding a synced project
+def transpile_corpus(folder: str, workers: int) -> None:
+    build = transpiler.transpile_folder(os.path.join(folder, "source"), os.path.join(folder, "output"), workers);
+
+    for full_name in build["errors"]:
+        raise RuntimeError("corpus failed to transpile: " + build["errors"][full_name]);
+
+def run_benchmark(name: str, workers: int, repeats: int) -> dict:
+    corpus = corpora.corpora[name]();
+    files = len(corpus);
+    loc = sum(source.count("\n") for source in corpus.values());
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_corpus(corpus, os.path.join(folder, "source"));
+
+        best = None;
+
+        for _ in range(repeats):
+            start_time = time.perf_counter();
+            transpile_corpus(folder, workers);
+            elapsed = time.perf_counter() - start_time;
+
+            if best is None or elapsed < best: best = elapsed;
+
+        # Memory is measured in a separate run, tracing slows everything down
+        tracemalloc.start();
+        transpile_corpus(folder, 1);
+        _, peak = tracemalloc.get_traced_memory();
+        tracemalloc.stop();
+
+    return {
+        "files": files,
+        "loc": loc,
+        "seconds": best,
+        "files_per_second": files / best,
+        "loc_per_second": loc / best,
+        "peak_memory_bytes": peak,
+    };
+
+# Compare results to a baseline, returns a description of every regression past threshold
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = [];
+
+    for name in results["benchmarks"]:
+        if name not in baseline.get("benchmarks", {}): continue;
+
+        now = results["benchmarks"][name];
+        before = baseline["benchmarks"][name];
+
+        # Throughput should not drop, memory should not grow
+        if now["loc_per_second"] < before["loc_per_second"] * (1 - threshold):
+            regressions.append(name + ": " + str(round(now["loc_per_second"])) + " LOC/s, baseline " + str(round(before["loc_per_second"])) + " LOC/s");
+
+        if now["peak_memory_bytes"] > before["peak_memory_bytes"] * (1 + threshold):
+            regressions.append(name + ": peak memory " + str(now["peak_memory_bytes"]) + " B, baseline " + str(before["peak_memory_bytes"]) + " B");
+
+    return regressions;
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="roblox-py transpiler benchmarks");
+    parser.add_argument("--output", help="file to write the JSON results to (default: stdout)");
+    parser.add_argument("--baseline", help="JSON results to compare against");
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (default: 0.2)");
+    parser.add_argument("--workers", type=int, default=1, help="processes used for multi-file corpora");
+    parser.add_argument("--repeats", type=int, default=3, help="runs per benchmark, the fastest one counts");
+    parser.add_argument("--only", nargs="*", choices=list(corpora.corpora), help="benchmarks to run");
+    arguments = parser.parse_args(argv);
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": arguments.workers,
+        "benchmarks": {},
+    };
+
+    for name in arguments.only or corpora.corpora:
+        result = run_benchmark(name, arguments.workers, arguments.repeats);
+        results["benchmarks"][name] = result;
+
+        print(name.ljust(22) + str(round(result["files_per_second"], 1)).rjust(10) + " files/s" +
+            str(round(result["loc_per_second"])).rjust(10) + " LOC/s" +
+            str(round(result["peak_memory_bytes"] / 1024 / 1024, 1)).rjust(8) + " MB peak", file=sys.stderr);
+
+    report = json.dumps(results, indent=1, sort_keys=True);
+
+    if arguments.output is None:
+        print(report);
+    else:
+        with open(arguments.output, "w") as f:
+            f.write(report);
+
+    if arguments.baseline is None: return 0;
+
+    with open(arguments.baseline) as f:
+        baseline = json.load(f);
+
+    regressions = find_regressions(results, baseline, arguments.threshold);
+
+    for regression in regressions:
+        print("Regression: " + regression, file=sys.stderr);
+
+    return 1 if len(regressions) > 0 else 0;
+
+if __name__ == "__main__":
+    sys.exit(main());
@@ -1,3 +1,5 @@
 from src.roblox_py.main import main
 
-main();
\ No newline at end of file
+# Guard is required so worker processes don't re-run the build when they import this file
+if __name__ == "__main__":
+    main();
@@ -0,0 +1,40 @@
+from .transpiler import transpiler
+from .transpiler import runtime as runtime_util
+from .util import minify as minify_util
+
+from typing import Iterable, Iterator
+
+# Transpiling without the filesystem: source text in, Luau out. Nothing here reads ropy.json, the
+# current working directory or any file other than the transpiler's own.
+#
+#   luau, diagnostics = transpile("print(1)")
+#   for path, luau, diagnostics in transpile_many(pairs, workers=4): upload(path, luau)
+#
+# diagnostics is a list of messages, luau is None when the source couldn't be transpiled. options are the
+# same as a build's: "release", "rename_locals", "source_maps", "inline_budget" (see transpiler.transpile_source for the map).
+
+def get_diagnostics(attempt: dict) -> list[str]:
+    return [attempt["error"]] if "error" in attempt else [];
+
+# Transpile one module's source, path only names it in diagnostics
+def transpile(source: str, path: str = "<string>", options: dict | None = None) -> tuple[str | None, list[str]]:
+    attempt = transpiler.transpile_source(source, path, None, options);
+
+    return (attempt.get("result"), get_diagnostics(attempt));
+
+# Transpile (path, source) pairs, yielding (path, luau, diagnostics) for each as soon as it's done.
+# sources is read lazily, and with several workers results come in the order they finish in
+def transpile_many(sources: Iterable[tuple[str, str]], workers: int = 1, options: dict | None = None) -> Iterator[tuple[str, str | None, list[str]]]:
+    for attempt in transpiler.transpile_sources(sources, workers, options):
+        yield (attempt["path"], attempt.get("result"), get_diagnostics(attempt));
+
+# The ropy.lua that a set of outputs needs, with only the runtime members they use
+def get_runtime(outputs: Iterable[str], release: bool = False) -> str:
+    references = set();
+
+    for luau in outputs:
+        references.update(match.group(0) for match in runtime_util.member_pattern.finditer(luau));
+
+    runtime = runtime_util.build_runtime(references);
+
+    return minify_util.minify(runtime) if release else runtime;
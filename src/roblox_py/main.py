@@ -1,10 +1,49 @@
 from ..roblox_py.transpiler import transpiler
+from ..roblox_py.transpiler import manifest
+from ..roblox_py.transpiler import watch
+from ..roblox_py.transpiler import remap
+from ..roblox_py.transpiler import streams
+from ..roblox_py.transpiler import function_cache
+from ..roblox_py.passes import inlining
+from ..roblox_py.util import profiling
 import os
+import sys
 import json
 import time
+import argparse
 
 settings = {};
 
+# Optional ropy.json settings and their default values
+default_settings = {
+    "workers": 1,
+    "sourceMaps": False,
+    "release": False,
+    "renameLocals": False,
+    # Megabytes the function cache can take up in .ropy, 0 turns it off
+    "functionCacheSize": function_cache.default_cache_size // (1024 * 1024),
+    # How big (in expression nodes) a function can be to be inlined into its callers, 0 turns inlining off
+    "inlineBudget": inlining.default_budget,
+};
+
+def parse_arguments(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="ropy", description="Python to Roblox's Luau transpiler");
+    parser.add_argument("command", nargs="?", choices=["build", "watch", "remap"], default="build", help="build once, keep rebuilding changed files, or rewrite Roblox locations into Python ones");
+    parser.add_argument("report", nargs="?", default=None, help="remap: the stack trace or profiler export to rewrite (default: stdin)");
+    parser.add_argument("--workers", type=int, default=None, help="amount of processes to transpile with (overrides ropy.json)");
+    parser.add_argument("--rebuild", action="store_true", help="ignore the build manifest and transpile every file");
+    parser.add_argument("--debounce", type=int, default=50, help="watch: milliseconds to wait for a burst of changes to settle");
+    parser.add_argument("--poll", action="store_true", help="watch: poll for changes instead of using inotify");
+    parser.add_argument("--source-maps", action="store_true", default=None, help="write a source map next to every output (overrides ropy.json)");
+    parser.add_argument("--release", action="store_true", default=None, help="minify the outputs: no indentation, comments or redundant semicolons (overrides ropy.json)");
+    parser.add_argument("--rename-locals", action="store_true", default=None, help="release: also shorten the names of locals (overrides ropy.json)");
+    stream = parser.add_mutually_exclusive_group();
+    stream.add_argument("--stdin", action="store_true", help="transpile Python from stdin to Luau on stdout, without ropy.json");
+    stream.add_argument("--tar", action="store_true", help="transpile a tar stream of .py files from stdin to a tar stream of .lua files (and ropy.lua) on stdout, without ropy.json");
+    parser.add_argument("--profile", nargs="?", const="ropy-profile.json", default=None, metavar="REPORT", help="time phases, node handlers and files, and write a JSON report (default: ropy-profile.json); combine with --rebuild to profile every file");
+
+    return parser.parse_args(argv);
+
 def get_settings():
     # Check if the current folder has a "ropy.json" file in it
     if not os.path.isfile("ropy.json"):
@@ -26,7 +65,7 @@ def get_settings():
 
     # Reject any foreign settings
     for setting in settings:
-        if setting not in ["outDirectory", "inDirectory"]:
+        if setting not in ["outDirectory", "inDirectory"] + list(default_settings):
             print("Error: " + setting + " is not a valid setting");
             exit();
 
@@ -38,13 +77,41 @@ def get_settings():
     if not os.path.isdir(settings["outDirectory"]):
         print("Error: " + settings["outDirectory"] + " is not a valid directory");
         exit();
+
+    # Fill in the optional settings
+    for setting in default_settings:
+        if setting not in settings:
+            settings[setting] = default_settings[setting];
+
+    if not isinstance(settings["workers"], int) or settings["workers"] < 1:
+        print("Error: workers must be a positive integer");
+        exit();
+
+    if not isinstance(settings["functionCacheSize"], int) or isinstance(settings["functionCacheSize"], bool) or settings["functionCacheSize"] < 0:
+        print("Error: functionCacheSize must be a whole number of megabytes (0 turns the cache off)");
+        exit();
+
+    if not isinstance(settings["inlineBudget"], int) or isinstance(settings["inlineBudget"], bool) or settings["inlineBudget"] < 0:
+        print("Error: inlineBudget must be a whole number of expression nodes (0 turns inlining off)");
+        exit();
+
+    for setting in ["sourceMaps", "release", "renameLocals"]:
+        if not isinstance(settings[setting], bool):
+            print("Error: " + setting + " must be true or false");
+            exit();
     
     return settings;
 
-def transpile(folderOrigin: str, folderDestination: str):
+def transpile(folderOrigin: str, folderDestination: str, workers: int = 1, rebuild: bool = False, profile: str | None = None, output_options: dict | None = None):
     start_time = int(round(time.time() * 1000))
 
-    transpilations = transpiler.transpile_folder(folderOrigin, folderDestination)
+    options = { "profile": profile is not None };
+    if output_options is not None: options.update(output_options);
+
+    transpilations = transpiler.transpile_folder(folderOrigin, folderDestination, workers, manifest.default_manifest_path, rebuild, options)
+
+    if profile is not None:
+        write_profile(transpilations["profile"], profile);
 
     transpilation_results = transpilations["results"];
     transpilation_errors = transpilations["errors"];
@@ -62,8 +129,116 @@ def transpile(folderOrigin: str, folderDestination: str):
             empty += 1;
             continue;
 
-    print("Successfully transpiled " + str(len(transpilation_results)) + " files (" + str(empty) + " of which were empty) in " + str(int(round(time.time() * 1000)) - start_time) + " ms");
+    print_sizes(transpilations["sizes"]);
+    print_dead_code(transpilations["dead_code"]);
+    print_inlined(transpilations["inlined"]);
+
+    if "function_cache" in transpilations:
+        cache = transpilations["function_cache"];
+        print("Function cache: " + str(cache["hits"]) + " hits, " + str(cache["misses"]) + " misses, " + str(cache["evicted"]) + " entries evicted");
+
+    print("Successfully transpiled " + str(len(transpilation_results)) + " files (" + str(empty) + " of which were empty, " + str(len(transpilations["skipped"])) + " unchanged files skipped, " + str(len(transpilations["written"])) + " outputs written) in " + str(int(round(time.time() * 1000)) - start_time) + " ms");
+
+# How much release builds saved, per file and in total
+def print_sizes(sizes: dict[str, dict]):
+    if len(sizes) == 0: return;
+
+    before = 0;
+    after = 0;
+
+    for file in sorted(sizes):
+        size = sizes[file];
+        before = before + size["before"];
+        after = after + size["after"];
+
+        print(file + ": " + str(size["before"]) + " -> " + str(size["after"]) + " bytes (" + str(size["before"] - size["after"]) + " saved)");
+
+    print("Release output is " + str(before - after) + " bytes (" + str(round((before - after) * 100 / max(before, 1))) + "%) smaller");
+
+# How much dead code elimination removed, per file and in total
+def print_dead_code(dead_code: dict[str, int]):
+    if len(dead_code) == 0: return;
+
+    for file in sorted(dead_code):
+        print(file + ": " + str(dead_code[file]) + " bytes of dead code eliminated");
+
+    print("Eliminated " + str(sum(dead_code.values())) + " bytes of dead code in " + str(len(dead_code)) + " files");
+
+# How many calls to small functions were inlined, per file and in total
+def print_inlined(inlined: dict[str, int]):
+    if len(inlined) == 0: return;
+
+    for file in sorted(inlined):
+        print(file + ": " + str(inlined[file]) + " call sites inlined");
+
+    print("Inlined " + str(sum(inlined.values())) + " call sites in " + str(len(inlined)) + " files");
+
+def write_profile(report: dict, report_path: str):
+    profiler = profiling.Profiler();
+    profiler.merge(report);
+
+    print(profiler.summary());
+
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True);
+
+    print("Profile written to " + report_path);
+
+def remap_report(folderDestination: str, report_path: str | None):
+    build_manifest = manifest.load_manifest(manifest.default_manifest_path, folderDestination);
+
+    if build_manifest is None or not build_manifest.get("options", {}).get("source_maps"):
+        print("Error: no source maps found, build with --source-maps (or \"sourceMaps\": true in ropy.json) first");
+        exit();
+
+    if report_path is None:
+        report = sys.stdin.read();
+    else:
+        with open(report_path) as f:
+            report = f.read();
+
+    sys.stdout.write(remap.Remapper(build_manifest).remap(report));
+
+def main(argv: list[str] | None = None):
+    arguments = parse_arguments(argv);
+
+    # Streams only take options from the command line, they don't need a project
+    streaming = arguments.stdin or arguments.tar;
+    settings = dict(default_settings) if streaming else get_settings();
+
+    # Command line arguments take precedence over ropy.json
+    if arguments.workers is not None:
+        if arguments.workers < 1:
+            print("Error: --workers must be a positive integer");
+            exit();
+        settings["workers"] = arguments.workers;
+
+    if arguments.source_maps is not None: settings["sourceMaps"] = arguments.source_maps;
+    if arguments.release is not None: settings["release"] = arguments.release;
+    if arguments.rename_locals is not None: settings["renameLocals"] = arguments.rename_locals;
+
+    output_options = { "source_maps": settings["sourceMaps"], "release": settings["release"], "rename_locals": settings["release"] and settings["renameLocals"], "inline_budget": settings["inlineBudget"] };
+
+    # Streams don't have a project to keep the cache in
+    if not streaming and settings["functionCacheSize"] > 0:
+        output_options["function_cache"] = function_cache.default_cache_path;
+        output_options["function_cache_size"] = settings["functionCacheSize"] * 1024 * 1024;
+
+    if arguments.stdin:
+        sys.exit(streams.transpile_stdin(sys.stdin, sys.stdout, sys.stderr, output_options));
+
+    if arguments.tar:
+        sys.exit(streams.transpile_tar(sys.stdin.buffer, sys.stdout.buffer, sys.stderr, settings["workers"], output_options));
+
+    if arguments.command == "remap":
+        remap_report(settings["outDirectory"], arguments.report);
+        return;
+
+    if arguments.command == "watch":
+        try:
+            watch.watch(settings["inDirectory"], settings["outDirectory"], manifest.default_manifest_path, settings["workers"], arguments.debounce / 1000, arguments.poll, output_options);
+        except KeyboardInterrupt:
+            print("Stopped watching");
+        return;
 
-def main():
-    settings = get_settings();
-    transpile(settings["inDirectory"], settings["outDirectory"]);
\ No newline at end of file
+    transpile(settings["inDirectory"], settings["outDirectory"], settings["workers"], arguments.rebuild, arguments.profile, output_options);
\ No newline at end of file
@@ -0,0 +1,321 @@
+import ast
+import math
+import operator
+
+# Folds constant expressions before emission, so that the generated Luau doesn't
+# compute them at runtime (e.g every frame): 60*60*24 -> 86400, "a" + "b" -> "ab",
+# not True -> false, len([1, 2, 3]) -> 3, 1 if True else 2 -> 1, if False: ... -> nothing
+
+# Folded numbers must stay exact as a Luau number (a double)
+max_exact_integer = 2 ** 53;
+# Don't blow up the output with huge strings
+max_string_length = 4096;
+
+binary_operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+};
+
+compare_operators = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+};
+
+def is_number(value: any) -> bool:
+    return (isinstance(value, int) or isinstance(value, float)) and not isinstance(value, bool);
+
+def is_constant(node: ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and (node.value is None or isinstance(node.value, (bool, int, float, str)));
+
+# Whether a folded value can be emitted as a Luau literal without losing anything
+def is_representable(value: any) -> bool:
+    if value is None or isinstance(value, bool): return True;
+    if isinstance(value, str): return len(value) <= max_string_length;
+    if isinstance(value, int): return abs(value) <= max_exact_integer;
+    if isinstance(value, float): return math.isfinite(value);
+
+    return False;
+
+# Whether evaluating node can't have side effects, i.e it can be dropped
+def is_pure(node: ast.AST) -> bool:
+    to_visit = [node];
+
+    while len(to_visit) > 0:
+        node = to_visit.pop();
+
+        if isinstance(node, ast.Constant) or isinstance(node, ast.Name): continue;
+
+        if isinstance(node, ast.List) or isinstance(node, ast.Tuple) or isinstance(node, ast.Set):
+            if any(isinstance(elt, ast.Starred) for elt in node.elts): return False;
+            to_visit.extend(node.elts);
+        elif isinstance(node, ast.Dict):
+            if any(key is None for key in node.keys): return False;
+            to_visit.extend(node.keys);
+            to_visit.extend(node.values);
+        else:
+            return False;
+
+    return True;
+
+def make_constant(value: any, like: ast.AST) -> ast.Constant:
+    return ast.copy_location(ast.Constant(value=value), like);
+
+# Python truthiness of a constant
+def is_truthy(node: ast.Constant) -> bool:
+    return bool(node.value);
+
+# Nodes that never have anything to fold inside them
+leaf_types: set[type] = { ast.Constant, ast.Name, ast.Load, ast.Store, ast.Del, ast.Pass, ast.Global, ast.Nonlocal };
+
+# Walks the tree once with its own stack, folding bottom-up. Handlers are found by node type like in
+# transpilation, rather than through ast.NodeTransformer, which costs more than emitting the module does
+class ConstantFolder:
+    def __init__(self, module: ast.Module):
+        self.module: ast.Module = module;
+        # Builtins that the module redefines can't be folded, only worked out if len() of a literal shows up
+        self.shadowed: set[str] | None = None;
+        self.handlers: dict[type, callable] = {
+            ast.BinOp: self.visit_BinOp,
+            ast.UnaryOp: self.visit_UnaryOp,
+            ast.BoolOp: self.visit_BoolOp,
+            ast.Compare: self.visit_Compare,
+            ast.IfExp: self.visit_IfExp,
+            ast.Call: self.visit_Call,
+            ast.If: self.visit_If,
+            ast.While: self.visit_While,
+        };
+
+    def is_shadowed(self, name: str) -> bool:
+        if self.shadowed is None: self.shadowed = get_shadowed_names(self.module);
+
+        return name in self.shadowed;
+
+    # Fold node and everything in it, children first. Handlers see their children folded already, and return
+    # what replaces the node: itself, another node, or for statements a list of them (or None to drop it)
+    def visit(self, root: ast.AST) -> ast.AST | list[ast.stmt] | None:
+        # Folded node -> what replaces it, until its parent is done and takes it in
+        replaced = {};
+        # Parents that have a replaced child
+        changed = set();
+        # [node, its parent, whether its children are done]
+        stack = [(root, None, False)];
+
+        while len(stack) > 0:
+            node, parent, ready = stack.pop();
+
+            if not ready:
+                stack.append((node, parent, True));
+
+                # Reversed, so children are folded in order
+                for field in reversed(node._fields):
+                    value = getattr(node, field, None);
+
+                    if isinstance(value, list):
+                        for i in range(len(value) - 1, -1, -1):
+                            child = value[i];
+                            if isinstance(child, ast.AST) and child._fields and type(child) not in leaf_types: stack.append((child, node, False));
+                    elif isinstance(value, ast.AST) and value._fields and type(value) not in leaf_types:
+                        stack.append((value, node, False));
+
+                continue;
+
+            if node in changed:
+                self.replace_children(node, replaced);
+                changed.discard(node);
+
+            handler = self.handlers.get(type(node));
+            if handler is None: continue;
+
+            result = handler(node);
+
+            if result is not node:
+                replaced[node] = result;
+                changed.add(parent);
+
+        return replaced.get(root, root);
+
+    # Put what replaced node's children in their place, splicing statements into their list
+    def replace_children(self, node: ast.AST, replaced: dict[ast.AST, ast.AST | list[ast.stmt] | None]) -> None:
+        for field in node._fields:
+            value = getattr(node, field, None);
+
+            if isinstance(value, list):
+                items = [];
+
+                for item in value:
+                    if not (isinstance(item, ast.AST) and item in replaced):
+                        items.append(item);
+                        continue;
+
+                    result = replaced.pop(item);
+
+                    if isinstance(result, list):
+                        items.extend(result);
+                    elif result is not None:
+                        items.append(result);
+
+                setattr(node, field, items);
+            elif isinstance(value, ast.AST) and value in replaced:
+                setattr(node, field, replaced.pop(value));
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        if not (is_constant(node.left) and is_constant(node.right)): return node;
+
+        function = binary_operators.get(type(node.op));
+        if function is None: return node;
+
+        left = node.left.value;
+        right = node.right.value;
+
+        # Only fold what means the same thing in Luau: arithmetic on numbers, and joining or repeating strings
+        if not (is_number(left) and is_number(right)):
+            string_join = isinstance(node.op, ast.Add) and isinstance(left, str) and isinstance(right, str);
+            string_repeat = isinstance(node.op, ast.Mult) and isinstance(left, str) and isinstance(right, int) and not isinstance(right, bool);
+            if not (string_join or string_repeat): return node;
+            if string_repeat and len(left) * max(right, 0) > max_string_length: return node;
+
+        # Keep huge powers from running at transpile time
+        if isinstance(node.op, ast.Pow) and is_number(right) and abs(right) > 1024: return node;
+
+        try:
+            value = function(left, right);
+        except (ArithmeticError, ValueError):
+            # e.g division by zero, leave it for runtime
+            return node;
+
+        if not is_representable(value): return node;
+
+        return make_constant(value, node);
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        if not is_constant(node.operand): return node;
+
+        value = node.operand.value;
+
+        if isinstance(node.op, ast.Not):
+            return make_constant(not value, node);
+
+        if not is_number(value): return node;
+
+        if isinstance(node.op, ast.USub): return make_constant(-value, node);
+        if isinstance(node.op, ast.UAdd): return make_constant(+value, node);
+        if isinstance(node.op, ast.Invert) and isinstance(value, int): return make_constant(~value, node);
+
+        return node;
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        is_and = isinstance(node.op, ast.And);
+        values = [];
+
+        # a and b returns the first falsy value (or the last one), a or b the first truthy one
+        for i in range(0, len(node.values)):
+            value = node.values[i];
+            last = i == len(node.values) - 1;
+
+            if is_constant(value) and not last:
+                if is_truthy(value) == is_and: continue;
+                values.append(value);
+                break;
+
+            values.append(value);
+
+        if len(values) == 1: return values[0];
+
+        node.values = values;
+
+        return node;
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        operands = [node.left] + node.comparators;
+
+        if not all(is_constant(operand) for operand in operands): return node;
+
+        values = [operand.value for operand in operands];
+
+        # Comparing different kinds of values means something else (or errors) in Luau
+        if not (all(is_number(value) for value in values) or all(isinstance(value, str) for value in values)): return node;
+
+        result = True;
+
+        for i in range(0, len(node.ops)):
+            function = compare_operators.get(type(node.ops[i]));
+            if function is None: return node;
+            result = result and function(values[i], values[i + 1]);
+
+        return make_constant(result, node);
+
+    def visit_IfExp(self, node: ast.IfExp) -> ast.AST:
+        if not is_constant(node.test): return node;
+
+        return node.body if is_truthy(node.test) else node.orelse;
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        # len() of a literal container (or string)
+        if not (isinstance(node.func, ast.Name) and node.func.id == "len"): return node;
+        if len(node.args) != 1 or len(node.keywords) != 0: return node;
+        if self.is_shadowed("len"): return node;
+
+        argument = node.args[0];
+
+        if isinstance(argument, ast.Constant) and isinstance(argument.value, str):
+            return make_constant(len(argument.value), node);
+
+        if not is_pure(argument): return node;
+
+        if isinstance(argument, ast.List) or isinstance(argument, ast.Tuple):
+            return make_constant(len(argument.elts), node);
+
+        # Duplicates only count once in sets and dicts, so the elements have to be known
+        if isinstance(argument, ast.Set) and all(is_constant(elt) for elt in argument.elts):
+            return make_constant(len(set(elt.value for elt in argument.elts)), node);
+
+        if isinstance(argument, ast.Dict) and all(is_constant(key) for key in argument.keys):
+            return make_constant(len(set(key.value for key in argument.keys)), node);
+
+        return node;
+
+    # Statements with a constant test keep only the branch that runs
+    def visit_If(self, node: ast.If) -> ast.AST | list[ast.stmt] | None:
+        if not is_constant(node.test): return node;
+
+        branch = node.body if is_truthy(node.test) else node.orelse;
+
+        return branch if len(branch) > 0 else None;
+
+    def visit_While(self, node: ast.While) -> ast.AST | list[ast.stmt] | None:
+        # A loop that never runs leaves only its else
+        if is_constant(node.test) and not is_truthy(node.test):
+            return node.orelse if len(node.orelse) > 0 else None;
+
+        return node;
+
+# Names the module binds itself, which hide the builtins of the same name
+def get_shadowed_names(module: ast.Module) -> set[str]:
+    shadowed = set();
+
+    for node in ast.walk(module):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            shadowed.add(node.id);
+        elif isinstance(node, ast.FunctionDef) or isinstance(node, ast.ClassDef):
+            shadowed.add(node.name);
+        elif isinstance(node, ast.arg):
+            shadowed.add(node.arg);
+
+    return shadowed;
+
+# Pass a folder to inspect it afterwards (e.g which builtins it found to be shadowed)
+def fold_constants(module: ast.Module, folder: ConstantFolder | None = None) -> ast.Module:
+    if folder is None: folder = ConstantFolder(module);
+
+    folder.visit(module);
+
+    return module;
@@ -0,0 +1,450 @@
+import ast
+from collections import Counter
+
+from . import constant_folding
+from ..util import source_text as source_text_util
+
+# Removes code that can't run, or whose result is never used, before anything is emitted:
+#   - statements after a return, break, continue or raise in the same block
+#   - if and while statements with a constant test, also through module constants (DEBUG = False, if DEBUG: ...)
+#   - module level functions that nothing uses. In modules other scripts can require only private ones (_helper),
+#     in scripts (.server.py and .client.py) any of them
+#   - locals that are never read: assignments of literals or names to them, and nested functions never called
+# Whether a name is ever read is told from the source text, like the function cache does: a name that's only
+# mentioned where it's assigned can't be read. Words in strings and comments count as mentions too, which only
+# ever keeps code. Statements are walked like the scope analysis does, expressions only where they're decided on.
+
+# Expressions that can bind a name of their own, where the module constant of that name may not be meant. They
+# can't be folded anyway
+scope_types: set[type] = { ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp };
+
+# Statements the rest of their block can't run after
+terminal_types: set[type] = { ast.Return, ast.Break, ast.Continue, ast.Raise };
+
+# The names a statement binds itself (not the statements in its body)
+def get_bound_names(statement: ast.stmt) -> list[str]:
+    statement_type = type(statement);
+    targets = [];
+
+    if statement_type is ast.Assign:
+        targets = statement.targets;
+    elif statement_type is ast.AugAssign or statement_type is ast.AnnAssign or statement_type is ast.For:
+        targets = [statement.target];
+    elif statement_type is ast.With:
+        targets = [item.optional_vars for item in statement.items if item.optional_vars is not None];
+    elif statement_type is ast.Delete:
+        targets = statement.targets;
+    elif statement_type is ast.FunctionDef or statement_type is ast.ClassDef:
+        names = [statement.name];
+        if statement_type is ast.FunctionDef: names.extend(argument.arg for argument in statement.args.posonlyargs + statement.args.args + statement.args.kwonlyargs + [statement.args.vararg, statement.args.kwarg] if argument is not None);
+        return names;
+    elif statement_type is ast.Import or statement_type is ast.ImportFrom:
+        return [alias.asname if alias.asname is not None else alias.name.split(".")[0] for alias in statement.names];
+    elif statement_type is ast.Global or statement_type is ast.Nonlocal:
+        return statement.names;
+    elif statement_type is ast.Try:
+        return [handler.name for handler in statement.handlers if handler.name is not None];
+
+    names = [];
+
+    for target in targets:
+        # Mostly a name on its own, which doesn't need walking
+        if type(target) is ast.Name:
+            names.append(target.id);
+        else:
+            names.extend(node.id for node in ast.walk(target) if type(node) is ast.Name);
+
+    return names;
+
+# Fields of a statement that hold statements of the same function, the handlers of a try hold some more
+body_fields: dict[type, tuple[str, ...]] = {
+    ast.If: ("body", "orelse"),
+    ast.For: ("body", "orelse"),
+    ast.While: ("body", "orelse"),
+    ast.With: ("body",),
+    ast.Try: ("body", "orelse", "finalbody"),
+};
+
+# The statement lists in a statement's body, without going into functions and classes unless nested is set
+def get_bodies(statement: ast.stmt, nested: bool = False) -> list[list[ast.stmt]]:
+    statement_type = type(statement);
+
+    if statement_type is ast.FunctionDef or statement_type is ast.ClassDef: return [statement.body] if nested else [];
+
+    fields = body_fields.get(statement_type);
+    if fields is None: return [];
+
+    bodies = [getattr(statement, field) for field in fields];
+    if statement_type is ast.Try: bodies.extend(handler.body for handler in statement.handlers);
+
+    return bodies;
+
+# Whether any of the statements (or the statements in their bodies) is a yield, i.e dropping them could
+# turn a generator into a function. Like the transpiler, only yields that are statements of their own count
+def has_yield(statements: list[ast.stmt]) -> bool:
+    to_visit = list(statements);
+
+    while len(to_visit) > 0:
+        statement = to_visit.pop();
+
+        if type(statement) is ast.Expr and (type(statement.value) is ast.Yield or type(statement.value) is ast.YieldFrom): return True;
+
+        for body in get_bodies(statement): to_visit.extend(body);
+
+    return False;
+
+# Whether folding node could turn it into a constant, i.e it's only literals and what the folder folds. Checked before
+# folding a test or a value, almost all of them have a variable in them and are left for the constant folding pass
+def is_foldable(node: ast.expr) -> bool:
+    to_visit = [node];
+
+    while len(to_visit) > 0:
+        node = to_visit.pop();
+        node_type = type(node);
+
+        if node_type is ast.Constant: continue;
+
+        if node_type is ast.BinOp:
+            to_visit.append(node.left);
+            to_visit.append(node.right);
+        elif node_type is ast.UnaryOp:
+            to_visit.append(node.operand);
+        elif node_type is ast.BoolOp:
+            to_visit.extend(node.values);
+        elif node_type is ast.Compare:
+            to_visit.append(node.left);
+            to_visit.extend(node.comparators);
+        elif node_type is ast.IfExp:
+            to_visit.extend([node.test, node.body, node.orelse]);
+        elif node_type is ast.Call and type(node.func) is ast.Name and node.func.id == "len" and len(node.keywords) == 0:
+            to_visit.extend(node.args);
+        elif node_type is ast.List or node_type is ast.Tuple or node_type is ast.Set:
+            to_visit.extend(node.elts);
+        elif node_type is ast.Dict:
+            if any(key is None for key in node.keys): return False;
+            to_visit.extend(node.keys);
+            to_visit.extend(node.values);
+        else:
+            return False;
+
+    return True;
+
+class DeadCodeEliminator:
+    # folder folds the tests of if and while statements, source tells which names are read (without it, unused
+    # functions and locals are kept). A script can't be required, so none of its functions are used elsewhere
+    def __init__(self, module: ast.Module, folder: constant_folding.ConstantFolder, source: str | None = None, script: bool = False):
+        self.module: ast.Module = module;
+        self.folder: constant_folding.ConstantFolder = folder;
+        self.source: str | None = source;
+        self.lines: list[str] | None = source_text_util.get_lines(source) if source is not None else None;
+        self.script: bool = script;
+        # Bytes of Python source that were removed
+        self.removed_size: int = 0;
+        # Module constants, name -> value: names the module assigns a literal once, at the top level, and never binds otherwise
+        self.constants: dict[str, any] = {};
+        # Functions some yields of were removed from. They're still generators, which the scope analysis can't tell anymore
+        self.generators: set[ast.FunctionDef] = set();
+        # Function -> (identifiers mentioned in its text, how many of those are statements that assign the name)
+        self.usage: dict[ast.FunctionDef, tuple[Counter, Counter]] = {};
+        # Module level functions that can be removed if nothing uses them
+        self.candidates: list[ast.FunctionDef] = [];
+        # Top level statement (None for the module's own) -> identifiers mentioned in what was removed from it, and its bytes
+        self.removed_mentions: dict[ast.stmt | None, Counter] = {};
+        self.removed_sizes: dict[ast.stmt | None, int] = {};
+        # Module level functions that were removed
+        self.removed_functions: set[ast.FunctionDef] = set();
+
+    def eliminate(self) -> ast.Module:
+        self.find_constants();
+
+        if self.lines is not None:
+            self.candidates = [statement for statement in self.module.body if type(statement) is ast.FunctionDef and len(statement.decorator_list) == 0 and (self.script or statement.name.startswith("_"))];
+
+        # [node, the field that holds the statements, the function they're in, the top level statement they're in]
+        stack = [(self.module, "body", None, None)];
+
+        while len(stack) > 0:
+            owner, field, function, top = stack.pop();
+            statements = self.eliminate_block(getattr(owner, field), function, top);
+            setattr(owner, field, statements);
+
+            for statement in statements:
+                statement_type = type(statement);
+                statement_top = statement if owner is self.module else top;
+
+                if statement_type is ast.FunctionDef:
+                    stack.append((statement, "body", statement, statement_top));
+                    continue;
+
+                # Class bodies don't scope like functions, nothing in them is removed as unused
+                if statement_type is ast.ClassDef:
+                    stack.append((statement, "body", None, statement_top));
+                    continue;
+
+                fields = body_fields.get(statement_type);
+                if fields is None: continue;
+
+                for field in fields: stack.append((statement, field, function, statement_top));
+
+                if statement_type is ast.Try:
+                    for handler in statement.handlers: stack.append((handler, "body", function, statement_top));
+
+        # Last, code that was just removed doesn't count as using a function
+        if len(self.candidates) > 0: self.remove_functions();
+
+        return self.module;
+
+    # The source text of node, exactly (from its first decorator)
+    def get_segment(self, node: ast.stmt) -> str:
+        decorators = getattr(node, "decorator_list", []);
+        start_line, start_column = (decorators[0].lineno, decorators[0].col_offset - 1) if len(decorators) > 0 else (node.lineno, node.col_offset);
+        lines = self.lines[start_line - 1:node.end_lineno];
+
+        # Columns are in UTF-8 bytes
+        if len(lines) == 1: return lines[0].encode("utf-8")[start_column:node.end_col_offset].decode("utf-8");
+
+        lines[0] = lines[0].encode("utf-8")[start_column:].decode("utf-8");
+        lines[-1] = lines[-1].encode("utf-8")[:node.end_col_offset].decode("utf-8");
+
+        return "\n".join(lines);
+
+    # How many bytes of source node takes up
+    def get_size(self, node: ast.stmt) -> int:
+        if self.lines is None or getattr(node, "end_lineno", None) is None: return len(ast.unparse(node).encode("utf-8"));
+
+        return len(self.get_segment(node).encode("utf-8"));
+
+    # Count statement of function as removed from top, all but the statements in kept (which take its place)
+    def forget(self, statement: ast.stmt, kept: list[ast.stmt], function: ast.FunctionDef | None, top: ast.stmt | None) -> None:
+        size = self.get_size(statement) - sum(self.get_size(node) for node in kept);
+        self.removed_size = self.removed_size + size;
+
+        # return; yield (or if False: yield) is how a generator that yields nothing is written
+        if function is not None and has_yield([statement]): self.generators.add(function);
+
+        if len(self.candidates) == 0: return;
+
+        self.removed_sizes[top] = self.removed_sizes.get(top, 0) + size;
+
+        mentions = self.removed_mentions.setdefault(top, Counter());
+        mentions.update(source_text_util.identifier_pattern.findall(self.get_segment(statement)));
+        for node in kept: mentions.subtract(source_text_util.identifier_pattern.findall(self.get_segment(node)));
+
+    def find_constants(self) -> None:
+        candidates = {};
+
+        for statement in self.module.body:
+            statement_type = type(statement);
+
+            # DEBUG = False or DEBUG: bool = False
+            if statement_type is ast.Assign and len(statement.targets) == 1:
+                target = statement.targets[0];
+            elif statement_type is ast.AnnAssign and statement.value is not None:
+                target = statement.target;
+            else:
+                continue;
+
+            if type(target) is not ast.Name or not constant_folding.is_constant(statement.value) or not constant_folding.is_representable(statement.value.value): continue;
+
+            candidates[target.id] = statement.value.value;
+
+        if len(candidates) == 0: return;
+
+        # Any other binding of the name anywhere (another assignment, a parameter, global, ...) and it isn't constant
+        bindings = Counter();
+        to_visit = list(self.module.body);
+
+        while len(to_visit) > 0:
+            statement = to_visit.pop();
+
+            for name in get_bound_names(statement):
+                if name in candidates: bindings[name] = bindings[name] + 1;
+
+            for body in get_bodies(statement, True): to_visit.extend(body);
+
+        # So does (DEBUG := True), which can be in any expression. Without := in the text there's no need to look
+        if self.source is None or ":=" in self.source:
+            for node in ast.walk(self.module):
+                if type(node) is ast.NamedExpr and node.target.id in candidates: bindings[node.target.id] = bindings[node.target.id] + 1;
+
+        self.constants = { name: candidates[name] for name in candidates if bindings[name] == 1 };
+
+    # Module level functions that nothing mentions outside of their own text, until none are left. Passes that run
+    # later call it again with how they changed the mentions of top level statements (e.g inlining calls)
+    def remove_functions(self, changes: dict[ast.stmt, Counter] | None = None) -> None:
+        if len(self.candidates) == 0: return;
+
+        counts = Counter(source_text_util.identifier_pattern.findall(self.source));
+        own = {};
+
+        for mentions in self.removed_mentions.values(): counts.subtract(mentions);
+        if changes is not None:
+            for mentions in changes.values(): counts.update(mentions);
+
+        for candidate in self.candidates:
+            own[candidate] = Counter(source_text_util.identifier_pattern.findall(source_text_util.get_statement_text(self.lines, candidate)));
+            own[candidate].subtract(self.removed_mentions.get(candidate, Counter()));
+            if changes is not None and candidate in changes: own[candidate].update(changes[candidate]);
+
+        removed = set();
+        changed = True;
+
+        # Removing a function can leave the ones only it used unused
+        while changed:
+            changed = False;
+
+            for candidate in self.candidates:
+                if candidate in removed or counts[candidate.name] != own[candidate][candidate.name]: continue;
+
+                counts.subtract(own[candidate]);
+                removed.add(candidate);
+                changed = True;
+
+                if candidate in self.removed_functions: continue;
+
+                # Some of it may have been removed already
+                self.removed_size = self.removed_size + self.get_size(candidate) - self.removed_sizes.get(candidate, 0);
+                self.removed_functions.add(candidate);
+
+        if len(removed) > 0: self.module.body = [statement for statement in self.module.body if statement not in removed];
+
+    # Put the module constants into node (a test) in place, returns the node that replaces it
+    def substitute_constants(self, node: ast.expr) -> ast.expr:
+        constants = self.constants;
+
+        if len(constants) == 0: return node;
+        if type(node) is ast.Name: return constant_folding.make_constant(constants[node.id], node) if node.id in constants and type(node.ctx) is ast.Load else node;
+
+        to_visit = [node];
+
+        while len(to_visit) > 0:
+            parent = to_visit.pop();
+
+            for field in parent._fields:
+                value = getattr(parent, field, None);
+
+                if isinstance(value, list):
+                    for i in range(0, len(value)):
+                        child = value[i];
+
+                        if type(child) is ast.Name:
+                            if child.id in constants and type(child.ctx) is ast.Load: value[i] = constant_folding.make_constant(constants[child.id], child);
+                        elif isinstance(child, ast.AST) and type(child) not in scope_types:
+                            to_visit.append(child);
+                elif type(value) is ast.Name:
+                    if value.id in constants and type(value.ctx) is ast.Load: setattr(parent, field, constant_folding.make_constant(constants[value.id], value));
+                elif isinstance(value, ast.AST) and type(value) not in scope_types:
+                    to_visit.append(value);
+
+        return node;
+
+    # An if or while with its test folded, replaced by the statements that run if the test is constant
+    def fold_test(self, statement: ast.If | ast.While) -> ast.stmt | list[ast.stmt] | None:
+        statement.test = self.substitute_constants(statement.test);
+        if is_foldable(statement.test): statement.test = self.folder.visit(statement.test);
+
+        if type(statement) is ast.If: return self.folder.visit_If(statement);
+
+        return self.folder.visit_While(statement);
+
+    def get_usage(self, function: ast.FunctionDef) -> tuple[Counter, Counter]:
+        usage = self.usage.get(function);
+        if usage is not None: return usage;
+
+        # Statements that assign a name on its own, and nested functions, which are what can be removed
+        assignments = Counter();
+        to_visit = list(function.body);
+
+        while len(to_visit) > 0:
+            statement = to_visit.pop();
+            statement_type = type(statement);
+
+            if statement_type is ast.Assign and len(statement.targets) == 1 and type(statement.targets[0]) is ast.Name:
+                assignments[statement.targets[0].id] = assignments[statement.targets[0].id] + 1;
+            elif statement_type is ast.AnnAssign and type(statement.target) is ast.Name:
+                # x: int alone doesn't read x either (and isn't emitted)
+                assignments[statement.target.id] = assignments[statement.target.id] + 1;
+            elif statement_type is ast.FunctionDef:
+                assignments[statement.name] = assignments[statement.name] + 1;
+                continue;
+
+            fields = body_fields.get(statement_type);
+            if fields is None: continue;
+
+            for field in fields: to_visit.extend(getattr(statement, field));
+
+            if statement_type is ast.Try:
+                for handler in statement.handlers: to_visit.extend(handler.body);
+
+        usage = (Counter(source_text_util.identifier_pattern.findall(source_text_util.get_statement_text(self.lines, function))), assignments);
+        self.usage[function] = usage;
+
+        return usage;
+
+    # An assignment to a local (or a nested function) of function that's never read: None if it can go, otherwise the
+    # statement itself. Values with side effects stay assigned, rather than become expression statements Luau may not allow
+    def eliminate_assignment(self, statement: ast.stmt, function: ast.FunctionDef) -> ast.stmt | None:
+        statement_type = type(statement);
+
+        if statement_type is ast.FunctionDef:
+            if len(statement.decorator_list) > 0: return statement;
+            name = statement.name;
+        elif statement_type is ast.Assign:
+            if len(statement.targets) != 1 or type(statement.targets[0]) is not ast.Name: return statement;
+            name = statement.targets[0].id;
+        else:
+            if statement.value is None or type(statement.target) is not ast.Name: return statement;
+            name = statement.target.id;
+
+        mentions, assignments = self.get_usage(function);
+
+        # Mentioned anywhere else (read, declared global, assigned some other way, ...) and it stays
+        if mentions[name] != assignments[name]: return statement;
+
+        if statement_type is ast.FunctionDef: return None;
+
+        if is_foldable(statement.value): statement.value = self.folder.visit(statement.value);
+
+        return None if constant_folding.is_pure(statement.value) else statement;
+
+    # The statements of a block without the dead ones, function is the function the block is in (None at the top)
+    def eliminate_block(self, statements: list[ast.stmt], function: ast.FunctionDef | None, top: ast.stmt | None) -> list[ast.stmt]:
+        result = [];
+        # Reversed, statements that replace an if are handled next
+        pending = statements[::-1];
+
+        while len(pending) > 0:
+            statement = pending.pop();
+            statement_type = type(statement);
+            replacement = statement;
+
+            if statement_type is ast.If or statement_type is ast.While:
+                replacement = self.fold_test(statement);
+            elif function is not None and self.lines is not None and (statement_type is ast.Assign or statement_type is ast.AnnAssign or statement_type is ast.FunctionDef):
+                replacement = self.eliminate_assignment(statement, function);
+
+            if replacement is not statement:
+                self.forget(statement, replacement if isinstance(replacement, list) else [replacement] if replacement is not None else [], function, top);
+
+                # The branch that runs takes the if's place
+                if isinstance(replacement, list):
+                    pending.extend(replacement[::-1]);
+                elif replacement is not None:
+                    result.append(replacement);
+
+                continue;
+
+            result.append(statement);
+
+            if statement_type in terminal_types and len(pending) > 0:
+                for node in pending: self.forget(node, [], function, top);
+                break;
+
+        return result;
+
+# Returns how many bytes of source were removed
+def eliminate_dead_code(module: ast.Module, source: str | None = None, script: bool = False) -> int:
+    eliminator = DeadCodeEliminator(module, constant_folding.ConstantFolder(module), source, script);
+    eliminator.eliminate();
+
+    return eliminator.removed_size;
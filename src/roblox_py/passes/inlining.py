@@ -0,0 +1,566 @@
+import ast
+import re
+import copy
+from collections import Counter
+
+from . import renaming
+from . import dead_code
+from ..util import source_text as source_text_util
+
+# Calls to small module level functions (clamp, lerp, is_alive, ...) are replaced by the expression the function
+# returns, with the arguments in place of the parameters: clamp(x, 0, 1) -> max(0, min(x, 1)). A function is
+# inlined when all it does is return an expression of at most budget nodes that doesn't call the function itself,
+# it's defined once and never rebound, and takes plain parameters (defaults have to be literals). Only calls in the
+# top level statements after its definition are inlined, before it Python wouldn't find the function.
+#
+# Arguments are still evaluated exactly once and in order:
+#   - literals, and locals no call can rebind (nothing declares them global or nonlocal), are put in as they are
+#   - any other argument is put in as it is when its parameter is used once, in the order of the arguments, and
+#     before the function does anything that could tell the difference (call, index, read a global something rebinds)
+#   - otherwise, if the call is the whole value of an assignment or return, the arguments are assigned to temporaries
+#     before it (_ropy_inline_1, ...), and if it isn't, the call is left alone
+# A call site also has to see the names the function uses the way the function does, a call where a local has the
+# name of one of them is left alone. Arguments are inlined first, but what was inlined isn't inlined into again.
+
+# Nodes in the returned expression, i.e roughly how much longer every call site gets
+default_budget = 16;
+
+temporary_prefix = "_ropy_inline_";
+
+# Expressions that bind names of their own, or can't be moved into another function
+excluded_types: set[type] = { ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.NamedExpr, ast.Yield, ast.YieldFrom, ast.Await };
+
+# Expressions that don't do anything of their own when they're evaluated other than evaluate their operands
+# (operators can fail, but only once the arguments they'd come after have been evaluated)
+transparent_types: set[type] = { ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.IfExp, ast.List, ast.Tuple, ast.Set, ast.Dict, ast.JoinedStr, ast.keyword, ast.Slice };
+
+comprehension_types: tuple[type, ...] = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp);
+
+# Expressions that can't have a call in them
+leaf_types: set[type] = { ast.Name, ast.Constant };
+
+# Statements whose value can be split off from them
+hoist_types: set[type] = { ast.Assign, ast.AnnAssign, ast.Return };
+
+# Statement type -> the fields of its own expressions, filled in as they come up
+root_fields: dict[type, list[str]] = {};
+
+# The expression the function returns, if that's all its body does (after a docstring)
+def get_return_value(function: ast.FunctionDef) -> ast.expr | None:
+    body = function.body;
+
+    if len(body) == 2 and type(body[0]) is ast.Expr and type(body[0].value) is ast.Constant and isinstance(body[0].value.value, str): body = body[1:];
+    if len(body) != 1 or type(body[0]) is not ast.Return: return None;
+
+    return body[0].value;
+
+# Give node the location of like, so that errors and source maps point at the call site
+def set_location(node: ast.AST, like: ast.AST) -> None:
+    node.lineno = like.lineno;
+    node.col_offset = like.col_offset;
+    node.end_lineno = like.end_lineno;
+    node.end_col_offset = like.end_col_offset;
+
+class Inliner:
+    # source (optional) lets the statements that don't mention any of the functions be skipped without walking them
+    def __init__(self, module: ast.Module, budget: int = default_budget, source: str | None = None):
+        self.module: ast.Module = module;
+        self.budget: int = budget;
+        self.source: str | None = source;
+        self.lines: list[str] | None = source_text_util.get_lines(source) if source is not None else None;
+        # Without := only statements bind names, which is far cheaper to find out than walking every expression
+        self.walrus: bool = source is None or ":=" in source;
+        # Functions that can be inlined, by name, and a copy of what they return from before anything was inlined into it
+        self.functions: dict[str, ast.FunctionDef] = {};
+        self.values: dict[str, ast.expr] = {};
+        # Those whose definition the top level statements have come past
+        self.defined: set[str] = set();
+        # Function -> the names it uses other than its parameters
+        self.free_names: dict[str, set[str]] = {};
+        # Function -> what happens when its expression is evaluated, in order: (parameter, whether that use may
+        # not be evaluated) for every use of a parameter, None for anything that could tell an argument was late
+        self.events: dict[str, list[tuple[str, bool] | None]] = {};
+        # Names something declares global or nonlocal anywhere in the module, i.e that a call can rebind
+        self.declared: set[str] = set();
+        # Function -> everything what its call sites turn into depends on, for the function cache
+        self.fingerprints: dict[str, str] = {};
+        # How many call sites were inlined, and how many of each function in each top level statement
+        self.inlined: int = 0;
+        self.calls: Counter = Counter();
+        # The top level statement being inlined into
+        self.top: ast.stmt | None = None;
+
+    def inline(self) -> ast.Module:
+        self.find_functions();
+        if len(self.functions) == 0: return self.module;
+
+        # Most top level statements don't mention any of the functions
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(name) for name in self.functions) + r")\b") if self.lines is not None else None;
+        # Module level names are locals to the calls at module level
+        module_names = self.get_bound_names(self.module);
+        # [node, the field that holds the statements, the scopes they're in (innermost last), the locals of those
+        # scopes, whether statements can be put in front of them (not in a class body, where they'd be attributes)]
+        stack = [];
+        body = [];
+
+        for statement in self.module.body:
+            if type(statement) is ast.FunctionDef and statement.name in self.functions: self.defined.add(statement.name);
+
+            if pattern is not None and pattern.search(source_text_util.get_statement_text(self.lines, statement)) is None:
+                body.append(statement);
+                continue;
+
+            self.top = statement;
+            body.extend(self.inline_statement(statement, [], module_names, True));
+            self.add_bodies(statement, [], module_names, True, stack);
+
+            while len(stack) > 0:
+                owner, field, scopes, names, hoist = stack.pop();
+                statements = [];
+
+                for inner in getattr(owner, field):
+                    statements.extend(self.inline_statement(inner, scopes, names, hoist));
+                    self.add_bodies(inner, scopes, names, hoist, stack);
+
+                setattr(owner, field, statements);
+
+        self.module.body = body;
+
+        return self.module;
+
+    # Top level statement -> how the identifiers its text mentions changed, for dead code elimination (which tells
+    # what's used from the text). An inlined call site no longer mentions the function, but what the function does
+    def get_mentions(self) -> dict[ast.stmt, Counter]:
+        mentions = {};
+        texts = {};
+
+        for top, name in self.calls:
+            count = self.calls[(top, name)];
+            text = texts.get(name);
+
+            if text is None:
+                text = Counter(source_text_util.identifier_pattern.findall(source_text_util.get_statement_text(self.lines, self.functions[name])));
+                del text[name];
+                texts[name] = text;
+
+            changes = mentions.setdefault(top, Counter());
+            changes[name] = changes[name] - count;
+            for identifier in text: changes[identifier] = changes[identifier] + text[identifier] * count;
+
+        return mentions;
+
+    def find_functions(self) -> None:
+        candidates = {};
+
+        for statement in self.module.body:
+            if type(statement) is not ast.FunctionDef or len(statement.decorator_list) > 0: continue;
+
+            value = get_return_value(statement);
+            arguments = statement.args;
+
+            if value is None or arguments.vararg is not None or arguments.kwarg is not None or len(arguments.kwonlyargs) > 0: continue;
+            if any(type(default) is not ast.Constant for default in arguments.defaults): continue;
+
+            parameters = set(argument.arg for argument in arguments.posonlyargs + arguments.args);
+            names = set();
+            size = 0;
+            excluded = False;
+
+            for node in ast.walk(value):
+                if not isinstance(node, ast.expr): continue;
+
+                node_type = type(node);
+                size = size + 1;
+
+                if node_type in excluded_types:
+                    excluded = True;
+                    break;
+
+                if node_type is ast.Name: names.add(node.id);
+
+            if excluded or size > self.budget or statement.name in names: continue;
+
+            candidates[statement.name] = statement;
+            self.free_names[statement.name] = names - parameters;
+
+        if len(candidates) == 0: return;
+
+        if self.source is None or re.search(r"\b(?:global|nonlocal)\b", self.source) is not None:
+            for node in ast.walk(self.module):
+                if type(node) is ast.Global or type(node) is ast.Nonlocal: self.declared.update(node.names);
+
+        # Rebound at module level (assigned, another def, ...) or from a function (global) and a call may mean
+        # something else. A local of the same name only hides the function from the calls it can see
+        bindings = {};
+        to_visit = list(self.module.body);
+
+        while len(to_visit) > 0:
+            statement = to_visit.pop();
+            statement_type = type(statement);
+
+            for name in ([statement.name] if statement_type is ast.FunctionDef or statement_type is ast.ClassDef else dead_code.get_bound_names(statement)):
+                if name in candidates: bindings[name] = bindings.get(name, 0) + 1;
+
+            for body in dead_code.get_bodies(statement): to_visit.extend(body);
+
+        self.functions = { name: candidates[name] for name in candidates if bindings.get(name) == 1 and name not in self.declared };
+        if len(self.functions) == 0: return;
+
+        declared = " ".join(sorted(self.declared));
+
+        for name in self.functions:
+            function = self.functions[name];
+            self.values[name] = copy.deepcopy(get_return_value(function));
+            self.events[name] = self.get_events(get_return_value(function), set(argument.arg for argument in function.args.posonlyargs + function.args.args));
+            self.fingerprints[name] = ast.dump(function) + "\n" + declared;
+
+    # What evaluating value does, in order (see self.events)
+    def get_events(self, value: ast.expr, parameters: set[str]) -> list[tuple[str, bool] | None]:
+        events = [];
+        # [node, whether it may not be evaluated], node is None for what a node does after its operands
+        stack = [(value, False)];
+
+        while len(stack) > 0:
+            node, conditional = stack.pop();
+
+            if node is None:
+                events.append(None);
+                continue;
+
+            node_type = type(node);
+
+            if node_type is ast.Name:
+                if node.id in parameters:
+                    events.append((node.id, conditional));
+                elif node.id in self.declared:
+                    events.append(None);
+                continue;
+
+            if node_type is ast.Constant: continue;
+
+            if node_type is ast.Dict:
+                # Keys and values are evaluated in pairs (**spread has no key)
+                children = [child for i in range(0, len(node.keys)) for child in [node.keys[i], node.values[i]] if child is not None];
+            else:
+                children = [child for child in ast.iter_child_nodes(node) if isinstance(child, (ast.expr, ast.keyword))];
+
+            # Only the first operand of and/or, and the test of an if-else, are always evaluated
+            flags = [conditional] + [True] * (len(children) - 1) if node_type is ast.BoolOp or node_type is ast.IfExp else [conditional] * len(children);
+
+            if node_type not in transparent_types: stack.append((None, conditional));
+
+            for i in range(len(children) - 1, -1, -1): stack.append((children[i], flags[i]));
+
+        return events;
+
+    # The names the module, a function or a class binds itself, see renaming.get_bound_names
+    def get_bound_names(self, node: ast.Module | ast.FunctionDef | ast.ClassDef) -> set[str]:
+        if self.walrus: return renaming.get_bound_names(node);
+
+        bound = set(argument.arg for argument in renaming.get_arguments(node)) if type(node) is ast.FunctionDef else set();
+        declared = set();
+        to_visit = list(node.body);
+
+        while len(to_visit) > 0:
+            statement = to_visit.pop();
+            statement_type = type(statement);
+
+            if statement_type is ast.FunctionDef or statement_type is ast.ClassDef:
+                bound.add(statement.name);
+                continue;
+
+            if statement_type is ast.Global or statement_type is ast.Nonlocal:
+                declared.update(statement.names);
+                continue;
+
+            bound.update(dead_code.get_bound_names(statement));
+
+            for body in dead_code.get_bodies(statement): to_visit.extend(body);
+
+        return bound - declared;
+
+    # Queue the statement lists in statement's body, with the scopes they're in
+    def add_bodies(self, statement: ast.stmt, scopes: list[set[str]], names: set[str], hoist: bool, stack: list) -> None:
+        statement_type = type(statement);
+
+        if statement_type is ast.FunctionDef:
+            bound = self.get_bound_names(statement);
+            stack.append((statement, "body", scopes + [bound], names | bound, True));
+            return;
+
+        # What a class body binds hides the module's names from the calls in it, but those are attributes, not locals
+        if statement_type is ast.ClassDef:
+            stack.append((statement, "body", scopes + [self.get_bound_names(statement)], names, False));
+            return;
+
+        fields = dead_code.body_fields.get(statement_type);
+        if fields is None: return;
+
+        for field in fields: stack.append((statement, field, scopes, names, hoist));
+
+        if statement_type is ast.Try:
+            for handler in statement.handlers: stack.append((handler, "body", scopes, names, hoist));
+
+    # Queue the expressions statement evaluates itself (not the ones in its body) to be walked
+    def add_roots(self, statement: ast.stmt, scopes: list[set[str]], names: set[str], stack: list) -> None:
+        statement_type = type(statement);
+
+        if statement_type is ast.FunctionDef:
+            self.add_children(statement.args, scopes, names, stack, ["defaults", "kw_defaults"]);
+            self.add_children(statement, scopes, names, stack, ["decorator_list"]);
+            return;
+
+        if statement_type is ast.ClassDef:
+            self.add_children(statement, scopes, names, stack, ["bases", "keywords", "decorator_list"]);
+            return;
+
+        # The value of a call statement is thrown away, it has to stay a call
+        if statement_type is ast.Expr and type(statement.value) is ast.Call:
+            self.add_children(statement.value, scopes, names, stack);
+            return;
+
+        fields = root_fields.get(statement_type);
+
+        if fields is None:
+            fields = [field for field in statement_type._fields if field not in ("body", "orelse", "finalbody", "handlers", "annotation", "returns")];
+            root_fields[statement_type] = fields;
+
+        self.add_children(statement, scopes, names, stack, fields);
+
+        if statement_type is ast.Try:
+            for handler in statement.handlers: self.add_children(handler, scopes, names, stack, ["type"]);
+
+    # The statement with the calls in it inlined, and the temporaries it needs in front of it
+    def inline_statement(self, statement: ast.stmt, scopes: list[set[str]], names: set[str], hoist: bool) -> list[ast.stmt]:
+        # Only what's assigned or returned can be split off from the call
+        if not (hoist and type(statement) in hoist_types and type(statement.value) is ast.Call):
+            self.inline_expressions(statement, scopes, names, None, None);
+            return [statement];
+
+        # A statement's temporaries are done with once it has run, the next one can use the same names
+        counter = [0];
+        result = [];
+        # [statement, whether its temporaries are in front of it already]. Temporaries hold arguments, which can
+        # have calls to inline (and temporaries) of their own
+        pending = [(statement, False)];
+
+        while len(pending) > 0:
+            node, done = pending.pop();
+
+            if done:
+                result.append(node);
+                continue;
+
+            hoisted = [] if type(node.value) is ast.Call else None;
+            self.inline_expressions(node, scopes, names, hoisted, counter);
+
+            pending.append((node, True));
+            if hoisted is not None: pending.extend((temporary, False) for temporary in reversed(hoisted));
+
+        return result;
+
+    def inline_expressions(self, statement: ast.stmt, scopes: list[set[str]], names: set[str], hoisted: list[ast.stmt] | None, counter: list[int] | None) -> None:
+        hoisted_call = statement.value if hoisted is not None else None;
+        # [node, its parent, the field of the parent it's in, its index in that field, the scopes and locals it's in,
+        # whether its children are done]. Arguments are inlined before the call they're in, which makes them simpler
+        stack = [];
+        self.add_roots(statement, scopes, names, stack);
+
+        while len(stack) > 0:
+            node, parent, field, index, scopes, names, ready = stack.pop();
+            node_type = type(node);
+
+            if ready:
+                replacement = self.inline_call(node, statement, scopes, names, hoisted if node is hoisted_call else None, counter);
+                if replacement is None: continue;
+
+                if index is None:
+                    setattr(parent, field, replacement);
+                else:
+                    getattr(parent, field)[index] = replacement;
+
+                continue;
+
+            if node_type is ast.Call and type(node.func) is ast.Name and node.func.id in self.defined: stack.append((node, parent, field, index, scopes, names, True));
+
+            if node_type is ast.Lambda or node_type in comprehension_types:
+                self.add_scope(node, scopes, names, stack);
+                continue;
+
+            self.add_children(node, scopes, names, stack);
+
+    def add_children(self, node: ast.AST, scopes: list[set[str]], names: set[str], stack: list, fields: list[str] | None = None) -> None:
+        for field in (node._fields if fields is None else fields):
+            value = getattr(node, field, None);
+
+            if type(value) is list:
+                for i in range(len(value) - 1, -1, -1):
+                    item = value[i];
+                    if isinstance(item, ast.AST) and type(item) not in leaf_types and item._fields: stack.append((item, node, field, i, scopes, names, False));
+            elif isinstance(value, ast.AST) and type(value) not in leaf_types and value._fields:
+                stack.append((value, node, field, None, scopes, names, False));
+
+    # Lambdas and comprehensions: their defaults and first iterable are evaluated outside of them
+    def add_scope(self, node: ast.Lambda | ast.ListComp | ast.SetComp | ast.DictComp | ast.GeneratorExp, scopes: list[set[str]], names: set[str], stack: list) -> None:
+        bound = renaming.get_bound_names(node);
+        inner_scopes = scopes + [bound];
+        inner_names = names | bound;
+
+        if type(node) is ast.Lambda:
+            self.add_children(node.args, scopes, names, stack, ["defaults", "kw_defaults"]);
+            self.add_children(node, inner_scopes, inner_names, stack, ["body"]);
+            return;
+
+        for i in range(0, len(node.generators)):
+            generator = node.generators[i];
+
+            if i == 0:
+                self.add_children(generator, scopes, names, stack, ["iter"]);
+            else:
+                self.add_children(generator, inner_scopes, inner_names, stack, ["iter"]);
+
+            self.add_children(generator, inner_scopes, inner_names, stack, ["ifs"]);
+
+        self.add_children(node, inner_scopes, inner_names, stack, ["elt", "key", "value"]);
+
+    # Whether node can be put in where its parameter is used, as often as it's used and wherever that is
+    def is_trivial(self, node: ast.expr, names: set[str]) -> bool:
+        if type(node) is ast.Constant: return True;
+
+        return type(node) is ast.Name and node.id in names and node.id not in self.declared;
+
+    # The arguments of call as [parameter, argument] in the order they're evaluated in, with the defaults of the
+    # parameters it leaves out last. None if it doesn't match the parameters. Like the function itself, which can't
+    # tell nil from an argument that's left out, a None argument gets the default too
+    def match_arguments(self, function: ast.FunctionDef, call: ast.Call) -> list[tuple[str, ast.expr]] | None:
+        arguments = function.args;
+        positional = arguments.posonlyargs + arguments.args;
+        parameters = [argument.arg for argument in positional];
+
+        if len(call.args) > len(parameters) or any(type(argument) is ast.Starred for argument in call.args): return None;
+
+        matched = [(parameters[i], call.args[i]) for i in range(0, len(call.args))];
+        given = set(parameters[0:len(call.args)]);
+        keyword_names = parameters[len(arguments.posonlyargs):];
+
+        for keyword in call.keywords:
+            if keyword.arg is None or keyword.arg not in keyword_names or keyword.arg in given: return None;
+
+            matched.append((keyword.arg, keyword.value));
+            given.add(keyword.arg);
+
+        # Defaults belong to the last parameters
+        first_default = len(parameters) - len(arguments.defaults);
+        defaults = { parameters[i]: arguments.defaults[i - first_default] for i in range(first_default, len(parameters)) };
+
+        for i in range(0, len(matched)):
+            parameter, argument = matched[i];
+            if parameter in defaults and type(argument) is ast.Constant and argument.value is None: matched[i] = (parameter, copy.copy(defaults[parameter]));
+
+        for parameter in parameters:
+            if parameter in given: continue;
+            if parameter not in defaults: return None;
+
+            matched.append((parameter, copy.copy(defaults[parameter])));
+
+        return matched;
+
+    # Whether the arguments of these parameters (in the order they're evaluated in) can be put in where the
+    # parameters are used, i.e they'd be evaluated once, in the same order, before anything that could tell
+    def can_substitute(self, name: str, parameters: list[str]) -> bool:
+        order = [];
+
+        for event in self.events[name]:
+            if event is None:
+                if len(order) < len(parameters): return False;
+                continue;
+
+            parameter, conditional = event;
+            if parameter not in parameters: continue;
+            if conditional: return False;
+
+            order.append(parameter);
+
+        return order == parameters;
+
+    # What replaces call (in statement), or None if it can't be inlined here. hoisted is where temporaries go,
+    # None if there can't be any
+    def inline_call(self, call: ast.Call, statement: ast.stmt, scopes: list[set[str]], names: set[str], hoisted: list[ast.stmt] | None, counter: list[int]) -> ast.expr | None:
+        name = call.func.id;
+        free_names = self.free_names[name];
+
+        # A local here hides the function, or one of the names it uses
+        for scope in scopes:
+            if name in scope or not free_names.isdisjoint(scope): return None;
+
+        matched = self.match_arguments(self.functions[name], call);
+        if matched is None: return None;
+
+        others = [(parameter, argument) for parameter, argument in matched if not self.is_trivial(argument, names)];
+        values = {};
+
+        if len(others) > 0 and not self.can_substitute(name, [parameter for parameter, _ in others]):
+            if hoisted is None: return None;
+
+            for parameter, argument in others:
+                counter[0] = counter[0] + 1;
+                temporary = temporary_prefix + str(counter[0]);
+                assignment = ast.Assign(targets=[ast.Name(id=temporary, ctx=ast.Store())], value=argument);
+                set_location(assignment, statement);
+                set_location(assignment.targets[0], statement);
+                hoisted.append(assignment);
+
+                values[parameter] = ast.Name(id=temporary, ctx=ast.Load());
+                set_location(values[parameter], argument);
+
+        for parameter, argument in matched:
+            if parameter not in values: values[parameter] = argument;
+
+        self.inlined = self.inlined + 1;
+        self.calls[(self.top, name)] = self.calls[(self.top, name)] + 1;
+
+        return self.instantiate(self.values[name], values, call);
+
+    # A copy of value with the arguments in values in place of the parameters, located at call. Nodes that are
+    # never changed (operators and the like) are shared, and an argument that's used more than once is copied
+    def instantiate(self, value: ast.expr, values: dict[str, ast.expr], call: ast.Call) -> ast.expr:
+        used = set();
+        root = [value];
+        # [node, the list or node that holds it, its index or field there]
+        stack = [(value, root, 0)];
+
+        while len(stack) > 0:
+            node, holder, key = stack.pop();
+
+            if type(node) is ast.Name and node.id in values:
+                copied = values[node.id] if node.id not in used else copy.copy(values[node.id]);
+                used.add(node.id);
+            else:
+                copied = copy.copy(node);
+                set_location(copied, call);
+
+                for field in copied._fields:
+                    child = getattr(copied, field, None);
+
+                    if isinstance(child, list):
+                        child = list(child);
+                        setattr(copied, field, child);
+
+                        for i in range(0, len(child)):
+                            if isinstance(child[i], ast.AST) and child[i]._fields: stack.append((child[i], child, i));
+                    elif isinstance(child, ast.AST) and child._fields:
+                        stack.append((child, copied, field));
+
+            if type(holder) is list:
+                holder[key] = copied;
+            else:
+                setattr(holder, key, copied);
+
+        return root[0];
+
+# Inline the calls to module's small functions in place, returns how many call sites were inlined
+def inline_functions(module: ast.Module, budget: int = default_budget, source: str | None = None) -> int:
+    inliner = Inliner(module, budget, source);
+    inliner.inline();
+
+    return inliner.inlined;
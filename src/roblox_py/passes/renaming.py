@@ -0,0 +1,192 @@
+import ast
+import itertools
+
+# Release builds can shorten the names of locals (parameters, variables and nested functions) to one or two
+# letters. A name is only renamed when every use of it anywhere in the module is a local of some function,
+# it's then renamed the same way everywhere, which can't change what any use refers to. Names that are used
+# at module level, as a global or a builtin (even once) are left alone, as are the module's own functions,
+# which other scripts may use.
+
+luau_keywords: set[str] = {
+    "and", "break", "do", "else", "elseif", "end", "false", "for", "function", "if", "in", "local", "nil",
+    "not", "or", "repeat", "return", "then", "true", "until", "while", "continue", "export", "type", "typeof",
+};
+
+# Globals the output (or ropy) can refer to without the module naming them, and names the emitter makes up
+reserved_names: set[str] = luau_keywords | {
+    "_", "yield", "ropy", "self", "game", "workspace", "script", "table", "string", "math", "utf8", "bit32", "buffer",
+    "coroutine", "debug", "os", "task", "error", "assert", "require", "select", "pairs", "ipairs", "next", "print",
+    "warn", "tostring", "tonumber", "unpack", "pcall", "xpcall", "setmetatable", "getmetatable", "rawequal",
+    "rawget", "rawset", "rawlen", "newproxy", "gcinfo", "wait", "delay", "spawn", "tick", "time", "elapsedTime",
+    "Enum", "Instance", "shared",
+};
+
+# Nodes that open a scope of their own in Python
+scope_types: tuple[type, ...] = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp);
+
+# Short names in order: a..z, A..Z, then two characters
+def get_short_names() -> itertools.chain:
+    first = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ";
+    rest = first + "0123456789_";
+
+    return itertools.chain(first, (a + b for a in first for b in rest));
+
+def get_arguments(node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda) -> list[ast.arg]:
+    arguments = node.args;
+
+    return [argument for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg] if argument is not None];
+
+# The names a scope binds itself: its parameters (or comprehension targets), what it assigns, imports and the functions
+# it defines. Module and class bodies bind names the way a function's body does
+def get_bound_names(node: ast.AST) -> set[str]:
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        return set(child.id for generator in node.generators for child in ast.walk(generator.target) if isinstance(child, ast.Name));
+
+    bound = set(argument.arg for argument in get_arguments(node)) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)) else set();
+    declared = set();
+    to_visit = list(node.body) if isinstance(node.body, list) else [node.body];
+
+    while len(to_visit) > 0:
+        child = to_visit.pop();
+
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load): bound.add(child.id);
+        if isinstance(child, (ast.Global, ast.Nonlocal)): declared.update(child.names);
+        if isinstance(child, ast.alias): bound.add(child.asname if child.asname is not None else child.name.split(".")[0]);
+        if isinstance(child, ast.ExceptHandler) and child.name is not None: bound.add(child.name);
+
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(child.name);
+            continue;
+
+        # Nested scopes bind their own names
+        if isinstance(child, scope_types): continue;
+
+        to_visit.extend(ast.iter_child_nodes(child));
+
+    return bound - declared;
+
+# Finds the names that can be renamed, and how often each is used
+class NameCollector:
+    def __init__(self):
+        # Every identifier the module uses, a short name can't be one of these
+        self.seen: set[str] = set();
+        # Uses of names that were local where they were used
+        self.counts: dict[str, int] = {};
+        # Names used at least once as something other than a local
+        self.unsafe: set[str] = set();
+
+    def use(self, name: str, scopes: list[set[str]]) -> None:
+        self.seen.add(name);
+
+        if any(name in bound for bound in scopes):
+            self.counts[name] = self.counts.get(name, 0) + 1;
+        else:
+            self.unsafe.add(name);
+
+    def visit(self, node: ast.AST, scopes: list[set[str]]) -> None:
+        # [node, the scopes it's in], only new scopes recurse. Uses are counted, so the order doesn't matter
+        to_visit = [(node, scopes)];
+
+        while len(to_visit) > 0:
+            node, scopes = to_visit.pop();
+            node_type = type(node);
+
+            if node_type is ast.Name:
+                self.use(node.id, scopes);
+                continue;
+
+            if node_type in scope_types:
+                self.visit_scope(node, scopes);
+                continue;
+
+            if node_type is ast.Global or node_type is ast.ExceptHandler and node.name is not None:
+                names = node.names if node_type is ast.Global else [node.name];
+                self.seen.update(names);
+                self.unsafe.update(names);
+            elif node_type is ast.Nonlocal:
+                for name in node.names: self.use(name, scopes);
+            elif node_type is ast.alias:
+                name = node.asname if node.asname is not None else node.name.split(".")[0];
+                self.seen.add(name);
+                self.unsafe.add(name);
+            elif node_type is ast.ClassDef:
+                self.seen.add(node.name);
+                self.unsafe.add(node.name);
+                # Class bodies don't scope like functions, nothing in them is renamed
+                scopes = [];
+
+            for child in ast.iter_child_nodes(node): to_visit.append((child, scopes));
+
+    def visit_scope(self, node: ast.AST, scopes: list[set[str]]) -> None:
+        inner = scopes + [get_bound_names(node)];
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            if not isinstance(node, ast.Lambda):
+                self.use(node.name, scopes);
+
+                # Decorators and the return annotation are evaluated where the function is defined
+                for decorator in node.decorator_list: self.visit(decorator, scopes);
+                if node.returns is not None: self.visit(node.returns, scopes);
+
+            for default in node.args.defaults + [default for default in node.args.kw_defaults if default is not None]:
+                self.visit(default, scopes);
+
+            for argument in get_arguments(node):
+                self.use(argument.arg, inner);
+                if argument.annotation is not None: self.visit(argument.annotation, scopes);
+
+            for statement in (node.body if isinstance(node.body, list) else [node.body]): self.visit(statement, inner);
+            return;
+
+        # Comprehensions: the first iterable is evaluated outside
+        for i in range(0, len(node.generators)):
+            generator = node.generators[i];
+
+            self.visit(generator.target, inner);
+            self.visit(generator.iter, scopes if i == 0 else inner);
+            for condition in generator.ifs: self.visit(condition, inner);
+
+        for field in ["elt", "key", "value"]:
+            if hasattr(node, field): self.visit(getattr(node, field), inner);
+
+# Rename the locals of module's functions to short names, in place. Returns how many characters that saves
+# in the Python, the output saves at least as many (locals can be declared before they're assigned).
+# renames is filled in with name -> short name, if given
+def shorten_locals(module: ast.Module, renames: dict[str, str] | None = None) -> int:
+    collector = NameCollector();
+    collector.visit(module, []);
+
+    candidates = [name for name in collector.counts if name not in collector.unsafe];
+    # The most used names get the shortest replacements
+    candidates.sort(key=lambda name: (-collector.counts[name], name));
+
+    taken = collector.seen | reserved_names;
+    short_names = (name for name in get_short_names() if name not in taken);
+    if renames is None: renames = {};
+    short_name = None;
+
+    for name in candidates:
+        if short_name is None: short_name = next(short_names, None);
+        if short_name is None: break;
+
+        # Already as short as it gets, the short name goes to the next one
+        if len(short_name) >= len(name): continue;
+
+        renames[name] = short_name;
+        short_name = None;
+
+    if len(renames) == 0: return 0;
+
+    for node in ast.walk(module):
+        node_type = type(node);
+
+        if node_type is ast.Name:
+            if node.id in renames: node.id = renames[node.id];
+        elif node_type is ast.arg:
+            if node.arg in renames: node.arg = renames[node.arg];
+        elif node_type is ast.FunctionDef or node_type is ast.AsyncFunctionDef:
+            if node.name in renames: node.name = renames[node.name];
+        elif node_type is ast.Nonlocal:
+            node.names = [renames.get(name, name) for name in node.names];
+
+    return sum(collector.counts[name] * (len(name) - len(renames[name])) for name in renames);
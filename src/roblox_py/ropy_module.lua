@@ -16,11 +16,30 @@ ropy.operator_in = function(needle, haystack)
 		end
 	end
 
+	-- Generators are iterators, which are used up looking for the needle like in python
+	if type(haystack) == "function" then
+		for _, v in haystack do
+			if v == needle then
+				return true
+			end
+		end
+	end
+
 	return false
 end
 
+-- The inclusive limit of a numeric for that runs like range(start, stop, step), stop is exclusive
+ropy.range_limit = function(stop, step)
+	if step == 0 then
+		error("range() arg 3 must not be zero")
+	end
+
+	return if step > 0 then stop - 1 else stop + 1
+end
+
+-- Like python, range(stop) counts from 0 and stop is never reached
 ropy.range = function(start, stop, step)
-	if stop == nil then stop = start; start = 1 end
+	if stop == nil then stop = start; start = 0 end
 	if step == nil then step = 1 end
 
 	if type(start) ~= "number" or type(stop) ~= "number" or type(step) ~= "number" then
@@ -32,14 +51,25 @@ ropy.range = function(start, stop, step)
 	end
 
 	local result = {}
-	local i = start
-	while i <= stop do
+	for i = start, ropy.range_limit(stop, step), step do
 		table.insert(result, i)
-		i = i + step
 	end
 	return result
 end
 
+-- Python's truthiness: None, False, 0, "" and empty tables are falsy
+ropy.truthy = function(value)
+	if not value or value == 0 or value == "" then
+		return false
+	end
+
+	if type(value) == "table" then
+		return next(value) ~= nil
+	end
+
+	return true
+end
+
 -- == Table-specific methods begin here == --
 
 -- We have to loop through the table, because in python len() works for both dict and lists
@@ -74,8 +104,11 @@ ropy.setdefault.tuple = ropy.setdefault.error
 ropy.setdefault.set = ropy.setdefault.error
 
 ropy.add = {
+	-- Sets are arrays without duplicates
 	set = function(pytable, value)
-		table.insert(pytable, value)
+		if table.find(pytable, value) == nil then
+			table.insert(pytable, value)
+		end
 	end,
 
 	error = function()
@@ -98,16 +131,24 @@ ropy.append.dict = ropy.append.error
 ropy.append.set = ropy.append.error
 
 ropy.set = {
+	-- The set of a dict's keys
 	dict = function(pytable)
 		local result = {}
-		for k, v in pairs(pytable) do
-			result[k] = v
+		for k, _ in pairs(pytable) do
+			table.insert(result, k)
 		end
 		return result
 	end,
 
+	-- A new table, without duplicates (pytable can also be a generator)
 	list = function(pytable)
-		return pytable or {}
+		local result = {}
+		for _, v in pytable or {} do
+			if table.find(result, v) == nil then
+				table.insert(result, v)
+			end
+		end
+		return result
 	end
 }
 
@@ -119,18 +160,17 @@ ropy.all = {
 		if #pytable == 0 then return true end
 		
 		for k, _ in pairs(pytable) do
-			if not k or k == 0 or (type(k)=="string" and #k==0) then
+			if not ropy.truthy(k) then
 				return false
 			end
 		end
 		return true
 	end,
 
+	-- pytable can also be a generator
 	list = function(pytable)
-		if #pytable == 0 then return true end
-
-		for _, v in pairs(pytable) do
-			if not v or v == 0 or (type(v)=="string" and #v==0) then
+		for _, v in pytable do
+			if not ropy.truthy(v) then
 				return false
 			end
 		end
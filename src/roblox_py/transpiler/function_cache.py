@@ -0,0 +1,197 @@
+from ..util import transpilation as transpilation_util;
+from ..util import source_maps as source_maps_util;
+from ..util import source_text as source_text_util;
+from ..util.emitter import Emitter;
+from ..passes import inlining as inlining_util;
+from . import manifest as manifest_util;
+from . import output as output_util;
+
+import os
+import ast
+import json
+import hashlib
+from typing import Callable
+
+# Emitted Luau of top level functions, kept between builds so an edit to one function of a large module
+# doesn't re-emit all the others. An entry is keyed by a hash of everything the function's output depends on:
+# its source text, what the passes before emission decided about the names in it (constant folding whether
+# len is a builtin, renaming their short names), what the module's scope says about those names, and the
+# transpiler version. Hashing the text is far cheaper than walking the AST, which costs about as much as
+# emitting it. Entries are files in the cache folder, a hit touches its file, and evict() removes the least
+# recently used ones once the folder is over its size. Workers share the folder, writes are atomic.
+
+# Next to the manifest, so Rojo never syncs it
+default_cache_path = os.path.join(".ropy", "functions");
+default_cache_size = 64 * 1024 * 1024;
+
+# Bump when the layout of an entry changes
+cache_format = "1";
+
+class FunctionCache:
+    def __init__(self, folder: str, source: str):
+        self.folder: str = folder;
+        self.lines: list[str] = source_text_util.get_lines(source);
+        self.hits: int = 0;
+        self.misses: int = 0;
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.folder, key + ".json");
+
+    # The cache key of a top level function, see the top of the file
+    def get_key(self, node: ast.FunctionDef, context: transpilation_util.TranspilationContext) -> str:
+        text = source_text_util.get_statement_text(self.lines, node);
+        module = context.symbols.module;
+        renames = context.renames;
+
+        # Whether the module binds the name (e.g its own list()), the type it inferred for it, for
+        # functions how many parameters they take (help() passes that many nils), for module
+        # constants their value (dead code elimination decides on tests with it), and for functions
+        # that are inlined what their calls turn into, and whether they come first (only then are they)
+        facts = [];
+        constants = context.constants;
+        inlined = context.inlined;
+
+        # Identifiers that aren't names (attributes, words in strings) only cost hits
+        for name in sorted(set(source_text_util.identifier_pattern.findall(text))):
+            renamed = renames.get(name, name);
+            function = module.functions.get(renamed);
+            facts.append([name, renamed, module.is_bound(renamed), module.types.get(renamed), len(function.args.args) if function is not None else None, [constants[name]] if name in constants else None, [inlined[name], function.lineno < node.lineno] if name in inlined and function is not None else None]);
+
+        shadowed = context.shadowed_names;
+        # Source maps point at lines relative to the function, which the text already pins down
+        settings = [context.options.get("constant_folding", True), context.options.get("dead_code", True), context.options.get("inline_budget", inlining_util.default_budget), None if shadowed is None else "len" in shadowed, context.emitter.source_map is not None];
+
+        digest = hashlib.sha256();
+        digest.update((cache_format + "\n" + manifest_util.get_transpiler_version() + "\n").encode("utf-8"));
+        digest.update(json.dumps([settings, facts]).encode("utf-8"));
+        digest.update(text.encode("utf-8"));
+
+        return digest.hexdigest();
+
+    def load(self, key: str) -> dict | None:
+        path = self.get_path(key);
+
+        try:
+            with open(path) as f:
+                entry = json.load(f);
+
+            # Recently used, so it's the last to be evicted
+            os.utime(path);
+        except (OSError, ValueError):
+            return None;
+
+        if not isinstance(entry, dict) or not isinstance(entry.get("text"), str): return None;
+
+        return entry;
+
+    def store(self, key: str, entry: dict) -> None:
+        try:
+            output_util.write_if_changed(self.get_path(key), json.dumps(entry));
+        except OSError:
+            # A build doesn't fail over its cache
+            pass
+
+    # Emit the function (a FunctionDef of the module's top block) through emit, or reuse its output from an earlier build
+    def transpile(self, node: ast.FunctionDef, block: transpilation_util.CodeBlock, emit: Callable[[ast.FunctionDef, transpilation_util.CodeBlock], str]) -> str:
+        context = block.context;
+        emitter = context.emitter;
+        key = self.get_key(node, context);
+        entry = self.load(key);
+
+        if entry is not None:
+            self.hits = self.hits + 1;
+
+            # Keeps the ids of the blocks that come after it the same as when it's emitted
+            block.add_child("function", node);
+
+            for member in entry["runtime"]: context.use_runtime(member);
+
+            emitter.write(self.place_markers(entry, node, emitter));
+
+            return "";
+
+        self.misses = self.misses + 1;
+
+        context.runtime_uses = {};
+        emitter.begin_capture();
+
+        try:
+            emit(node, block);
+        finally:
+            text = emitter.end_capture();
+            runtime = list(context.runtime_uses);
+            context.runtime_uses = None;
+
+        emitter.write(text);
+
+        entry = self.lift_markers(text, node, emitter);
+        entry["runtime"] = runtime;
+        self.store(key, entry);
+
+        return "";
+
+    # The entry for the function's output: its source map markers are numbered from 0, with lines relative to the function
+    def lift_markers(self, text: str, node: ast.FunctionDef, emitter: Emitter) -> dict:
+        parts = text.split(source_maps_util.marker);
+        markers = [];
+
+        for i in range(1, len(parts), 2):
+            source_line, source_column = emitter.markers[int(parts[i])];
+            parts[i] = str(len(markers));
+            markers.append([source_line - (node.lineno - 1), source_column]);
+
+        return { "text": source_maps_util.marker.join(parts), "markers": markers };
+
+    # The entry's output, with its markers numbered and placed for where the function is now
+    def place_markers(self, entry: dict, node: ast.FunctionDef, emitter: Emitter) -> str:
+        markers = entry.get("markers", []);
+
+        if len(markers) == 0: return entry["text"];
+
+        parts = entry["text"].split(source_maps_util.marker);
+        start = len(emitter.markers);
+
+        for i in range(1, len(parts), 2):
+            parts[i] = str(start + int(parts[i]));
+
+        for source_line, source_column in markers:
+            emitter.markers.append((source_line + node.lineno - 1, source_column));
+
+        return source_maps_util.marker.join(parts);
+
+# Remove the least recently used entries until the folder holds at most max_size bytes, returns how many were removed
+def evict(folder: str, max_size: int = default_cache_size) -> int:
+    try:
+        names = os.listdir(folder);
+    except OSError:
+        return 0;
+
+    entries = [];
+    total = 0;
+
+    for name in names:
+        if not name.endswith(".json"): continue;
+
+        try:
+            stat = os.stat(os.path.join(folder, name));
+        except OSError:
+            continue;
+
+        entries.append((stat.st_mtime, name, stat.st_size));
+        total = total + stat.st_size;
+
+    entries.sort();
+    removed = 0;
+
+    for _, name, size in entries:
+        if total <= max_size: break;
+
+        try:
+            os.remove(os.path.join(folder, name));
+        except OSError:
+            continue;
+
+        total = total - size;
+        removed = removed + 1;
+
+    return removed;
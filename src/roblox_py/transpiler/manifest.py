@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+
+# The manifest lives next to ropy.json rather than in outDirectory, so Rojo never syncs it
+default_manifest_path = os.path.join(".ropy", "manifest.json");
+
+# Get the hex sha256 of some text or bytes
+def hash_content(content: str | bytes) -> str:
+    if isinstance(content, str): content = content.encode("utf-8");
+
+    return hashlib.sha256(content).hexdigest();
+
+# Get the hash of a file on disk, or None if it can't be read
+def hash_file(file_path: str) -> str | None:
+    try:
+        with open(file_path, "rb") as f:
+            return hash_content(f.read());
+    except OSError:
+        return None;
+
+transpiler_version: str | None = None;
+
+# The version is the package version plus a hash of the transpiler's own sources,
+# so editing the transpiler invalidates every cached output even without a version bump
+def get_transpiler_version() -> str:
+    global transpiler_version
+
+    if transpiler_version is not None: return transpiler_version;
+
+    package_folder = os.path.dirname(os.path.dirname(os.path.realpath(__file__)));
+    digest = hashlib.sha256();
+
+    for root, dirs, files in os.walk(package_folder):
+        dirs.sort();
+        for name in sorted(files):
+            if not (name.endswith(".py") or name.endswith(".lua")): continue;
+
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(name.encode("utf-8"));
+                digest.update(f.read());
+
+    transpiler_version = "0.0.1+" + digest.hexdigest()[:12];
+
+    return transpiler_version;
+
+# Manifest layout:
+# {
+#     "version": transpiler version that produced the outputs,
+#     "destination": outDirectory the outputs were written to,
+#     "options": the options that change the outputs (see output_options and output_values),
+#     "files": { source path: { "source": hash, "output": output path, "output_hash": hash, "runtime": [ropy members used], "source_map": map path (if any) } },
+#     "runtime": path of the ropy.lua that was written
+# }
+def new_manifest(folder_destination: str, options: dict | None = None) -> dict:
+    return { "version": get_transpiler_version(), "destination": folder_destination, "options": get_output_options(options), "files": {} };
+
+# Transpilation options that change what's written, outputs of other options can't be reused
+output_options: list[str] = ["source_maps", "release", "rename_locals"];
+# Likewise, but numbers rather than flags (None when the default is used)
+output_values: list[str] = ["inline_budget"];
+
+def get_output_options(options: dict | None) -> dict[str, bool | int | None]:
+    if options is None: options = {};
+
+    result = { option: bool(options.get(option, False)) for option in output_options };
+    for option in output_values: result[option] = options.get(option);
+
+    return result;
+
+# Load the manifest, returns None if there's no usable manifest (i.e a full build is needed).
+# Without options, a manifest of any options will do (e.g to read the source maps it lists)
+def load_manifest(manifest_path: str, folder_destination: str, options: dict | None = None) -> dict | None:
+    if not os.path.isfile(manifest_path): return None;
+
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f);
+    except (OSError, ValueError):
+        return None;
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), dict): return None;
+
+    # Outputs of another destination can't be reused
+    if manifest.get("destination") != folder_destination: return None;
+    # e.g turning source maps on or off means writing (or removing) a map for every output
+    if options is not None and manifest.get("options") != get_output_options(options): return None;
+
+    return manifest;
+
+def save_manifest(manifest_path: str, manifest: dict) -> None:
+    manifest_folder = os.path.dirname(manifest_path);
+
+    if manifest_folder != "": os.makedirs(manifest_folder, exist_ok=True);
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True);
+
+# Check if a file's entry is still valid, i.e same source, same transpiler and an untouched output
+def is_up_to_date(manifest: dict | None, source_name: str, source_hash: str, output_name: str) -> bool:
+    if manifest is None: return False;
+
+    if manifest.get("version") != get_transpiler_version(): return False;
+
+    entry = manifest["files"].get(source_name);
+
+    if entry is None: return False;
+
+    if entry.get("source") != source_hash or entry.get("output") != output_name: return False;
+
+    return hash_file(output_name) == entry.get("output_hash");
@@ -0,0 +1,74 @@
+import os
+import threading
+import concurrent.futures
+
+# Writing the outputs. Rojo re-syncs every file whose modification time changes, which takes far longer than
+# transpiling does, so a file is only written when its content actually changed. Writes go to a temporary
+# file that's renamed over the output, so Rojo (or anything else) never reads a half written file.
+
+# Writes are mostly waiting on the disk, a few threads are enough to keep it busy
+default_threads = 4;
+
+# The content of a text file, None if it can't be read
+def read_text(file_path: str) -> str | None:
+    try:
+        with open(file_path) as f:
+            return f.read();
+    except (OSError, UnicodeDecodeError):
+        return None;
+
+# Write content to file_path unless it already holds it, returns whether the file was written
+def write_if_changed(file_path: str, content: str) -> bool:
+    # Read in text mode, so line endings compare the same way they're written
+    if read_text(file_path) == content: return False;
+
+    folder = os.path.dirname(file_path);
+    if folder != "": os.makedirs(folder, exist_ok=True);
+
+    # Next to the output so the rename stays on the same drive. Not .lua, so Rojo doesn't pick it up
+    temporary_path = file_path + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp";
+
+    try:
+        with open(temporary_path, "w") as f:
+            f.write(content);
+
+        os.replace(temporary_path, file_path);
+    except BaseException:
+        if os.path.isfile(temporary_path): os.remove(temporary_path);
+        raise;
+
+    return True;
+
+# Write every output (path -> content) that changed, returns the paths that were written
+def write_outputs(outputs: dict[str, str], threads: int = default_threads) -> list[str]:
+    if len(outputs) == 0: return [];
+
+    paths = list(outputs);
+
+    # Not worth starting threads for a single file (e.g a rebuild after one change)
+    if len(paths) == 1 or threads <= 1:
+        return [path for path in paths if write_if_changed(path, outputs[path])];
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(threads, len(paths))) as executor:
+        written = list(executor.map(lambda path: write_if_changed(path, outputs[path]), paths));
+
+    return [path for path, was_written in zip(paths, written) if was_written];
+
+# Remove every file in folder that isn't in keep (and the folders that leaves empty), returns the removed files.
+# A full build uses this instead of emptying the folder first, so unchanged outputs keep their timestamps
+def prune_folder(folder: str, keep: set[str]) -> list[str]:
+    keep = set(os.path.abspath(path) for path in keep);
+    removed = [];
+
+    for root, dirs, files in os.walk(folder, topdown=False):
+        for name in files:
+            file_path = os.path.join(root, name);
+            if os.path.abspath(file_path) in keep: continue;
+
+            os.remove(file_path);
+            removed.append(file_path);
+
+        if os.path.abspath(root) != os.path.abspath(folder) and len(os.listdir(root)) == 0:
+            os.rmdir(root);
+
+    return removed;
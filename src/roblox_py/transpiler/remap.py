@@ -0,0 +1,170 @@
+import os
+import re
+import ast
+import json
+
+from ..util.source_maps import SourceMap
+
+# Rewrites Roblox locations (ServerScriptService.Main:12) in error stack traces and profiler exports
+# into the Python they were transpiled from, using the source maps of a build (--source-maps).
+# Roblox only knows instances, so an output is found by the end of its path: src/server/combat/main.server.lua
+# is ...combat.main in Roblox, whatever the Rojo project maps src/server to
+
+# ServerScriptService.Main:12: attempt to index nil, or ServerScriptService.Main:12 function update
+location_pattern = re.compile(r"\b([A-Za-z_]\w*(?:\.\w+)+):(\d+)\b");
+# Script 'ServerScriptService.Main', Line 12 - function update
+script_pattern = re.compile(r"Script '([^']+)', Line (\d+)");
+
+# The instance names an output becomes, e.g src/shared/combat/init.lua -> ["shared", "combat"]
+def get_instance_names(output_name: str, folder_destination: str) -> list[str]:
+    names = os.path.normpath(os.path.relpath(output_name, folder_destination)).split(os.sep);
+
+    for extension in [".server.lua", ".client.lua", ".lua"]:
+        if names[-1].endswith(extension):
+            names[-1] = names[-1][:-len(extension)];
+            break;
+
+    # init scripts are their folder
+    if names[-1] == "init" and len(names) > 1: names.pop();
+
+    return names;
+
+class Remapper:
+    def __init__(self, manifest: dict):
+        self.folder_destination: str = manifest["destination"];
+        # (instance names, Python file, source map path) of every output that has a map
+        self.outputs: list[tuple[list[str], str, str]] = [];
+        # Source map path -> the map, None if it couldn't be read
+        self.source_maps: dict[str, SourceMap | None] = {};
+        # Python file -> its functions as (first line, last line, name)
+        self.functions: dict[str, list[tuple[int, int, str]]] = {};
+
+        for full_name in sorted(manifest["files"]):
+            entry = manifest["files"][full_name];
+            if entry.get("source_map") is None: continue;
+
+            self.outputs.append((get_instance_names(entry["output"], self.folder_destination), full_name, entry["source_map"]));
+
+    # The output an instance path like ServerScriptService.Combat.Main refers to: the one whose path
+    # ends the same way for the most names. Returns (Python file, source map path), None if there's no
+    # single best match
+    def find_output(self, instance_path: str) -> tuple[str, str] | None:
+        instance_names = instance_path.split(".");
+        best = None;
+        best_length = 0;
+        tied = False;
+
+        for names, full_name, source_map_name in self.outputs:
+            length = 0;
+
+            while length < min(len(names), len(instance_names)) and names[-1 - length] == instance_names[-1 - length]:
+                length = length + 1;
+
+            if length == 0 or length < best_length: continue;
+
+            tied = length == best_length;
+            best = (full_name, source_map_name);
+            best_length = length;
+
+        return None if tied else best;
+
+    def get_source_map(self, source_map_name: str) -> SourceMap | None:
+        if source_map_name not in self.source_maps:
+            try:
+                with open(source_map_name) as f:
+                    self.source_maps[source_map_name] = SourceMap.from_dict(json.load(f));
+            except (OSError, ValueError):
+                self.source_maps[source_map_name] = None;
+
+        return self.source_maps[source_map_name];
+
+    # The innermost function around a line of a Python file
+    def get_function(self, full_name: str, line: int) -> str | None:
+        if full_name not in self.functions:
+            functions = [];
+
+            try:
+                with open(full_name) as f:
+                    tree = ast.parse(f.read());
+            except (OSError, SyntaxError, ValueError):
+                tree = ast.Module(body=[], type_ignores=[]);
+
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    functions.append((node.lineno, node.end_lineno, node.name));
+
+            self.functions[full_name] = functions;
+
+        best = None;
+
+        for first, last, name in self.functions[full_name]:
+            if first <= line <= last and (best is None or first >= best[0]): best = (first, name);
+
+        return best[1] if best is not None else None;
+
+    # The Python location of a line (1 based) of the script at instance_path, None if it isn't known
+    def locate(self, instance_path: str, line: int) -> dict | None:
+        output = self.find_output(instance_path);
+        if output is None: return None;
+
+        full_name, source_map_name = output;
+
+        source_map = self.get_source_map(source_map_name);
+        if source_map is None: return None;
+
+        position = source_map.lookup(line - 1);
+        if position is None: return None;
+
+        source_line = position[0] + 1;
+
+        return { "source": full_name, "line": source_line, "function": self.get_function(full_name, source_line) };
+
+    # Stack traces, output logs, microprofiler dumps: every location that can be found is replaced
+    def remap_text(self, text: str) -> str:
+        def replace_location(match: re.Match) -> str:
+            location = self.locate(match.group(1), int(match.group(2)));
+            if location is None: return match.group(0);
+
+            return location["source"] + ":" + str(location["line"]);
+
+        def replace_script(match: re.Match) -> str:
+            location = self.locate(match.group(1), int(match.group(2)));
+            if location is None: return match.group(0);
+
+            return "File '" + location["source"] + "', Line " + str(location["line"]);
+
+        text = script_pattern.sub(replace_script, text);
+
+        return location_pattern.sub(replace_location, text);
+
+    # ScriptProfiler exports: anything with a Source and a Line gets the Python location next to them
+    def remap_json(self, data: any) -> any:
+        if isinstance(data, list):
+            for value in data: self.remap_json(value);
+
+        if not isinstance(data, dict): return data;
+
+        for value in data.values(): self.remap_json(value);
+
+        source = data.get("Source", data.get("source"));
+        line = data.get("Line", data.get("line"));
+
+        if isinstance(source, str) and isinstance(line, int) and not isinstance(line, bool):
+            location = self.locate(source, line);
+
+            if location is not None:
+                data["PythonSource"] = location["source"];
+                data["PythonLine"] = location["line"];
+                data["PythonFunction"] = location["function"];
+
+        return data;
+
+    def remap(self, text: str) -> str:
+        try:
+            data = json.loads(text);
+        except ValueError:
+            return self.remap_text(text);
+
+        if not isinstance(data, (dict, list)): return self.remap_text(text);
+
+        return json.dumps(self.remap_json(data), indent=1) + "\n";
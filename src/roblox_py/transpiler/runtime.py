@@ -0,0 +1,115 @@
+import os
+import re
+
+# The full runtime. Builds write a ropy.lua with only the members of it that the outputs use
+# (and the members those depend on), instead of shipping all of it to every place
+runtime_path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ropy_module.lua");
+
+# ropy.append.list -> append
+member_pattern = re.compile(r"\bropy\.([A-Za-z_][A-Za-z0-9_]*)");
+
+# ropy_module.lua split into its members. A member is everything from a top level "ropy.x = ..." (with
+# the comments right above it) up to the next one, so ropy.append.tuple = ... belongs to append
+class Runtime:
+    def __init__(self, source: str):
+        # Everything before the first member, i.e local ropy = {}
+        self.header: list[str] = [];
+        self.footer: list[str] = [];
+        # (member, lines) in the order they appear in, a member can have several
+        self.chunks: list[tuple[str, list[str]]] = [];
+        # Member -> the members it uses
+        self.dependencies: dict[str, set[str]] = {};
+
+        self.parse(source);
+
+    def parse(self, source: str) -> None:
+        chunk: list[str] | None = None;
+        # Blank and comment lines that haven't been given to a chunk yet
+        pending: list[str] = [];
+
+        for line in source.splitlines():
+            if line.startswith("return ropy"):
+                self.footer = [line];
+                break;
+
+            if line.startswith("ropy.") and chunk is not None and member_pattern.match(line).group(1) == self.chunks[-1][0]:
+                # More of the same member, e.g ropy.append.tuple = ropy.append.error
+                chunk.extend(pending);
+                chunk.append(line);
+                pending = [];
+                continue;
+
+            if line.startswith("ropy."):
+                # The comments right above a member describe it
+                split = len(pending);
+                while split > 0 and pending[split - 1].startswith("--"): split = split - 1;
+
+                if chunk is None: self.header = pending[:split];
+
+                member = member_pattern.match(line).group(1);
+                chunk = pending[split:] + [line];
+                pending = [];
+
+                self.chunks.append((member, chunk));
+                self.dependencies.setdefault(member, set());
+                continue;
+
+            if chunk is None or line.strip() == "" or line.startswith("--"):
+                pending.append(line);
+                continue;
+
+            chunk.extend(pending);
+            chunk.append(line);
+            pending = [];
+
+        for member, lines in self.chunks:
+            for line in lines:
+                if line.lstrip().startswith("--"): continue;
+
+                for used in member_pattern.findall(line):
+                    if used != member: self.dependencies[member].add(used);
+
+    # The members needed for references like "ropy.append.list", including their dependencies
+    def get_members(self, references: set[str]) -> set[str]:
+        members = set();
+        to_visit = [];
+
+        for reference in references:
+            match = member_pattern.match(reference);
+            if match is not None: to_visit.append(match.group(1));
+
+        while len(to_visit) > 0:
+            member = to_visit.pop();
+
+            if member in members or member not in self.dependencies: continue;
+
+            members.add(member);
+            to_visit.extend(self.dependencies[member]);
+
+        return members;
+
+    def build(self, references: set[str]) -> str:
+        members = self.get_members(references);
+        parts = ["\n".join(self.header).rstrip()];
+
+        for member, lines in self.chunks:
+            if member in members: parts.append("\n".join(lines));
+
+        parts.append("\n".join(self.footer));
+
+        return "\n\n".join(parts) + "\n";
+
+runtime: Runtime | None = None;
+
+def get_runtime() -> Runtime:
+    global runtime
+
+    if runtime is None:
+        with open(runtime_path) as f:
+            runtime = Runtime(f.read());
+
+    return runtime;
+
+# The source of a ropy.lua that has what the given references (e.g "ropy.len") need
+def build_runtime(references: set[str]) -> str:
+    return get_runtime().build(references);
@@ -0,0 +1,91 @@
+from ..util import strings as string_util;
+from ..util import minify as minify_util;
+from . import transpiler;
+from . import runtime as runtime_util;
+
+import io
+import tarfile
+from typing import BinaryIO, TextIO, Iterator
+
+# The --stdin and --tar modes: sources come in through stdin and the Luau goes out through stdout,
+# without ropy.json or any files, e.g for build machines that pipe sources straight through.
+
+# Python from input, Luau to output. Returns the exit code
+def transpile_stdin(input: TextIO, output: TextIO, errors: TextIO, options: dict | None = None) -> int:
+    # The output is held back until the module's head is known, so nothing is written if it fails
+    attempt = transpiler.transpile_source(input.read(), "<stdin>", output, options);
+
+    if "error" in attempt:
+        errors.write(attempt["error"] + "\n");
+        return 1;
+
+    return 0;
+
+# tarfile only needs to know how much it has written, which a pipe can't tell it
+class PositionWriter:
+    def __init__(self, stream: BinaryIO):
+        self.stream: BinaryIO = stream;
+        self.position: int = 0;
+
+    def write(self, data: bytes) -> int:
+        self.stream.write(data);
+        self.position = self.position + len(data);
+
+        return len(data);
+
+    def tell(self) -> int:
+        return self.position;
+
+    def flush(self) -> None:
+        self.stream.flush();
+
+# The .py files of a tar stream as (path, source), read as they're needed
+def read_sources(archive: tarfile.TarFile) -> Iterator[tuple[str, str]]:
+    for member in archive:
+        if not member.isfile() or not member.name.endswith(".py"): continue;
+
+        yield (member.name, archive.extractfile(member).read().decode("utf-8"));
+
+def add_file(archive: tarfile.TarFile, name: str, content: str) -> None:
+    data = content.encode("utf-8");
+    info = tarfile.TarInfo(name);
+    info.size = len(data);
+
+    archive.addfile(info, io.BytesIO(data));
+
+# A tar stream of .py files from input, a tar stream of their .lua files (with ropy.lua at the root) to output.
+# Every output is written (and flushed) as soon as it's done, so whoever reads the stream can start on it while
+# the rest is still transpiling. Returns the exit code
+def transpile_tar(input: BinaryIO, output: BinaryIO, errors: TextIO, workers: int = 1, options: dict | None = None) -> int:
+    references = set();
+    failed = False;
+
+    # Read a block at a time, by default the stream waits for 20 blocks before handing over the first file
+    with tarfile.open(fileobj=input, mode="r|*", bufsize=tarfile.BLOCKSIZE) as sources:
+        writer = PositionWriter(output);
+
+        with tarfile.open(fileobj=writer, mode="w", format=tarfile.PAX_FORMAT) as outputs:
+            for attempt in transpiler.transpile_sources(read_sources(sources), workers, options):
+                path = attempt["path"];
+
+                if "error" in attempt:
+                    errors.write(path + ": " + attempt["error"] + "\n");
+                    failed = True;
+                    continue;
+
+                output_name = string_util.replace_reverse(path, ".py", ".lua", 1);
+
+                add_file(outputs, output_name, attempt["result"]);
+                if "source_map" in attempt: add_file(outputs, transpiler.get_source_map_name(output_name), transpiler.get_source_map_content(attempt["source_map"], path, output_name));
+
+                references.update(attempt["runtime"]);
+                writer.flush();
+
+            runtime = runtime_util.build_runtime(references);
+            if options is not None and options.get("release"): runtime = minify_util.minify(runtime);
+
+            add_file(outputs, "ropy.lua", runtime);
+
+    output.flush();
+
+    return 1 if failed else 0;
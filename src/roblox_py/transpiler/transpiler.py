@@ -1,17 +1,34 @@
 from ..util import transpilation as transpilation_util;
 from ..util import strings as string_util;
+from ..util import profiling as profiling_util;
+from ..util import minify as minify_util;
+from . import manifest as manifest_util;
+from . import runtime as runtime_util;
+from . import output as output_util;
+from . import function_cache as function_cache_util;
 
 import os
+import sys
 import ast
+import json
+import queue
+import threading
+import functools
+import concurrent.futures
+from typing import TextIO, Iterable, Iterator
 
-def get_ast_tree(file_path: str) -> dict[str, str]:
+# options are passed on to the TranspilationContext, "profile": True also times the file's phases and handlers
+def get_ast_tree(file_path: str, stream: TextIO | None = None, options: dict | None = None) -> dict[str, str]:
     result: any = None;
     error: str | None = None;
 
+    profiler = profiling_util.Profiler() if options is not None and options.get("profile") else None;
+
     # Try to read the file given to us
     try:
-        file = open(file_path);
-        result = file.read();
+        with profiling_util.phase(profiler, "read", file_path):
+            file = open(file_path);
+            result = file.read();
     except Exception as e:
         error = file_path + " is not a valid path: " + str(e);
 
@@ -21,91 +38,374 @@ def get_ast_tree(file_path: str) -> dict[str, str]:
 
     if not isinstance(result, str): return { "error": "File is valid" };
 
+    return get_source_tree(result, file_path, stream, options, profiler);
+
+# Building the tree of a 100k term expression recurses once per term, so parsing happens on one thread, made
+# once with a stack that has room for it. The recursion limit it needs is the interpreter's, so it's raised only
+# once, and shallow parses run there too since another thread's stack couldn't take it. Parses take turns
+parse_recursion_limit = 3 * 10 ** 5;
+parse_stack_size = 256 * 1024 * 1024;
+
+parse_lock = threading.Lock();
+# The queues (source, file_path) pairs go into and (tree, error) pairs come out of
+parser: tuple[queue.Queue, queue.Queue] | None = None;
+
+def run_parser(jobs: queue.Queue, results: queue.Queue) -> None:
+    if sys.getrecursionlimit() < parse_recursion_limit: sys.setrecursionlimit(parse_recursion_limit);
+
+    while True:
+        source, file_path = jobs.get();
+
+        try:
+            results.put((ast.parse(source, file_path), None));
+        except Exception as e:
+            results.put((None, e));
+
+def start_parser() -> tuple[queue.Queue, queue.Queue]:
+    queues = (queue.Queue(), queue.Queue());
+    stack_size = threading.stack_size(parse_stack_size);
+
+    try:
+        threading.Thread(target=run_parser, args=queues, daemon=True).start();
+    finally:
+        threading.stack_size(stack_size);
+
+    return queues;
+
+# A forked worker doesn't have the parser thread, nor whoever held the lock
+def reset_parser() -> None:
+    global parse_lock, parser;
+
+    parse_lock = threading.Lock();
+    parser = None;
+
+if hasattr(os, "register_at_fork"): os.register_at_fork(after_in_child=reset_parser);
+
+def parse_source(source: str, file_path: str) -> ast.Module:
+    global parser;
+
+    with parse_lock:
+        if parser is None: parser = start_parser();
+
+        parser[0].put((source, file_path));
+        tree, error = parser[1].get();
+
+    if error is not None: raise error;
+
+    return tree;
+
+# Scripts and LocalScripts, which (unlike ModuleScripts) nothing can require
+def is_script(file_path: str) -> bool:
+    return file_path.endswith(".server.py") or file_path.endswith(".client.py");
+
+# The part of get_ast_tree after the file has been read: parse and transpile source, file_path only names it
+def get_source_tree(source: str, file_path: str, stream: TextIO | None = None, options: dict | None = None, profiler: profiling_util.Profiler | None = None) -> dict[str, str]:
 # Try ast.parse(ast.unparse(result))
     try:
-        parsed: ast.AST = ast.parse(result);
+        with profiling_util.phase(profiler, "parse", file_path):
+            parsed: ast.AST = parse_source(source, file_path);
+    except Exception as e:
+        return { "error": "Error parsing file: " + str(e) };
+
+    try:
+        context = transpilation_util.TranspilationContext(stream, options, profiler);
+        context.script = is_script(file_path);
+        # "function_cache": folder keeps the output of top level functions between builds
+        if options is not None and options.get("function_cache") is not None: context.function_cache = function_cache_util.FunctionCache(options["function_cache"], source);
+
+        with profiling_util.phase(profiler, "emit", file_path):
+            result = transpilation_util.transpile_module(parsed, context, source);
+    except transpilation_util.TranspilationError as e:
+        return { "error": "Error transpiling file: " + str(e) };
     except Exception as e:
-        error = "Error parsing file: " + str(e);
+        # A bug in a handler only fails its own file, rather than the whole build (or the worker pool)
+        return { "error": "Error transpiling file: internal error, " + type(e).__name__ + ": " + str(e) };
+
+    # The ropy members the output uses, for building ropy.lua
+    attempt = { "result": result, "error": None, "runtime": list(context.runtime_aliases) };
 
-    result = transpilation_util.transpile_module(parsed);
+    if profiler is not None: attempt["profile"] = profiler.to_dict();
+    # How much smaller the release output is than it would have been
+    if context.emitter.minify: attempt["size"] = { "before": context.emitter.unminified_size + context.renamed_size, "after": context.emitter.minified_size };
+    # Without "file" and "sources", whoever writes the map knows where it goes
+    if context.emitter.source_map is not None: attempt["source_map"] = context.emitter.source_map.to_dict();
+    if context.dead_code_size > 0: attempt["dead_code"] = context.dead_code_size;
+    if context.inlined_calls > 0: attempt["inlined"] = context.inlined_calls;
+    if context.function_cache is not None: attempt["function_cache"] = { "hits": context.function_cache.hits, "misses": context.function_cache.misses };
 
-    return { "result": result, "error": error };
+    return attempt;
 
-def transpile_file(file_path: str) -> dict[str, str]:
-    attempt = get_ast_tree(file_path);
+# If stream is given (e.g the opened output file), the Luau is written to it instead of being returned, and
+# "result" is "". Only the head of the module is kept in memory, the rest goes through a temporary file
+def transpile_file(file_path: str, stream: TextIO | None = None, options: dict | None = None) -> dict[str, str]:
+    attempt = get_ast_tree(file_path, stream, options);
 
     # Get errored file out of the way
     if attempt["error"] != None: return attempt;
-    
-    return { "result": attempt["result"] };
 
-def transpile_folder(folder_origin: str, folder_destination: str) -> dict[str, str]:
-    results = {};
-    errors = {};
+    del attempt["error"];
+
+    return attempt;
+
+# Like transpile_file, but for source text that never was (or won't be) a file, e.g from stdin or a
+# tar stream. file_path only names the source in errors
+def transpile_source(source: str, file_path: str = "<string>", stream: TextIO | None = None, options: dict | None = None) -> dict[str, str]:
+    profiler = profiling_util.Profiler() if options is not None and options.get("profile") else None;
+    attempt = get_source_tree(source, file_path, stream, options, profiler);
+
+    if attempt["error"] != None: return attempt;
+
+    del attempt["error"];
+
+    return attempt;
+
+# transpile_source for a pair of (path, source), the path is kept in the result even if it fails
+def transpile_source_pair(pair: tuple[str, str], options: dict | None = None) -> dict[str, str]:
+    attempt = transpile_source(pair[1], pair[0], None, options);
+    attempt["path"] = pair[0];
+
+    return attempt;
+
+# Transpile (path, source) pairs, yielding each result (like transpile_source's) as soon as it's done, so the
+# first outputs can be used while the rest are still transpiling. sources can be a lazy iterable (e.g a stream
+# being read), it's only read as fast as the workers get through it. With several workers, results come
+# in the order they finish in rather than the order of sources
+def transpile_sources(sources: Iterable[tuple[str, str]], workers: int = 1, options: dict | None = None) -> Iterator[dict[str, str]]:
+    if workers <= 1:
+        for pair in sources: yield transpile_source_pair(pair, options);
+        return;
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set();
+
+        for pair in sources:
+            pending.add(executor.submit(transpile_source_pair, pair, options));
+
+            # Keep every worker busy without reading far ahead of them
+            if len(pending) < workers * 2: continue;
+
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED);
+            for future in done: yield future.result();
+
+        for future in concurrent.futures.as_completed(pending): yield future.result();
+
+def get_source_files(folder_origin: str) -> list[str]:
+    full_names = [];
 
     for root, dirs, files in os.walk(folder_origin, topdown=False):
         # Loop through directories and files
         for name in files:
             # Skip non-".py" files
             if not name.endswith(".py"): continue;
-            
-            # Get full name
-            full_name = os.path.join(root, name);
 
-            # Transpile and add the result to result[name]
-            transpilation = transpile_file(full_name)
+            full_names.append(os.path.join(root, name));
 
-            if "error" in transpilation:
-                errors[full_name] = transpilation["error"];
+    return full_names;
 
-            if "result" in transpilation:
-                results[full_name] = transpilation["result"];
+def transpile_files(full_names: list[str], workers: int = 1, options: dict | None = None) -> list[dict[str, str]]:
+    # A single worker transpiles in this process, which avoids the pool start-up cost
+    if workers <= 1 or len(full_names) <= 1:
+        return [transpile_file(full_name, None, options) for full_name in full_names];
 
-    # Empty the destination FOLDER
-    for root, dirs, files in os.walk(folder_destination, topdown=False):
-        for name in files:
-            os.remove(os.path.join(root, name));
-        for name in dirs:
-            os.rmdir(os.path.join(root, name));
+    # Hand each worker several files at a time so that small files don't drown in IPC overhead
+    chunksize = max(1, len(full_names) // (workers * 4));
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() keeps the order of full_names, so results are identical to a serial build
+        return list(executor.map(functools.partial(transpile_file, stream=None, options=options), full_names, chunksize=chunksize));
+
+# Get the path a source file is written to, e.g ropy/shared/main.py -> src/shared/main.lua
+def get_output_name(full_name: str, folder_origin: str, folder_destination: str) -> str:
+    name_without_root = os.path.relpath(full_name, folder_origin);
+
+    new_file_name = os.path.join(folder_destination, name_without_root);
+
+    # Replace the last .py with .lua
+    return string_util.replace_reverse(new_file_name, ".py", ".lua", 1);
+
+# The source map of an output goes next to it, e.g main.lua.map. Rojo ignores it
+def get_source_map_name(output_name: str) -> str:
+    return output_name + ".map";
+
+# The JSON of a source map from transpile_file, pointing at the Python file relative to the map
+def get_source_map_content(source_map: dict, full_name: str, output_name: str) -> str:
+    source_map = dict(source_map);
+    source_map["file"] = os.path.basename(output_name);
+    source_map["sources"] = [os.path.relpath(full_name, os.path.dirname(output_name)).replace(os.sep, "/")];
 
-    # Get folder_destination full name
-    folder_destination_full_name = os.path.join(os.getcwd(), folder_destination);
+    return json.dumps(source_map);
+
+def is_module_script(file_name: str) -> bool:
+    # Check if file_path ends in either .client.lua or .server.lua
+    return (file_name.endswith(".lua") and 
+        not file_name.endswith(".client.lua") and
+        not file_name.endswith(".server.lua"));
+
+def remove_output(file_name: str, folder_destination: str) -> None:
+    if os.path.isfile(file_name): os.remove(file_name);
+
+    # Remove folders that were left empty, but never the destination itself
+    folder = os.path.dirname(file_name);
+
+    while (os.path.abspath(folder) != os.path.abspath(folder_destination) and
+        os.path.isdir(folder) and len(os.listdir(folder)) == 0):
+        os.rmdir(folder);
+        folder = os.path.dirname(folder);
+
+# Writes ropy.lua with the runtime members that the outputs in the manifest use (and their dependencies).
+# It goes next to the last module script, or in folder_destination if there are none.
+# Returns whether ropy.lua was written, it's left alone when it already has the right members
+def write_runtime(manifest: dict, folder_destination: str) -> bool:
+    references = set();
+    module_folder = folder_destination;
+
+    for full_name in sorted(manifest["files"]):
+        entry = manifest["files"][full_name];
+        references.update(entry.get("runtime", []));
+
+        if is_module_script(entry["output"]): module_folder = os.path.dirname(entry["output"]);
+
+    runtime_name = os.path.join(module_folder, "ropy.lua");
+    previous_name = manifest.get("runtime");
+
+    if previous_name is not None and previous_name != runtime_name:
+        remove_output(previous_name, folder_destination);
+
+    manifest["runtime"] = runtime_name;
+
+    runtime = runtime_util.build_runtime(references);
+    if manifest.get("options", {}).get("release"): runtime = minify_util.minify(runtime);
+
+    return output_util.write_if_changed(runtime_name, runtime);
+
+# When manifest_path is given, only new and changed files are transpiled and only stale outputs are
+# removed. Without a manifest (or with rebuild) everything is rebuilt and anything else in the destination is removed.
+# Either way, only outputs whose content changed are written.
+def transpile_folder(folder_origin: str, folder_destination: str, workers: int = 1, manifest_path: str | None = None, rebuild: bool = False, options: dict | None = None) -> dict[str, str]:
+    results = {};
+    errors = {};
+    skipped = [];
+    runtimes = {};
+    source_map_contents = {};
+    sizes = {};
+    # Bytes of source dead code elimination removed, per file
+    dead_code = {};
+    # Calls to small functions that were inlined, per file
+    inlined = {};
+    # Top level functions reused from earlier builds (hits) and emitted (misses), with "function_cache" in options
+    function_cache = { "hits": 0, "misses": 0 };
+
+    # Workers profile their own files, their reports are merged into this one
+    profiler = profiling_util.Profiler() if options is not None and options.get("profile") else None;
+
+    full_names = get_source_files(folder_origin);
+
+    manifest = None;
+
+    if manifest_path is not None and not rebuild:
+        manifest = manifest_util.load_manifest(manifest_path, folder_destination, options if options is not None else {});
+
+    new_manifest = manifest_util.new_manifest(folder_destination, options);
+
+    output_names = {};
+    source_hashes = {};
+    to_transpile = [];
+
+    for full_name in full_names:
+        output_names[full_name] = get_output_name(full_name, folder_origin, folder_destination);
+
+        with profiling_util.phase(profiler, "manifest", full_name):
+            source_hashes[full_name] = manifest_util.hash_file(full_name);
+
+        if manifest_util.is_up_to_date(manifest, full_name, source_hashes[full_name], output_names[full_name]):
+            new_manifest["files"][full_name] = manifest["files"][full_name];
+            skipped.append(full_name);
+            continue;
+
+        to_transpile.append(full_name);
+
+    # Transpile and add the result to result[name]
+    transpilations = transpile_files(to_transpile, workers, options);
+
+    for full_name, transpilation in zip(to_transpile, transpilations):
+        if profiler is not None and "profile" in transpilation:
+            profiler.merge(transpilation["profile"]);
+
+        if "error" in transpilation:
+            errors[full_name] = transpilation["error"];
+
+        if "result" in transpilation:
+            results[full_name] = transpilation["result"];
+            runtimes[full_name] = transpilation["runtime"];
+
+        if "size" in transpilation: sizes[full_name] = transpilation["size"];
+        if "dead_code" in transpilation: dead_code[full_name] = transpilation["dead_code"];
+        if "inlined" in transpilation: inlined[full_name] = transpilation["inlined"];
+
+        if "function_cache" in transpilation:
+            function_cache["hits"] = function_cache["hits"] + transpilation["function_cache"]["hits"];
+            function_cache["misses"] = function_cache["misses"] + transpilation["function_cache"]["misses"];
+
+        if "source_map" in transpilation:
+            source_map_contents[full_name] = get_source_map_content(transpilation["source_map"], full_name, output_names[full_name]);
+
+    if manifest is not None:
+        # Only remove outputs whose source was deleted, moved or no longer transpiles
+        for full_name in manifest["files"]:
+            entry = manifest["files"][full_name];
+            output_name = entry.get("output");
+
+            if output_name is None: continue;
+            if full_name in new_manifest["files"] or full_name in results: continue;
+
+            if entry.get("source_map") is not None: remove_output(entry["source_map"], folder_destination);
+            remove_output(output_name, folder_destination);
+
+    # Write the results that differ from what's already in the destination folder
+    outputs = { output_names[full_name]: results[full_name] for full_name in results };
+
+    for full_name in source_map_contents:
+        outputs[get_source_map_name(output_names[full_name])] = source_map_contents[full_name];
+
+    with profiling_util.phase(profiler, "write"):
+        written = output_util.write_outputs(outputs);
 
-    module_folder = "";
-    
-    # Create and write the results to the destination folder
     for full_name in results:
-        name_without_root = full_name.replace(folder_origin + "\\", "");
-
-        new_file_name = os.path.join(folder_destination_full_name, name_without_root)
-
-        # Replace the last .py with .lua
-        new_file_name = string_util.replace_reverse(new_file_name, ".py", ".lua", 1);
-
-        os.makedirs(os.path.dirname(new_file_name), exist_ok=True)
-        with open(new_file_name, "w") as f:
-            f.write(results[full_name])
-    
-        # Check if file_path ends in either .client.py or .server.py
-    
-        if (new_file_name.endswith(".lua") and 
-        not new_file_name.endswith(".client.lua") and
-        not new_file_name.endswith(".server.lua")):
-            module_folder = os.path.dirname(new_file_name);
-    
-    # Get folder of this script
-    script = os.path.dirname(os.path.realpath(__file__));
-    
-    # Get folder of script
-    script_folder = os.path.dirname(script);
-
-    # Get ropy_module.lua in script_folder
-    ropy_module = os.path.join(script_folder, "ropy_module.lua");
-
-    # Clone ropy_module.lua to module_folder
-    os.system("copy " + ropy_module + " " + module_folder);
-
-    # Rename ropy_module.lua to ropy.lua
-    os.rename(os.path.join(module_folder, "ropy_module.lua"), os.path.join(module_folder, "ropy.lua"));
-
-    return {"results": results, "errors": errors};
\ No newline at end of file
+        new_file_name = output_names[full_name];
+
+        new_manifest["files"][full_name] = {
+            "source": source_hashes[full_name],
+            "output": new_file_name,
+            # Hash what actually landed on disk, line endings may have been translated
+            "output_hash": manifest_util.hash_file(new_file_name),
+            "runtime": runtimes[full_name],
+        };
+
+        if full_name in source_map_contents: new_manifest["files"][full_name]["source_map"] = get_source_map_name(new_file_name);
+
+    # Carry over where the last build put ropy.lua, so write_runtime can remove it if it moves
+    if manifest is not None and manifest.get("runtime") is not None: new_manifest["runtime"] = manifest["runtime"];
+
+    with profiling_util.phase(profiler, "runtime"):
+        if write_runtime(new_manifest, folder_destination): written.append(new_manifest["runtime"]);
+
+    if manifest is None:
+        # Whatever the build didn't produce is left over from before
+        keep = set(entry["output"] for entry in new_manifest["files"].values());
+        keep.update(entry["source_map"] for entry in new_manifest["files"].values() if "source_map" in entry);
+        keep.add(new_manifest["runtime"]);
+
+        output_util.prune_folder(folder_destination, keep);
+
+    if manifest_path is not None:
+        manifest_util.save_manifest(manifest_path, new_manifest);
+
+    transpilation = {"results": results, "errors": errors, "skipped": skipped, "written": written, "sizes": sizes, "dead_code": dead_code, "inlined": inlined};
+
+    if options is not None and options.get("function_cache") is not None:
+        function_cache["evicted"] = function_cache_util.evict(options["function_cache"], options.get("function_cache_size", function_cache_util.default_cache_size));
+        transpilation["function_cache"] = function_cache;
+
+    if profiler is not None: transpilation["profile"] = profiler.to_dict();
+
+    return transpilation;
\ No newline at end of file
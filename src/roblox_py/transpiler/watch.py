@@ -0,0 +1,257 @@
+from . import transpiler;
+from . import manifest as manifest_util;
+from . import output as output_util;
+from . import function_cache as function_cache_util;
+
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify(7) event flags
+IN_MODIFY = 0x00000002;
+IN_CLOSE_WRITE = 0x00000008;
+IN_MOVED_FROM = 0x00000040;
+IN_MOVED_TO = 0x00000080;
+IN_CREATE = 0x00000100;
+IN_DELETE = 0x00000200;
+IN_DELETE_SELF = 0x00000400;
+IN_ISDIR = 0x40000000;
+IN_NONBLOCK = 0x00000800;
+IN_CLOEXEC = 0x00080000;
+
+watch_mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF;
+event_header = struct.Struct("iIII");
+
+# Watches folder_origin through the kernel, only available on Linux
+class InotifyWatcher:
+    def __init__(self, folder_origin: str):
+        libc_name = ctypes.util.find_library("c");
+        if libc_name is None: raise OSError("libc not found");
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True);
+        self.fd: int = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC);
+        if self.fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed");
+
+        self.folders: dict[int, str] = {};
+
+        for root, dirs, files in os.walk(folder_origin):
+            self.add_folder(root);
+
+    def add_folder(self, folder: str) -> None:
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), watch_mask);
+        if descriptor < 0: raise OSError(ctypes.get_errno(), "inotify_add_watch failed on " + folder);
+
+        self.folders[descriptor] = folder;
+
+    # Wait up to timeout seconds, returns the paths that changed (empty if nothing did)
+    def wait(self, timeout: float | None) -> set[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout);
+        if len(readable) == 0: return set();
+
+        try:
+            data = os.read(self.fd, 64 * 1024);
+        except BlockingIOError:
+            return set();
+
+        changed = set();
+        offset = 0;
+
+        while offset < len(data):
+            descriptor, mask, cookie, length = event_header.unpack_from(data, offset);
+            offset = offset + event_header.size;
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"));
+            offset = offset + length;
+
+            folder = self.folders.get(descriptor);
+            if folder is None: continue;
+
+            if mask & IN_DELETE_SELF:
+                del self.folders[descriptor];
+                continue;
+
+            path = os.path.join(folder, name);
+
+            if mask & IN_ISDIR:
+                # New folders need their own watch, and may already contain files (e.g when moved in)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for root, dirs, files in os.walk(path):
+                        self.add_folder(root);
+                        changed.update(os.path.join(root, file) for file in files);
+                continue;
+
+            changed.add(path);
+
+        return changed;
+
+    def close(self) -> None:
+        os.close(self.fd);
+
+# Fallback for platforms without inotify, compares modification times every interval
+class PollingWatcher:
+    def __init__(self, folder_origin: str, interval: float = 0.25):
+        self.folder_origin: str = folder_origin;
+        self.interval: float = interval;
+        self.snapshot: dict[str, tuple[int, int]] = self.take_snapshot();
+
+    def take_snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {};
+
+        for full_name in transpiler.get_source_files(self.folder_origin):
+            try:
+                stat = os.stat(full_name);
+            except OSError:
+                continue;
+
+            snapshot[full_name] = (stat.st_mtime_ns, stat.st_size);
+
+        return snapshot;
+
+    def wait(self, timeout: float | None) -> set[str]:
+        deadline = None if timeout is None else time.perf_counter() + timeout;
+
+        while True:
+            new_snapshot = self.take_snapshot();
+            changed = set();
+
+            for full_name in set(self.snapshot) | set(new_snapshot):
+                if self.snapshot.get(full_name) != new_snapshot.get(full_name):
+                    changed.add(full_name);
+
+            self.snapshot = new_snapshot;
+
+            if len(changed) > 0: return changed;
+
+            if deadline is not None and time.perf_counter() >= deadline: return changed;
+
+            sleep_for = self.interval if deadline is None else min(self.interval, max(0, deadline - time.perf_counter()));
+            time.sleep(sleep_for);
+
+    def close(self) -> None:
+        pass;
+
+def get_watcher(folder_origin: str, polling: bool = False) -> InotifyWatcher | PollingWatcher:
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder_origin);
+        except OSError as e:
+            print("Warning: inotify unavailable (" + str(e) + "), falling back to polling");
+
+    return PollingWatcher(folder_origin);
+
+# Transpile the given changed paths and update the manifest, returns how long each file took
+def transpile_changes(changed: set[str], folder_origin: str, folder_destination: str, manifest: dict, options: dict | None = None) -> dict[str, dict]:
+    reports = {};
+
+    for full_name in sorted(changed):
+        if not full_name.endswith(".py"): continue;
+
+        start_time = time.perf_counter();
+        output_name = transpiler.get_output_name(full_name, folder_origin, folder_destination);
+        source_hash = manifest_util.hash_file(full_name);
+
+        # Deleted (or moved away) sources take their output with them
+        if source_hash is None:
+            if full_name not in manifest["files"]: continue;
+
+            entry = manifest["files"].pop(full_name);
+            if entry.get("source_map") is not None: transpiler.remove_output(entry["source_map"], folder_destination);
+            transpiler.remove_output(output_name, folder_destination);
+            reports[full_name] = { "status": "removed", "ms": (time.perf_counter() - start_time) * 1000 };
+            continue;
+
+        # Editors tend to touch files without changing them
+        if manifest_util.is_up_to_date(manifest, full_name, source_hash, output_name): continue;
+
+        transpilation = transpiler.transpile_file(full_name, options=options);
+
+        if "error" in transpilation:
+            reports[full_name] = { "status": "error", "error": transpilation["error"], "ms": (time.perf_counter() - start_time) * 1000 };
+            continue;
+
+        written = output_util.write_if_changed(output_name, transpilation["result"]);
+
+        manifest["files"][full_name] = {
+            "source": source_hash,
+            "output": output_name,
+            "output_hash": manifest_util.hash_file(output_name),
+            "runtime": transpilation["runtime"],
+        };
+
+        if "source_map" in transpilation:
+            source_map_name = transpiler.get_source_map_name(output_name);
+            output_util.write_if_changed(source_map_name, transpiler.get_source_map_content(transpilation["source_map"], full_name, output_name));
+            manifest["files"][full_name]["source_map"] = source_map_name;
+
+        # e.g only a comment changed, the output stays as it was so Rojo has nothing to sync
+        reports[full_name] = { "status": "transpiled" if written else "unchanged", "ms": (time.perf_counter() - start_time) * 1000 };
+        if "function_cache" in transpilation: reports[full_name]["function_cache"] = transpilation["function_cache"];
+        if "dead_code" in transpilation: reports[full_name]["dead_code"] = transpilation["dead_code"];
+        if "inlined" in transpilation: reports[full_name]["inlined"] = transpilation["inlined"];
+
+    return reports;
+
+# Keep transpiling folder_origin into folder_destination as files change, until interrupted.
+# debounce is how long (in seconds) to wait for a burst of changes to settle before transpiling.
+def watch(folder_origin: str, folder_destination: str, manifest_path: str, workers: int = 1, debounce: float = 0.05, polling: bool = False, options: dict | None = None) -> None:
+    # Start from an up-to-date destination
+    build = transpiler.transpile_folder(folder_origin, folder_destination, workers, manifest_path, options=options);
+
+    for full_name in build["errors"]:
+        print("Error: " + build["errors"][full_name]);
+
+    print("Built " + str(len(build["results"])) + " files (" + str(len(build["skipped"])) + " unchanged, " + str(len(build["written"])) + " outputs written), watching " + folder_origin + " for changes");
+
+    manifest = manifest_util.load_manifest(manifest_path, folder_destination, options if options is not None else {});
+    if manifest is None: manifest = manifest_util.new_manifest(folder_destination, options);
+
+    watcher = get_watcher(folder_origin, polling);
+
+    try:
+        while True:
+            changed = watcher.wait(None);
+            if len(changed) == 0: continue;
+
+            detected_time = time.perf_counter();
+
+            # Saving often produces several events (truncate, write, rename), collect them all first
+            while True:
+                more = watcher.wait(debounce);
+                if len(more) == 0: break;
+                changed.update(more);
+
+            reports = transpile_changes(changed, folder_origin, folder_destination, manifest, options);
+
+            if len(reports) == 0: continue;
+
+            # The changes may use runtime members that ropy.lua doesn't have yet
+            transpiler.write_runtime(manifest, folder_destination);
+            manifest_util.save_manifest(manifest_path, manifest);
+
+            if options is not None and options.get("function_cache") is not None:
+                function_cache_util.evict(options["function_cache"], options.get("function_cache_size", function_cache_util.default_cache_size));
+
+            latency = (time.perf_counter() - detected_time) * 1000;
+
+            for full_name in reports:
+                report = reports[full_name];
+                line = report["status"].capitalize() + " " + full_name + " in " + str(round(report["ms"], 1)) + " ms";
+
+                if report["status"] == "error": line = line + ": " + report["error"];
+
+                # Only the functions that changed had to be emitted again
+                if "function_cache" in report:
+                    cache = report["function_cache"];
+                    line = line + " (" + str(cache["hits"]) + " of " + str(cache["hits"] + cache["misses"]) + " functions cached)";
+
+                if "dead_code" in report: line = line + " (" + str(report["dead_code"]) + " bytes of dead code eliminated)";
+                if "inlined" in report: line = line + " (" + str(report["inlined"]) + " call sites inlined)";
+
+                print(line);
+
+            print("Change handled " + str(round(latency, 1)) + " ms after it was detected (including " + str(round(debounce * 1000)) + " ms debounce)");
+    finally:
+        watcher.close();
@@ -0,0 +1,211 @@
+import shutil
+import tempfile
+from typing import TextIO
+
+from .source_maps import SourceMap, marker
+from .minify import minify
+
+# Collects the transpiled Luau as a list of fragments instead of growing one string,
+# so emitting a module is linear in the size of its output.
+# If a stream is given, fragments are written to it as they come in (outside of captures),
+# or to a temporary file while the head of the output isn't known yet (see reserve_head).
+class Emitter:
+    def __init__(self, stream: TextIO | None = None, indent: str = "\t", buffer_size: int = 64 * 1024):
+        self.stream: TextIO | None = stream;
+        self.indent: str = indent;
+        self.buffer_size: int = buffer_size;
+        self.fragments: list[str] = [];
+        self.buffered: int = 0;
+        # Stack of fragment lists of the captures that are in progress
+        self.captures: list[list[str]] = [];
+        # Cache of indentation strings, index is the level
+        self.indents: list[str] = [""];
+        # Amount of reserved slots that haven't been filled yet, nothing can be streamed past them
+        self.pending_slots: int = 0;
+        # Start of the output that's held back until it's complete, and where what follows it streams to meanwhile
+        self.head: list[str] | None = None;
+        self.spill: TextIO | None = None;
+        # Release output is minified as a whole, so it's only streamed once it's complete
+        self.minify: bool = False;
+        # Output that getvalue already finalised
+        self.value: str = "";
+        # Size of the output before and after minifying it
+        self.unminified_size: int = 0;
+        self.minified_size: int = 0;
+        # Set to record where the output's lines come from, see mark()
+        self.source_map: SourceMap | None = None;
+        # Marker index -> the source position it stands for
+        self.markers: list[tuple[int, int]] = [];
+        # Position in the output of everything resolved so far (0 based, like the source map)
+        self.line: int = 0;
+        self.column: int = 0;
+
+    def get_indent(self, level: int) -> str:
+        if level < 0: level = 0;
+
+        while len(self.indents) <= level:
+            self.indents.append(self.indents[-1] + self.indent);
+
+        return self.indents[level];
+
+    def write(self, fragment: str) -> None:
+        if len(self.captures) > 0:
+            self.captures[-1].append(fragment);
+            return;
+
+        self.fragments.append(fragment);
+
+        if self.stream is None: return;
+
+        self.buffered = self.buffered + len(fragment);
+
+        if self.buffered >= self.buffer_size and not self.minify: self.flush();
+
+    # Reserve a place in the output that is filled in later (e.g declarations that are only
+    # known once a function's body has been emitted), without re-joining what comes after it
+    def reserve(self) -> tuple[list[str], int]:
+        target = self.captures[-1] if len(self.captures) > 0 else self.fragments;
+        target.append("");
+        self.pending_slots = self.pending_slots + 1;
+
+        return (target, len(target) - 1);
+
+    # Reserve a place at the end of everything written so far, which makes all of it the head of the output
+    # (e.g the runtime aliases, only known once the module has been emitted). What comes after can still be streamed
+    def reserve_head(self) -> tuple[list[str], int]:
+        self.head = self.fragments;
+        self.head.append("");
+        self.fragments = [];
+        self.buffered = 0;
+
+        return (self.head, len(self.head) - 1);
+
+    def fill(self, slot: tuple[list[str], int], text: str) -> None:
+        slot[0][slot[1]] = text;
+
+        if slot[0] is self.head: return;
+
+        self.pending_slots = self.pending_slots - 1;
+
+        if self.stream is not None: self.buffered = self.buffered + len(text);
+
+    # Everything written between begin_capture and end_capture is returned by end_capture
+    # instead of being emitted, for when the output has to be inspected or reordered first
+    def begin_capture(self) -> None:
+        self.captures.append([]);
+
+    def end_capture(self) -> str:
+        return "".join(self.captures.pop());
+
+    # Mark that the output at this point comes from source_line (1 based, like ast) and source_column.
+    # Output moves around in captures and slots before it's final, so the marker is written into it
+    # and only turned into a mapping once the final position is known
+    def mark(self, source_line: int, source_column: int) -> None:
+        if self.source_map is None: return;
+
+        # Before it's written, which can flush it
+        self.markers.append((source_line - 1, source_column));
+        self.write(marker + str(len(self.markers) - 1) + marker);
+
+    # Swap the markers in final output for mappings, keeping track of where the output is at
+    def resolve_markers(self, text: str) -> str:
+        if self.source_map is None: return text;
+
+        parts = text.split(marker);
+        output = [];
+
+        # Text and marker indices alternate
+        for i in range(0, len(parts)):
+            part = parts[i];
+
+            if i % 2 == 1:
+                source_line, source_column = self.markers[int(part)];
+                self.source_map.add(self.line, self.column, source_line, source_column);
+                continue;
+
+            output.append(part);
+
+            newlines = part.count("\n");
+
+            if newlines > 0:
+                self.line = self.line + newlines;
+                self.column = len(part) - part.rfind("\n") - 1;
+            else:
+                self.column = self.column + len(part);
+
+        return "".join(output);
+
+    # Output that won't change anymore: minified if it's a release, with its markers swapped for mappings
+    def finalise(self, text: str) -> str:
+        if self.minify:
+            self.unminified_size = self.unminified_size + len(text);
+            text = minify(text);
+            self.minified_size = self.minified_size + len(text);
+
+        return self.resolve_markers(text);
+
+    def flush(self) -> None:
+        if self.stream is None or self.pending_slots > 0: return;
+
+        text = self.finalise("".join(self.fragments));
+        self.fragments = [];
+        self.buffered = 0;
+
+        if self.head is None:
+            self.stream.write(text);
+            return;
+
+        if self.spill is None: self.spill = tempfile.TemporaryFile("w+", encoding="utf-8");
+        self.spill.write(text);
+
+    # Write the completed head to the stream, followed by what was spilled while it wasn't complete
+    def flush_head(self) -> None:
+        if self.spill is None:
+            self.fragments = self.head + self.fragments;
+            self.head = None;
+            self.flush();
+            return;
+
+        # The rest of the body goes after what's already spilled
+        self.flush();
+        head = self.head;
+        self.head = None;
+
+        # What's spilled was finalised as if it started the output, so its mappings move down by the head's size
+        body_mappings = [];
+
+        if self.source_map is not None:
+            body_mappings = self.source_map.mappings;
+            self.source_map.mappings = [];
+
+        self.line = 0;
+        self.column = 0;
+        self.stream.write(self.finalise("".join(head)));
+
+        for line, column, source_line, source_column in body_mappings:
+            if line == 0: column = column + self.column;
+            self.source_map.add(line + self.line, column, source_line, source_column);
+
+        self.spill.seek(0);
+        shutil.copyfileobj(self.spill, self.stream);
+        self.spill.close();
+        self.spill = None;
+
+    # Returns everything emitted so far, or "" if it has been streamed
+    def getvalue(self) -> str:
+        if self.stream is not None:
+            if self.head is not None: self.flush_head();
+            else: self.flush();
+
+            return "";
+
+        if self.head is not None:
+            self.fragments = self.head + self.fragments;
+            self.head = None;
+
+        # Only finalise what wasn't yet, so repeated calls neither re-join nor count the sizes again
+        if len(self.fragments) > 0:
+            self.value = self.value + self.finalise("".join(self.fragments));
+            self.fragments = [];
+
+        return self.value;
@@ -0,0 +1,55 @@
+import ast
+
+# Local type inference: what a name holds as far as the builtins are concerned, worked out from the
+# literals, builtin constructors and annotations it's assigned. Types are "list", "dict", "set" and "str",
+# a name only has one when every assignment to it agrees (see Scope.set_type).
+
+# Builtin constructors -> the type they return
+constructors: dict[str, str] = {
+    "list": "list",
+    "dict": "dict",
+    "set": "set",
+    "str": "str",
+};
+
+# Annotations -> type, including the aliases from typing
+annotations: dict[str, str] = {
+    "list": "list",
+    "List": "list",
+    "dict": "dict",
+    "Dict": "dict",
+    "set": "set",
+    "Set": "set",
+    "str": "str",
+};
+
+# The type of a literal (or comprehension), None for anything else
+def infer_type(node: ast.expr) -> str | None:
+    node_type = type(node);
+
+    if node_type is ast.List or node_type is ast.ListComp: return "list";
+    if node_type is ast.Dict or node_type is ast.DictComp: return "dict";
+    if node_type is ast.Set or node_type is ast.SetComp: return "set";
+    if node_type is ast.JoinedStr: return "str";
+    if node_type is ast.Constant and isinstance(node.value, str): return "str";
+
+    return None;
+
+# The type a call to a builtin constructor returns (e.g list(x) -> "list"), the caller has to check
+# that the module doesn't define a function of the same name
+def get_constructor_type(node: ast.expr) -> str | None:
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)): return None;
+
+    return constructors.get(node.func.id);
+
+# The type an annotation stands for, e.g list[int] -> "list", None if it isn't one of the known types
+def get_annotation_type(node: ast.expr | None) -> str | None:
+    if isinstance(node, ast.Subscript): node = node.value;
+
+    if isinstance(node, ast.Name): return annotations.get(node.id);
+
+    # typing.List and the like
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "typing":
+        return annotations.get(node.attr);
+
+    return None;
@@ -0,0 +1,129 @@
+import ast
+
+# Python annotations -> Luau type annotations, e.g list[int] -> {number}, Optional[str] -> string?
+# Luau only checks these (and uses them for native code generation), they never change what the code does,
+# so names that aren't known here (Roblox types like Part or Vector3, user types) are written as they are
+
+simple_types: dict[str, str] = {
+    "int": "number",
+    "float": "number",
+    "str": "string",
+    "bytes": "string",
+    "bool": "boolean",
+    "None": "nil",
+    "object": "any",
+    "Any": "any",
+};
+
+# Generic containers that are arrays in Luau -> written as {T}
+array_types: set[str] = { "list", "List", "set", "Set", "frozenset", "FrozenSet", "Sequence", "Iterable", "Iterator", "Generator", "tuple", "Tuple" };
+
+# What a generator can be annotated to return -> the type of the items is their first argument
+iterator_types: set[str] = { "Iterable", "Iterator", "Generator" };
+
+# Generic containers that are keyed tables in Luau -> written as {[K]: V}
+map_types: set[str] = { "dict", "Dict", "Mapping", "MutableMapping" };
+
+def get_name(node: ast.expr) -> str | None:
+    if isinstance(node, ast.Name): return node.id;
+
+    # typing.List and the like
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "typing": return node.attr;
+
+    return None;
+
+# T?, with parentheses around types the ? would only apply part of
+def as_optional(luau_type: str) -> str:
+    if luau_type == "nil" or luau_type == "any" or luau_type.endswith("?"): return luau_type;
+    if " | " in luau_type or "->" in luau_type: return "(" + luau_type + ")?";
+
+    return luau_type + "?";
+
+def to_union(luau_types: list[str]) -> str:
+    unique = [];
+
+    for luau_type in luau_types:
+        if luau_type not in unique: unique.append(luau_type);
+
+    # T | nil is written T?
+    if "nil" in unique and len(unique) > 1:
+        unique.remove("nil");
+        return as_optional(to_union(unique));
+
+    return " | ".join(unique);
+
+def get_arguments(node: ast.expr) -> list[ast.expr]:
+    return list(node.elts) if isinstance(node, ast.Tuple) else [node];
+
+def to_luau_type(node: ast.expr | None) -> str | None:
+    if node is None: return None;
+
+    # Forward references: "Part"
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        try:
+            return to_luau_type(ast.parse(node.value, mode="eval").body);
+        except SyntaxError:
+            return "any";
+
+    if isinstance(node, ast.Constant) and node.value is None: return "nil";
+
+    # int | None
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return to_union([to_luau_type(node.left), to_luau_type(node.right)]);
+
+    name = get_name(node);
+
+    if name is not None:
+        if name in simple_types: return simple_types[name];
+        if name in array_types: return "{any}";
+        if name in map_types: return "{[any]: any}";
+        if name == "Callable": return "(...any) -> ...any";
+        if isinstance(node, ast.Name): return name;
+
+    if isinstance(node, ast.Attribute):
+        # e.g Enum.Material, typing members that aren't known are any
+        return ast.unparse(node) if name is None else "any";
+
+    if not isinstance(node, ast.Subscript): return "any";
+
+    name = get_name(node.value);
+    arguments = get_arguments(node.slice);
+
+    if name in array_types:
+        # tuple[int, ...] or tuple[int, str]
+        if name in ["tuple", "Tuple"]: arguments = [argument for argument in arguments if not (isinstance(argument, ast.Constant) and argument.value is Ellipsis)];
+        # Generator[yield, send, return] only yields its first
+        if name == "Generator": arguments = arguments[:1];
+
+        return "{" + to_union([to_luau_type(argument) for argument in arguments]) + "}";
+
+    if name in map_types and len(arguments) == 2:
+        return "{[" + to_luau_type(arguments[0]) + "]: " + to_luau_type(arguments[1]) + "}";
+
+    if name == "Optional": return as_optional(to_luau_type(arguments[0]));
+    if name == "Union": return to_union([to_luau_type(argument) for argument in arguments]);
+
+    if name == "Callable" and len(arguments) == 2:
+        # Callable[..., int]
+        parameters = "...any";
+        if isinstance(arguments[0], ast.List): parameters = ", ".join([to_luau_type(argument) for argument in arguments[0].elts]);
+
+        return "(" + parameters + ") -> " + to_return_type(arguments[1]);
+
+    return "any";
+
+# Like to_luau_type, but a function that returns None returns nothing in Luau
+def to_return_type(node: ast.expr | None) -> str | None:
+    luau_type = to_luau_type(node);
+
+    return "()" if luau_type == "nil" else luau_type;
+
+# A function that yields returns the iterator function of a for loop instead, which gives the index
+# and the item (both nil once it's done)
+def to_generator_type(node: ast.expr | None) -> str | None:
+    if node is None: return None;
+
+    item_type = "any";
+    if isinstance(node, ast.Subscript) and get_name(node.value) in iterator_types: item_type = to_luau_type(get_arguments(node.slice)[0]);
+
+    return "(...any) -> (number?, " + as_optional(item_type) + ")";
@@ -0,0 +1,119 @@
+import re
+
+# Release output: the emitted Luau without indentation, comments, blank lines, redundant semicolons and the
+# spaces that aren't needed to keep tokens apart. Statements keep their own line, a line break costs as much
+# as the space or semicolon that would have to replace it, and keeps the line numbers in Roblox's errors useful.
+# Works on the tokens of the output, so it doesn't need to know how anything was emitted. Source map markers
+# (see source_maps.py) are kept in front of the token they belong to.
+
+# Spaces in front of a token are part of its match, which halves how many matches there are
+token_pattern = re.compile(r"""
+    [ \t\r\f\v]*
+    (?: (?P<newline>\n)
+    | (?P<comment>--(?:\[(?P<comment_level>=*)\[[\s\S]*?\](?P=comment_level)\]|[^\n]*))
+    | (?P<string>"(?:\\[\s\S]|[^"\\\n])*"|'(?:\\[\s\S]|[^'\\\n])*'|`(?:\\[\s\S]|[^`\\])*`|\[(?P<string_level>=*)\[[\s\S]*?\](?P=string_level)\])
+    | (?P<number>0[xXbB][0-9a-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)
+    | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<marker>\0\d+\0)
+    | (?P<symbol>\.\.\.|\.\.=|//=|==|~=|<=|>=|\.\.|//|->|::|\+=|-=|\*=|/=|%=|\^=|[-+*/%^#&~|<>=(){}\[\];:,.@?])
+    | (?P<error>[\s\S]) )
+""", re.VERBOSE);
+
+word_characters = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_");
+
+class MinifyError(Exception):
+    pass
+
+# (kind, text) of every token, including line breaks and comments but not spaces
+def tokenize(source: str) -> list[tuple[str, str]]:
+    # The outer group is the last one to close, so lastgroup is never a level
+    tokens = [(match.lastgroup, match.group(match.lastgroup)) for match in token_pattern.finditer(source)];
+
+    for kind, text in tokens:
+        if kind == "error": raise MinifyError("can't read the output at \"" + text + "\"");
+
+    return tokens;
+
+# Whether the two tokens would run together (or into a different token) without a space between them
+def needs_space(previous: tuple[str, str], token: tuple[str, str]) -> bool:
+    previous_kind, previous_text = previous;
+    kind, text = token;
+
+    if previous_text[-1] in word_characters and text[0] in word_characters: return True;
+
+    # 1 .. x, 1. would be part of the number
+    if previous_kind == "number" and text[0] == ".": return True;
+
+    if previous_kind == "symbol" and (kind == "symbol" or kind == "string"):
+        # - - would start a comment, [ [ or [ = a long string
+        if previous_text == "-" and text[0] == "-": return True;
+        if previous_text == "[" and text[0] in "[=": return True;
+
+        # e.g . . would be .., = = would be ==
+        return token_pattern.match(previous_text + text).group(0) != previous_text;
+
+    return False;
+
+def minify(source: str) -> str:
+    output = [];
+    previous = None;
+    # Whether a line break was skipped since the previous token
+    line_break = False;
+    # Open brackets, semicolons inside a table constructor separate its fields
+    brackets = [];
+    # Directive comments (--!native) have to stay, on their own line before any code
+    at_start = True;
+    # Markers wait for the space or line break in front of the token they're attached to
+    markers = [];
+    tokens = tokenize(source);
+
+    for i in range(0, len(tokens)):
+        kind, text = tokens[i];
+
+        if kind == "newline":
+            line_break = True;
+            continue;
+
+        if kind == "comment":
+            if at_start and text.startswith("--!"): output.append(text + "\n");
+            continue;
+
+        # The emitter turns these into source map positions once the output is final
+        if kind == "marker":
+            markers.append(text);
+            continue;
+
+        at_start = False;
+
+        if kind == "symbol" and text in ["(", "{", "["]: brackets.append(text);
+        if kind == "symbol" and text in [")", "}", "]"] and len(brackets) > 0: brackets.pop();
+
+        if kind == "symbol" and text == ";" and len(brackets) == 0:
+            following = get_next_token(tokens, i + 1);
+
+            # A statement that starts with ( could be read as a call of the previous one
+            if following is None or following[1] != "(": continue;
+
+        if previous is not None:
+            if line_break:
+                output.append("\n");
+            elif needs_space(previous, (kind, text)):
+                output.append(" ");
+
+        output.extend(markers);
+        markers = [];
+        output.append(text);
+        previous = (kind, text);
+        line_break = False;
+
+    output.extend(markers);
+    if previous is not None: output.append("\n");
+
+    return "".join(output);
+
+# The next token that isn't whitespace, a comment or a marker
+def get_next_token(tokens: list[tuple[str, str]], start: int) -> tuple[str, str] | None:
+    for i in range(start, len(tokens)):
+        if tokens[i][0] not in ["newline", "comment", "marker"]: return tokens[i];
+
+    return None;
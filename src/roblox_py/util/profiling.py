@@ -0,0 +1,127 @@
+import time
+import contextlib
+from typing import Callable, Iterator
+
+# Records where a build spends its time: per node handler, per phase and per file.
+# A profiler only ever sees one process; profiles of worker processes are combined with merge().
+class Profiler:
+    def __init__(self):
+        # Handler name -> [calls, total seconds, self seconds (total minus nested handlers)]
+        self.handlers: dict[str, list] = {};
+        # Phase name (read, parse, emit, write, ...) -> seconds
+        self.phases: dict[str, float] = {};
+        # File -> phase name -> seconds
+        self.files: dict[str, dict[str, float]] = {};
+        # Time spent in nested handlers, one entry per handler currently running
+        self.nested_times: list[float] = [];
+
+    def call(self, handler: Callable, node: any, block: any) -> any:
+        start_time = self.enter();
+
+        try:
+            return handler(node, block);
+        finally:
+            self.leave(handler.__name__, start_time);
+
+    # Time a handler that can't be wrapped in call(), e.g a frame of transpile_nested's stack. Every enter()
+    # needs a leave(), in reverse order
+    def enter(self) -> float:
+        self.nested_times.append(0.0);
+
+        return time.perf_counter();
+
+    def leave(self, name: str, start_time: float) -> None:
+        elapsed = time.perf_counter() - start_time;
+        nested = self.nested_times.pop();
+
+        stats = self.handlers.get(name);
+        if stats is None:
+            stats = [0, 0.0, 0.0];
+            self.handlers[name] = stats;
+
+        stats[0] = stats[0] + 1;
+        stats[1] = stats[1] + elapsed;
+        stats[2] = stats[2] + elapsed - nested;
+
+        # Let the handler we're nested in know how much of its time was ours
+        if len(self.nested_times) > 0: self.nested_times[-1] = self.nested_times[-1] + elapsed;
+
+    def add_phase(self, name: str, file: str | None, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds;
+
+        if file is None: return;
+
+        file_phases = self.files.setdefault(file, {});
+        file_phases[name] = file_phases.get(name, 0.0) + seconds;
+
+    @contextlib.contextmanager
+    def phase(self, name: str, file: str | None = None) -> Iterator[None]:
+        start_time = time.perf_counter();
+
+        try:
+            yield;
+        finally:
+            self.add_phase(name, file, time.perf_counter() - start_time);
+
+    def merge(self, report: dict) -> None:
+        for name in report["handlers"]:
+            stats = report["handlers"][name];
+            mine = self.handlers.setdefault(name, [0, 0.0, 0.0]);
+            mine[0] = mine[0] + stats["calls"];
+            mine[1] = mine[1] + stats["total_seconds"];
+            mine[2] = mine[2] + stats["self_seconds"];
+
+        for name in report["phases"]:
+            self.phases[name] = self.phases.get(name, 0.0) + report["phases"][name];
+
+        for file in report["files"]:
+            for name in report["files"][file]:
+                if name == "total": continue;
+                file_phases = self.files.setdefault(file, {});
+                file_phases[name] = file_phases.get(name, 0.0) + report["files"][file][name];
+
+    # JSON friendly report
+    def to_dict(self) -> dict:
+        handlers = {};
+
+        for name in self.handlers:
+            stats = self.handlers[name];
+            handlers[name] = { "calls": stats[0], "total_seconds": stats[1], "self_seconds": stats[2] };
+
+        files = {};
+
+        for file in self.files:
+            files[file] = dict(self.files[file]);
+            files[file]["total"] = sum(self.files[file].values());
+
+        return { "handlers": handlers, "phases": dict(self.phases), "files": files };
+
+    def summary(self, limit: int = 10) -> str:
+        report = self.to_dict();
+        lines = [];
+
+        lines.append("Phases:");
+        for name in report["phases"]:
+            lines.append("  " + name.ljust(24) + format_ms(report["phases"][name]));
+
+        lines.append("Handlers (by self time):");
+        lines.append("  " + "handler".ljust(24) + "calls".rjust(10) + "self".rjust(12) + "total".rjust(12));
+        handlers = sorted(report["handlers"].items(), key=lambda item: item[1]["self_seconds"], reverse=True);
+        for name, stats in handlers[:limit]:
+            lines.append("  " + name.ljust(24) + str(stats["calls"]).rjust(10) + format_ms(stats["self_seconds"]).rjust(12) + format_ms(stats["total_seconds"]).rjust(12));
+
+        lines.append("Slowest files:");
+        files = sorted(report["files"].items(), key=lambda item: item[1]["total"], reverse=True);
+        for file, phases in files[:limit]:
+            lines.append("  " + format_ms(phases["total"]).rjust(10) + "  " + file);
+
+        return "\n".join(lines);
+
+def format_ms(seconds: float) -> str:
+    return str(round(seconds * 1000, 2)) + " ms";
+
+# Time a phase if there's a profiler, do nothing otherwise
+def phase(profiler: Profiler | None, name: str, file: str | None = None) -> contextlib.AbstractContextManager:
+    if profiler is None: return contextlib.nullcontext();
+
+    return profiler.phase(name, file);
@@ -0,0 +1,295 @@
+import ast
+from typing_extensions import Self
+
+from . import inference
+
+# The names of a single function (or of the module), gathered before emission
+class Scope:
+    def __init__(self, kind: str, node: ast.AST, parent: Self | None = None):
+        self.kind: str = kind; # "module" | "function"
+        self.node: ast.AST = node;
+        self.parent: Self | None = parent;
+        self.children: list[Self] = [];
+        # Name -> the Assign node that first assigns it
+        self.first_assignments: dict[str, ast.AST] = {};
+        # Names first assigned in the scope's own block, these get "local" where they're assigned
+        self.surface: set[str] = set();
+        # Names first assigned in a nested block (if, for, while, ...), in order,
+        # these are declared at the top of the function so they outlive the block
+        self.deep: dict[str, None] = {};
+        self.globals: set[str] = set();
+        self.nonlocals: set[str] = set();
+        # Name -> the first for loop that has it as its target, for names that aren't assigned before the loop
+        self.loop_targets: dict[str, ast.For] = {};
+        # Functions defined directly in this scope, by name
+        self.functions: dict[str, ast.FunctionDef] = {};
+        self.parameters: set[str] = set();
+        # Name -> its inferred type ("list", "dict", "set", "str"), None if it isn't known. Every name
+        # the scope binds has an entry, so this also tells whether a name is local to the scope
+        self.types: dict[str, str | None] = {};
+        # Name -> its annotation (x: int = 1), the first one if it's annotated more than once
+        self.annotations: dict[str, ast.expr] = {};
+        # Names whose type comes from calling a builtin constructor (e.g list()), which could be redefined
+        self.constructed: set[str] = set();
+        # Whether the function yields, i.e returns a generator
+        self.generator: bool = False;
+
+    def assign(self, name: str, node: ast.AST, deep: bool) -> None:
+        # Parameters are already locals of the function
+        if name in self.globals or name in self.nonlocals or name in self.parameters: return;
+        if name in self.first_assignments: return;
+
+        self.first_assignments[name] = node;
+
+        if deep:
+            self.deep[name] = None;
+        else:
+            self.surface.add(name);
+
+    # Assignments that disagree on the type leave the name without one
+    def set_type(self, name: str, type: str | None) -> None:
+        # Those are bound by another scope, which finds out in settle_types
+        if name in self.globals or name in self.nonlocals: return;
+
+        if name in self.types and self.types[name] != type: type = None;
+
+        self.types[name] = type;
+
+    # The type of name where it's used in this scope, from the scope that binds it
+    def get_type(self, name: str) -> str | None:
+        scope = self;
+
+        while scope is not None:
+            if name in scope.globals:
+                while scope.parent is not None: scope = scope.parent;
+                return scope.types.get(name);
+
+            if name in scope.types and name not in scope.nonlocals: return scope.types[name];
+
+            scope = scope.parent;
+
+        return None;
+
+    # A name that's both a loop target and assigned elsewhere has to outlive the loop (python
+    # keeps the last value), so it's declared at the top of the function like a deep name.
+    # So does one that's only a loop target, but is read after the loop
+    def settle_loop_targets(self) -> None:
+        for name in self.loop_targets:
+            if name not in self.first_assignments: continue;
+            if self.first_assignments[name] is self.loop_targets[name]: continue;
+
+            self.first_assignments[name] = self.loop_targets[name];
+            self.surface.discard(name);
+            self.deep[name] = None;
+
+        names = { name for name in self.loop_targets if self.is_loop_only(name) };
+        if len(names) == 0: return;
+
+        for name in get_outside_reads(self.node.body, names):
+            self.first_assignments[name] = self.loop_targets[name];
+            self.deep[name] = None;
+
+    # Whether name is the target of a loop and nothing else, so the loop can own it. Luau's loop variable
+    # only lives inside the loop, which python's doesn't
+    def is_loop_only(self, name: str) -> bool:
+        if name in self.globals or name in self.nonlocals or name in self.parameters: return False;
+
+        return name not in self.first_assignments;
+
+    # Whether name is defined by the module itself (which hides a builtin of the same name)
+    def is_bound(self, name: str) -> bool:
+        scope = self;
+
+        while scope is not None:
+            if name in scope.first_assignments or name in scope.functions or name in scope.loop_targets or name in scope.parameters: return True;
+            scope = scope.parent;
+
+        return False;
+
+    # "surface" if node declares name with local, "deep" if it's declared at the top of the function, None otherwise
+    def get_declaration(self, name: str, node: ast.AST) -> str | None:
+        if self.first_assignments.get(name) is not node: return None;
+
+        return "surface" if name in self.surface else "deep";
+
+    # Find the function a name refers to, from this scope outwards
+    def find_function(self, name: str) -> ast.FunctionDef | None:
+        scope = self;
+
+        while scope is not None:
+            if name in scope.functions: return scope.functions[name];
+            scope = scope.parent;
+
+        return None;
+
+# The names (of names) that are read anywhere but in the body of a for loop with them as its target. A
+# function defined in the loop can be called after it, where python sees the name's last value
+def get_outside_reads(statements: list[ast.stmt], names: set[str]) -> set[str]:
+    reads = set();
+    stack = [(statement, None) for statement in statements];
+
+    while len(stack) > 0:
+        node, loop_names = stack.pop();
+        node_type = type(node);
+
+        if node_type is ast.Name:
+            if node.id in names and (loop_names is None or node.id not in loop_names): reads.add(node.id);
+            continue;
+
+        if (node_type is ast.For or node_type is ast.AsyncFor) and type(node.target) is ast.Name and node.target.id in names:
+            # The iterable is evaluated before the loop, its else after it
+            inner_names = { node.target.id } if loop_names is None else loop_names | { node.target.id };
+            stack.append((node.iter, loop_names));
+            stack.extend((statement, loop_names) for statement in node.orelse);
+            stack.extend((statement, inner_names) for statement in node.body);
+            continue;
+
+        if node_type is ast.FunctionDef or node_type is ast.AsyncFunctionDef or node_type is ast.Lambda: loop_names = None;
+
+        stack.extend((child, loop_names) for child in ast.iter_child_nodes(node));
+
+    return reads;
+
+# Every scope of a module, keyed by the node (Module or FunctionDef) that opens it
+class SymbolTable:
+    def __init__(self):
+        self.scopes: dict[ast.AST, Scope] = {};
+        self.module: Scope | None = None;
+
+    def get_scope(self, node: ast.AST) -> Scope | None:
+        return self.scopes.get(node);
+
+# Single pass over the module's statements that fills a SymbolTable. Expressions can't
+# declare anything, so they're skipped, which keeps the pass cheap next to emission
+class ScopeAnalyser:
+    def __init__(self):
+        self.table: SymbolTable = SymbolTable();
+
+    def open_scope(self, kind: str, node: ast.AST, parent: Scope | None) -> Scope:
+        scope = Scope(kind, node, parent);
+
+        if parent is not None: parent.children.append(scope);
+        self.table.scopes[node] = scope;
+
+        return scope;
+
+    def analyse_module(self, node: ast.Module) -> None:
+        self.table.module = self.open_scope("module", node, None);
+        self.analyse_block(node.body, self.table.module, 0);
+        self.table.module.settle_loop_targets();
+        self.settle_types();
+
+    def analyse_function(self, node: ast.FunctionDef, scope: Scope) -> None:
+        arguments = node.args;
+
+        for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs:
+            scope.parameters.add(argument.arg);
+            scope.set_type(argument.arg, inference.get_annotation_type(argument.annotation));
+
+        for argument in [arguments.vararg, arguments.kwarg]:
+            if argument is None: continue;
+            scope.parameters.add(argument.arg);
+            scope.set_type(argument.arg, None);
+
+        self.analyse_block(node.body, scope, 0);
+        scope.settle_loop_targets();
+
+    def assign_type(self, target: ast.expr, value: ast.expr | None, scope: Scope) -> None:
+        if not isinstance(target, ast.Name):
+            # Unpacking (a, b = ...) leaves the names without a type
+            for child in ast.walk(target):
+                if isinstance(child, ast.Name): scope.set_type(child.id, None);
+            return;
+
+        type = inference.infer_type(value) if value is not None else None;
+
+        if type is None and value is not None:
+            type = inference.get_constructor_type(value);
+            if type is not None: scope.constructed.add(target.id);
+
+        scope.set_type(target.id, type);
+
+    # Types can only be trusted once the whole module has been seen: assignments through global and
+    # nonlocal happen in other scopes, and the module could define its own list() or dict()
+    def settle_types(self) -> None:
+        for scope in self.table.scopes.values():
+            for name in scope.globals:
+                if name in self.table.module.types: self.table.module.types[name] = None;
+
+            for name in scope.nonlocals:
+                parent = scope.parent;
+                while parent is not None and name not in parent.types: parent = parent.parent;
+                if parent is not None: parent.types[name] = None;
+
+            for name in scope.constructed:
+                type = scope.types.get(name);
+                if type is not None and scope.is_bound(type): scope.types[name] = None;
+
+    # depth is how many blocks deep statements are in the scope, 0 is the scope's own block
+    def analyse_block(self, statements: list[ast.stmt], scope: Scope, depth: int) -> None:
+        for statement in statements:
+            statement_type = type(statement);
+
+            if statement_type is ast.Assign:
+                for target in statement.targets:
+                    if isinstance(target, ast.Name): scope.assign(target.id, statement, depth > 0);
+                    self.assign_type(target, statement.value, scope);
+            elif statement_type is ast.AugAssign:
+                self.assign_type(statement.target, None, scope);
+            elif statement_type is ast.AnnAssign:
+                if isinstance(statement.target, ast.Name):
+                    # x: int only declares x, x: int = 1 also assigns it
+                    if statement.value is not None: scope.assign(statement.target.id, statement, depth > 0);
+                    scope.annotations.setdefault(statement.target.id, statement.annotation);
+                    scope.set_type(statement.target.id, inference.get_annotation_type(statement.annotation));
+            elif statement_type is ast.FunctionDef:
+                scope.functions[statement.name] = statement;
+                scope.set_type(statement.name, None);
+                self.analyse_function(statement, self.open_scope("function", statement, scope));
+            elif statement_type is ast.For:
+                if isinstance(statement.target, ast.Name) and statement.target.id not in scope.first_assignments:
+                    scope.loop_targets.setdefault(statement.target.id, statement);
+                self.assign_type(statement.target, None, scope);
+                self.analyse_block(statement.body, scope, depth + 1);
+                self.analyse_block(statement.orelse, scope, depth + 1);
+            elif statement_type is ast.If:
+                # An elif chain nests an if per elif, it's walked rather than recursed through
+                while True:
+                    self.analyse_block(statement.body, scope, depth + 1);
+
+                    if len(statement.orelse) != 1 or type(statement.orelse[0]) is not ast.If: break;
+
+                    statement = statement.orelse[0];
+
+                self.analyse_block(statement.orelse, scope, depth + 1);
+            elif statement_type is ast.Expr:
+                # Yields are only supported as statements of their own, so there's no need to look through expressions
+                if type(statement.value) is ast.Yield or type(statement.value) is ast.YieldFrom: scope.generator = True;
+            elif statement_type is ast.Global:
+                scope.globals.update(statement.names);
+            elif statement_type is ast.Nonlocal:
+                scope.nonlocals.update(statement.names);
+            elif statement_type is ast.Import or statement_type is ast.ImportFrom:
+                # import a.b binds a
+                for alias in statement.names:
+                    if alias.name != "*": scope.set_type(alias.asname or alias.name.split(".")[0], None);
+            else:
+                # with ... as x binds x to whatever __enter__ returns
+                if statement_type is ast.With or statement_type is ast.AsyncWith:
+                    for item in statement.items:
+                        if item.optional_vars is not None: self.assign_type(item.optional_vars, None, scope);
+
+                # Statements with bodies (if, for, while, with, try) open a block
+                for field in ["body", "orelse", "finalbody"]:
+                    body = getattr(statement, field, None);
+                    if isinstance(body, list): self.analyse_block(body, scope, depth + 1);
+
+                for handler in getattr(statement, "handlers", []):
+                    if handler.name is not None: scope.set_type(handler.name, None);
+                    self.analyse_block(handler.body, scope, depth + 1);
+
+def analyse(module: ast.Module) -> SymbolTable:
+    analyser = ScopeAnalyser();
+    analyser.analyse_module(module);
+
+    return analyser.table;
@@ -0,0 +1,122 @@
+import bisect
+
+# Source maps from the Luau output back to the Python it came from, in the standard (version 3) format:
+# https://sourcemaps.info/spec.html. Lines and columns are 0 based in the map, like the format wants.
+# Python columns are ast's col_offset, i.e in UTF-8 bytes.
+
+base64_digits = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+base64_values: dict[str, int] = { digit: i for i, digit in enumerate(base64_digits) };
+
+# Marks a position in the output while it's emitted, the emitter swaps these for mappings. Python source
+# can't contain NUL, and NUL in strings is escaped, so a NUL in the output can only be a marker
+marker = "\0";
+
+def encode_vlq(value: int) -> str:
+    # The sign goes in the lowest bit
+    value = (-value << 1) | 1 if value < 0 else value << 1;
+    encoded = "";
+
+    while True:
+        digit = value & 31;
+        value = value >> 5;
+
+        # The 6th bit says another digit follows
+        if value > 0: digit = digit | 32;
+        encoded = encoded + base64_digits[digit];
+
+        if value == 0: return encoded;
+
+def decode_vlq(segment: str) -> list[int]:
+    values = [];
+    value = 0;
+    shift = 0;
+
+    for character in segment:
+        digit = base64_values[character];
+        value = value | ((digit & 31) << shift);
+        shift = shift + 5;
+
+        if digit & 32: continue;
+
+        values.append(-(value >> 1) if value & 1 else value >> 1);
+        value = 0;
+        shift = 0;
+
+    return values;
+
+class SourceMap:
+    def __init__(self, file: str | None = None, source: str | None = None):
+        # The output and the Python file, as written in the map
+        self.file: str | None = file;
+        self.source: str | None = source;
+        # (output line, output column, source line, source column), in output order
+        self.mappings: list[tuple[int, int, int, int]] = [];
+
+    def add(self, line: int, column: int, source_line: int, source_column: int) -> None:
+        self.mappings.append((line, column, source_line, source_column));
+
+    def to_dict(self) -> dict:
+        lines = [];
+        # Every field but the output column is relative to the previous segment, across lines
+        previous_source_line = 0;
+        previous_source_column = 0;
+
+        for line, column, source_line, source_column in self.mappings:
+            while len(lines) <= line: lines.append([]);
+
+            # The output column is only relative to the previous segment on the same line
+            previous_column = lines[line][-1][0] if len(lines[line]) > 0 else 0;
+
+            segment = encode_vlq(column - previous_column) + encode_vlq(0) + encode_vlq(source_line - previous_source_line) + encode_vlq(source_column - previous_source_column);
+            lines[line].append((column, segment));
+
+            previous_source_line = source_line;
+            previous_source_column = source_column;
+
+        return {
+            "version": 3,
+            "file": self.file,
+            "sources": [self.source],
+            "names": [],
+            "mappings": ";".join([",".join([segment for _, segment in line]) for line in lines]),
+        };
+
+    @staticmethod
+    def from_dict(data: dict) -> "SourceMap":
+        sources = data.get("sources", []);
+        source_map = SourceMap(data.get("file"), sources[0] if len(sources) > 0 else None);
+
+        source_line = 0;
+        source_column = 0;
+
+        for line, segments in enumerate(data.get("mappings", "").split(";")):
+            column = 0;
+
+            for segment in segments.split(","):
+                if segment == "": continue;
+
+                values = decode_vlq(segment);
+                column = column + values[0];
+
+                # Segments without a source don't map anywhere
+                if len(values) < 4: continue;
+
+                source_line = source_line + values[2];
+                source_column = source_column + values[3];
+                source_map.add(line, column, source_line, source_column);
+
+        return source_map;
+
+    # The source (line, column) of an output position, from the closest mapping at or before it.
+    # column None looks up the whole line, i.e its first mapping
+    def lookup(self, line: int, column: int | None = None) -> tuple[int, int] | None:
+        if column is None:
+            index = bisect.bisect_left(self.mappings, (line, 0, -1, -1));
+            if index < len(self.mappings) and self.mappings[index][0] == line: return self.mappings[index][2:];
+
+            column = 0;
+
+        index = bisect.bisect_right(self.mappings, (line, column, float("inf"), float("inf"))) - 1;
+        if index < 0: return None;
+
+        return self.mappings[index][2:];
@@ -0,0 +1,18 @@
+import ast
+import re
+
+# What passes and the function cache tell about names from the Python source text, which is far cheaper than
+# walking the AST. A name that's mentioned in the text may be used, one that isn't can't be.
+
+# Every identifier of the text, and then some (attributes, keywords, words in strings)
+identifier_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*");
+
+# The lines of source the way ast numbers them. Not splitlines(), which also splits on characters that don't end a line for the parser
+def get_lines(source: str) -> list[str]:
+    return source.split("\n");
+
+# The source text of a statement, whole lines from its first decorator to its end
+def get_statement_text(lines: list[str], node: ast.stmt) -> str:
+    start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])]);
+
+    return "\n".join(lines[start - 1:node.end_lineno]);
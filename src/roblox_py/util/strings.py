@@ -3,4 +3,30 @@
 # i.e replace "s" in "times" with "", 1 time
 def replace_reverse(original_string: str, to_replace: str, replace_with: str, occurrences: int = 1) -> str:
     reverse_splits: list[str] = original_string.rsplit(to_replace, occurrences)
-    return replace_with.join(reverse_splits)
\ No newline at end of file
+    return replace_with.join(reverse_splits)
+
+# Characters that can't appear as-is in a Luau string literal
+luau_escapes: dict[str, str] = {
+    "\\": "\\\\",
+    "\"": "\\\"",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+}
+
+# Quote a Python string as a Luau string literal
+# Example: to_luau_string('say "hi"\n') -> "say \"hi\"\n"
+def to_luau_string(value: str) -> str:
+    escaped: list[str] = []
+
+    for character in value:
+        if character in luau_escapes:
+            escaped.append(luau_escapes[character])
+        elif ord(character) < 32 or ord(character) == 127:
+            # Other control characters as decimal escapes, always three digits so a digit after
+            # them isn't read as part of the escape, e.g \0071 is \007 and then 1
+            escaped.append("\\" + str(ord(character)).zfill(3))
+        else:
+            escaped.append(character)
+
+    return "\"" + "".join(escaped) + "\""
@@ -1,7 +1,19 @@
 import ast
-import re
+from typing import Callable, TextIO
 from typing_extensions import Self
 
+from .emitter import Emitter
+from .profiling import Profiler
+from .source_maps import SourceMap
+from . import scope as scope_util
+from . import strings as string_util
+from . import inference
+from . import luau_types
+from ..passes import constant_folding
+from ..passes import renaming
+from ..passes import dead_code
+from ..passes import inlining
+
 # Refer to:
 # https://docs.python.org/3/library/ast.html#abstract-grammar
 
@@ -35,50 +47,53 @@ builtin_functions = {
     }
 }
 
+# Raised when a node cannot be transpiled; reported per file instead of killing the whole build
+class TranspilationError(Exception):
+    pass
+
 class CodeBlock:
-    def __init__(self, block_id: str, type: str, variables: list[str], children: list[Self], parent: Self | None = None):
+    def __init__(self, block_id: str, type: str, children: list[Self], parent: Self | None = None, context: "TranspilationContext | None" = None):
         self.block_id: str = block_id;
         self.type: str = type;
-        self.variables: str = variables;
         self.children: list[Self] = children;
         self.parent: Self | None = parent;
         self.line: str = "";
-        self.deep_variables: list[str] = [];
         self.node: ast.FunctionDef = "";
+        # Nesting depth, i.e the amount of periods in the block_id
+        self.level: int = 0 if parent is None else parent.level + 1;
+        # Blocks belong to the context of the file being transpiled
+        self.context: TranspilationContext | None = context if context is not None or parent is None else parent.context;
+        # Closest function block (or the top block), worked out once instead of on every assignment
+        self.function_block: Self = self if parent is None or type == "function" else parent.function_block;
+        # Names of the function (or module) this block opens, from the symbol table
+        self.scope: scope_util.Scope | None = None;
+        # Names bound by the lambda or comprehension loop this block opens. The scope analysis skips expressions,
+        # so these aren't in the scope, and their type isn't the one of the name outside
+        self.bound: set[str] | None = None;
 
     def get_function(self) -> Self:
-        if self.parent is None: return self;
-
-        if self.type == "function": return self;
+        return self.function_block;
 
-        ancestor = self.parent;
+    # Returns "surface" if the assignment node has to declare the variable with local, "deep" if the
+    # variable is declared at the top of the function instead, None if it's already declared
+    def add_variable(self, variable: str, node: ast.AST) -> None | str:
+        scope = self.function_block.scope;
 
-        while ancestor.block_id != "0" and ancestor.type != "function":
-            ancestor = ancestor.parent
-
-        return ancestor;
-
-    def add_variable(self, variable: str) -> None | str: # "surface" | "deep"
-        function_block = self.get_function();
-        
-        if variable in function_block.variables or variable in function_block.deep_variables: return None;
+        if scope is None: return None;
 
-        if function_block == self:
-            function_block.variables.append(variable);
-            return "surface"
-        else:
-            function_block.deep_variables.append(variable);
-            return "deep"
+        return scope.get_declaration(variable, node);
 
     def add_child(self, type: str, node: ast.FunctionDef | None = None) -> Self: # Preferred over __init__
         # New id is the self.block_id + "." + the next available int
         new_id = self.block_id + "." + str(len(self.children));
 
         # Create a new block
-        new_block = CodeBlock(new_id, type, [], [], self);
+        new_block = CodeBlock(new_id, type, [], self);
 
         # If node is not None, set the node of the block
-        if node is not None: new_block.node = node;
+        if node is not None:
+            new_block.node = node;
+            if type == "function" and self.context.symbols is not None: new_block.scope = self.context.symbols.get_scope(node);
 
         # Add the new block to the children of the current block
         self.children.append(new_block);
@@ -86,29 +101,260 @@ class CodeBlock:
         return new_block;
     
     def get_offset(self, relative_offset: int = 0) -> str:
-        # Get amount of periods in the block_id
-        # Multiply " " by this amount
-        level = len(self.block_id.split(".")) - 1 + relative_offset
+        level = self.level + relative_offset
 
         # kirby = ["(>'-')>","<('-'<)","^('-')^","v('-')v","(>'-')>","(^-^)"]; 
         # return "--[[" + " ".join(kirby[i % len(kirby)] for i in range(level)) + "]]"
-        
-        spaces = 1;
-        char = "\t";
 
-        offset = level * spaces * char;
+        # The emitter caches the indentation of every level
+        if self.context is not None: return self.context.emitter.get_indent(level);
+
+        return max(level, 0) * "\t";
+
+# Holds all of the state of a single file's transpilation, so that files can be
+# transpiled independently of each other (from threads or worker processes)
+class TranspilationContext:
+    def __init__(self, stream: TextIO | None = None, options: dict | None = None, profiler: Profiler | None = None):
+        # Pass a stream to write the output straight to it (e.g an open output file)
+        self.emitter: Emitter = Emitter(stream);
+        self.options: dict = options if options is not None else {};
+        # "source_maps": True records where every statement of the output comes from
+        if self.options.get("source_maps"): self.emitter.source_map = SourceMap();
+        # "release": True minifies the output, "rename_locals": True also shortens the names of locals
+        self.emitter.minify = self.options.get("release", False);
+        # Characters shorter names saved, and the names that were shortened -> their short name
+        self.renamed_size: int = 0;
+        self.renames: dict[str, str] = {};
+        # Builtins the module redefines, if constant folding had to find out
+        self.shadowed_names: set[str] | None = None;
+        # A Script or LocalScript (.server.py, .client.py), which nothing can require
+        self.script: bool = False;
+        # Bytes of source dead code elimination removed, and the module constants it found -> their value
+        self.dead_code_size: int = 0;
+        self.constants: dict[str, any] = {};
+        # "inline_budget": how big a function inlined into its callers can be (0 turns inlining off). How many call
+        # sites were inlined, and the functions that could be -> what their call sites depend on
+        self.inlined_calls: int = 0;
+        self.inlined: dict[str, str] = {};
+        # Times every handler call when set
+        self.profiler: Profiler | None = profiler;
+        # How many nested expressions transpile_nested is inside of
+        self.nesting: int = 0;
+        # Filled in by transpile_module before anything is emitted
+        self.symbols: scope_util.SymbolTable | None = None;
+        self.top_block: CodeBlock = CodeBlock("0", "top", [], context=self);
+        # ropy members the module uses (e.g "ropy.append.list") -> the local they're cached in
+        self.runtime_aliases: dict[str, str] = {};
+        # Reuses the output of unchanged top level functions from earlier builds, see transpiler/function_cache.py
+        self.function_cache = None;
+        # Set while the function cache records a function: the ropy members it uses, in order
+        self.runtime_uses: dict[str, None] | None = None;
+
+    # Members of ropy are read once into locals at the top of the module, so calls in loops
+    # don't index ropy (and ropy.append, ...) every time. Returns the local, e.g _ropy_append_list
+    def use_runtime(self, member: str) -> str:
+        if self.runtime_uses is not None: self.runtime_uses[member] = None;
+
+        alias = self.runtime_aliases.get(member);
+
+        if alias is None:
+            alias = "_" + member.replace(".", "_");
+            self.runtime_aliases[member] = alias;
+
+        return alias;
+
+# Handlers are looked up by the exact class of the node, so the cost of dispatching doesn't
+# depend on where a node type would sit in an isinstance chain.
+# Passes and plugins can add or replace handlers through the register_* decorators.
+expression_handlers: dict[type, Callable[[ast.expr, CodeBlock], str]] = {};
+statement_handlers: dict[type, Callable[[ast.stmt, CodeBlock], str]] = {};
+
+# Statements that only inform the scope analysis and emit nothing
+declaration_statements: set[type] = { ast.Global, ast.Nonlocal };
+
+# Operators map straight to their Luau symbol
+operator_symbols: dict[type, str] = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.Mod: "%",
+    ast.Pow: "^",
+};
+
+def register_expression(node_type: type) -> Callable:
+    def decorator(handler: Callable[[ast.expr, CodeBlock], str]) -> Callable[[ast.expr, CodeBlock], str]:
+        expression_handlers[node_type] = handler;
+        return handler;
+
+    return decorator;
+
+def register_statement(node_type: type) -> Callable:
+    def decorator(handler: Callable[[ast.stmt, CodeBlock], str]) -> Callable[[ast.stmt, CodeBlock], str]:
+        statement_handlers[node_type] = handler;
+        return handler;
+
+    return decorator;
+
+# Find the handler of a subclass of a registered node type, and remember it for next time
+def find_handler(handlers: dict[type, Callable], node_type: type) -> Callable | None:
+    for base in node_type.__mro__[1:]:
+        if base in handlers:
+            handlers[node_type] = handlers[base];
+            return handlers[base];
+
+    return None;
 
-        return offset
+# Expressions made of other expressions (operators, containers, attributes, calls, ...), node type ->
+# (operands, combine, fallback). operands(node, block) lists the expressions the node is written from, or
+# returns None to hand the node to fallback(node, block) instead. combine(node, operands, parts, block) puts
+# together the Luau of the operands, parts, in order. Past nesting_limit, transpile_nested works through these
+# with a stack of its own rather than recursion, so an expression nested 1,000 deep doesn't reach the recursion
+# limit. Runs of the same operator are one node's operands (a + b + c), so 100,000 terms are a single level.
+# The passes in passes/ walk the tree with stacks of their own for the same reason
+nested_expressions: dict[type, tuple[Callable, Callable, Callable | None]] = {};
 
-top_block = CodeBlock("0", "top", [], []);
+# How deep nested expressions recurse before transpile_nested switches to its own stack
+nesting_limit = 64;
 
-def get_function_block_by_name(name: str, within_block: CodeBlock) -> CodeBlock:
-    # Loop through children of within_block, find the function with the same name
-    for child in within_block.children:
-        if child.type == "function" and child.node.name == name:
-            return child;
-    
-    return None;
+def register_nested(node_type: type, operands: Callable, fallback: Callable | None = None) -> Callable:
+    def decorator(combine: Callable[[ast.expr, list[ast.expr], list[str], CodeBlock], str]) -> Callable[[ast.expr, list[ast.expr], list[str], CodeBlock], str]:
+        nested_expressions[node_type] = (operands, combine, fallback);
+        expression_handlers[node_type] = transpile_nested;
+        return combine;
+
+    return decorator;
+
+def transpile_nested(root: ast.expr, block: CodeBlock) -> str:
+    context = block.context;
+
+    profiler = context.profiler;
+
+    # Shallow expressions (nearly all of them) recurse, which is cheaper than keeping a stack. The profiler
+    # times every node on the stack by its own handler, rather than all of them as transpile_nested
+    if context.nesting < nesting_limit and profiler is None:
+        operands, combine, fallback = nested_expressions[type(root)];
+        root_operands = operands(root, block);
+
+        if root_operands is None: return fallback(root, block);
+
+        # An error ends the module's transpilation, so the count doesn't need to survive one
+        context.nesting = context.nesting + 1;
+
+        # Most have one or two operands, which don't need a loop
+        if len(root_operands) == 1:
+            parts = [transpile_expression(root_operands[0], block)];
+        elif len(root_operands) == 2:
+            parts = [transpile_expression(root_operands[0], block), transpile_expression(root_operands[1], block)];
+        else:
+            parts = [transpile_expression(operand, block) for operand in root_operands];
+
+        context.nesting = context.nesting - 1;
+
+        return combine(root, root_operands, parts, block);
+
+    # Frames of [node, its operands, the Luau of the ones done so far, combine, when the profiler started timing it]
+    stack = [];
+    node = root;
+
+    while True:
+        operands, combine, fallback = nested_expressions[type(node)];
+        node_operands = operands(node, block);
+        text = None;
+
+        if node_operands is None:
+            text = fallback(node, block) if profiler is None else profiler.call(fallback, node, block);
+        else:
+            stack.append((node, node_operands, [], combine, profiler.enter() if profiler is not None else None));
+
+        # Combine every frame whose operands are done, until one needs a nested expression of its own
+        while True:
+            if text is not None:
+                if len(stack) == 0: return text;
+
+                stack[-1][2].append(text);
+                text = None;
+
+            frame_node, frame_operands, parts, frame_combine, start_time = stack[-1];
+            i = len(parts);
+
+            # Operands that aren't nested (names, constants, ...) are written right away
+            while i < len(frame_operands):
+                operand = frame_operands[i];
+                handler = expression_handlers.get(type(operand));
+
+                # Unless a plugin took over the operand's type
+                if handler is transpile_nested: break;
+
+                # With the profiler on, operands go through transpile_expression so they're counted
+                parts.append(handler(operand, block) if profiler is None and handler is not None else transpile_expression(operand, block));
+                i = i + 1;
+
+            if i < len(frame_operands):
+                node = frame_operands[i];
+                break;
+
+            stack.pop();
+            text = frame_combine(frame_node, frame_operands, parts, block);
+
+            if profiler is not None: profiler.leave(frame_combine.__name__, start_time);
+
+# Luau's operator precedence, higher binds tighter. An operand is wrapped in parentheses when it binds looser
+# than the operator next to it, or as loosely on the side the operator doesn't group towards
+precedence_if = 0;
+precedence_or = 1;
+precedence_and = 2;
+precedence_compare = 3;
+precedence_unary = 7;
+precedence_power = 8;
+precedence_atom = 9;
+
+binary_precedences: dict[type, int] = {
+    ast.Add: 5,
+    ast.Sub: 5,
+    ast.Mult: 6,
+    ast.Div: 6,
+    ast.Mod: 6,
+    ast.Pow: precedence_power,
+};
+
+# Expressions that can be evaluated again without side effects
+leaf_types: set[type] = { ast.Name, ast.Constant };
+
+# Expressions that are never wrapped
+atom_types: set[type] = { ast.Name, ast.Attribute, ast.Subscript, ast.Call, ast.List, ast.Dict, ast.Set };
+
+def get_precedence(node: ast.expr) -> int:
+    node_type = type(node);
+
+    if node_type in atom_types: return precedence_atom;
+    if node_type is ast.BinOp: return binary_precedences.get(type(node.op), precedence_atom);
+    if node_type is ast.UnaryOp: return precedence_unary;
+    if node_type is ast.BoolOp: return precedence_and if isinstance(node.op, ast.And) else precedence_or;
+    # Chains are written as a < b and b < c
+    if node_type is ast.Compare: return precedence_compare if len(node.ops) == 1 else precedence_and;
+    # if-then-else would take in whatever follows it, a function expression can't be called without parentheses
+    if node_type is ast.IfExp or node_type is ast.Lambda or node_type is ast.NamedExpr: return precedence_if;
+    # e.g -1 after constant folding
+    if node_type is ast.Constant and isinstance(node.value, (int, float)) and not isinstance(node.value, bool) and node.value < 0: return precedence_unary;
+
+    return precedence_atom;
+
+def wrap(text: str, node: ast.expr, precedence: int) -> str:
+    if type(node) in atom_types: return text;
+
+    return "(" + text + ")" if get_precedence(node) < precedence else text;
+
+# Expressions that can be indexed or called as they are, string literals and tables can't
+prefix_types: set[type] = { ast.Name, ast.Call, ast.Attribute, ast.Subscript };
+
+def get_function_by_name(name: str, within_block: CodeBlock) -> ast.FunctionDef | None:
+    # Hashed lookup through the symbol table, from the block's scope outwards
+    scope = within_block.function_block.scope;
+
+    if scope is None: return None;
+
+    return scope.find_function(name);
 
 def initialise_string(node: any, block: CodeBlock) -> str:
     result = "";
@@ -117,273 +363,553 @@ def initialise_string(node: any, block: CodeBlock) -> str:
         result = result + "--[[" + node.__class__.__name__ + "]]"
 
     if toggle_block_ids:
-        result = result + "--[[ BlockId: " + block["block_id"] + "]]";
+        result = result + "--[[ BlockId: " + block.block_id + "]]";
     
     return result;
 
+# Inferred types -> their key in builtin_attribute_functions
+attribute_function_types: dict[str, str] = { "list": "List", "dict": "Dict", "set": "Set" };
+
+# What's known about the type of an expression: "list", "dict", "set", "str" or None, see inference.py
+def get_type(node: ast.expr, block: CodeBlock) -> str | None:
+    scope = block.function_block.scope;
+
+    if isinstance(node, ast.Name):
+        if scope is None: return None;
+
+        inner = block;
+
+        while inner is not block.function_block:
+            if inner.bound is not None and node.id in inner.bound: return None;
+            inner = inner.parent;
+
+        return scope.get_type(node.id);
+
+    type = inference.get_constructor_type(node);
+    if type is not None: return None if scope is not None and scope.is_bound(type) else type;
+
+    return inference.infer_type(node);
+
+# len() of a list, set or string that doesn't need ropy.len (which counts every key), None otherwise
+def get_length(node: ast.expr, block: CodeBlock) -> str | None:
+    type = get_type(node, block);
+
+    if type is None or type == "dict": return None;
+
+    value = transpile_expression(node, block);
+
+    # Lists and sets are arrays
+    if type == "list" or type == "set": return "#" + (value if is_atom(node) else "(" + value + ")");
+
+    # # counts bytes, python counts characters
+    return "utf8.len(" + value + ")";
+
 def process_builtin_attribute_function(node: ast.Call, block: CodeBlock) -> str | None:
-    # If I knew how to obtain the attributee node from the given node, I could do this
-    # builtin_list = builtin_attribute_functions;
-    # nodeType = "";
-    # b = node.func.value;
-    # print(isinstance(b, ast.Dict), isinstance(b, ast.Set), isinstance(b, ast.List), isinstance(b, ast.Tuple))
-    # if isinstance(node.func, ast.Dict):
-    #     builtin_list = builtin_attribute_functions["Dict"];
-    #     nodeType = "Dict";
-    # elif isinstance(node.func, ast.Set):
-    #     builtin_list = builtin_attribute_functions["Set"];
-    #     nodeType = "Set";
-    # elif isinstance(node.func, ast.List):
-    #     builtin_list = builtin_attribute_functions["List"];
-    #     nodeType = "List";
-    # elif isinstance(node.func, ast.Tuple):
-    #     builtin_list = builtin_attribute_functions["Tuple"];
-    #     nodeType = "Tuple";
-    # else:
-    #     return None;
-
-    # print(node.func.attr)
-
-    # if not node.func.attr in builtin_list:
-    #     return None;
-
-    # result = builtin_list[node.func.attr];
+    attribute = node.func.attr;
+    value_type = get_type(node.func.value, block);
+
+    # A list's append is a plain insert
+    if value_type == "list" and attribute == "append" and len(node.args) == 1:
+        return "table.insert(" + transpile_expression(node.func.value, block) + ", " + transpile_expression(node.args[0], block) + ")";
 
     nodeType = ""
-    
-    # Loop through builtin_attribute_functions to find the correct function
-    for key in builtin_attribute_functions:
-        if node.func.attr in builtin_attribute_functions[key]:
-            nodeType = key;
-            break;
-    
+
+    if value_type in attribute_function_types and attribute in builtin_attribute_functions[attribute_function_types[value_type]]:
+        nodeType = attribute_function_types[value_type];
+    else:
+        # The type isn't known, go by the name of the method
+        for key in builtin_attribute_functions:
+            if attribute in builtin_attribute_functions[key]:
+                nodeType = key;
+                break;
+
     if nodeType == "": return None;
 
-    
-    result = builtin_attribute_functions[nodeType][node.func.attr];
+    # The attributee is the first argument, followed by the actual arguments
+    args = [transpile_expression(node.func.value, block)];
 
-    result = result + "(" + transpile_expression(node.func.value, block);
+    for arg in node.args:
+        args.append(transpile_expression(arg, block));
 
-    if len(node.args) > 0:
-        result = result + ", "
-        # Loop through the args
-        for i in range(0, len(node.args)):
-                arg: ast.expr = node.args[i];
-                result = result + transpile_expression(arg, block);
+    return block.context.use_runtime(builtin_attribute_functions[nodeType][attribute]) + "(" + ", ".join(args) + ")";
 
-                if i != len(node.args) - 1:
-                    result = result + ", ";
+# Method calls on a list or set that are whole statements, written without a call: x.append(v) -> x[#x + 1] = v
+# The receiver and argument have to be names or literals, since they're evaluated in a different order
+def get_method_statement(node: ast.expr, block: CodeBlock) -> str | None:
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name)): return None;
+    if len(node.args) != 1 or len(node.keywords) > 0: return None;
 
-    result = result + ")";
+    argument = node.args[0];
+    if not (isinstance(argument, ast.Name) or isinstance(argument, ast.Constant)): return None;
 
-    return result;
+    value_type = get_type(node.func.value, block);
+    attribute = node.func.attr;
+
+    if value_type == "list" and attribute == "append":
+        target = transpile_expression(node.func.value, block);
+        return target + "[#" + target + " + 1] = " + transpile_expression(argument, block);
+
+    # Sets are arrays without duplicates
+    if value_type == "set" and attribute == "add":
+        target = transpile_expression(node.func.value, block);
+        value = transpile_expression(argument, block);
+        return "if table.find(" + target + ", " + value + ") == nil then table.insert(" + target + ", " + value + ") end";
+
+    return None;
 
+def transpile_arguments(args: list[ast.expr], block: CodeBlock) -> str:
+    return ", ".join([transpile_expression(arg, block) for arg in args]);
+
+# Builtins and reductions, plain calls are written by transpile_plain_call
 def transpile_call(node: ast.Call, block: CodeBlock) -> str:
     result = initialise_string(node, block)
 
+    # sum(x for x in items) and the like don't build the generator's table
+    if get_reduction(node, block) is not None:
+        return result + transpile_comprehension(node, block);
+
     if isinstance(node.func, ast.Attribute):
         p = process_builtin_attribute_function(node, block);
         if p is not None:
-            result = result + p;
-            return result;
+            return result + p;
 
-    builtin: bool = (node.func.id in builtin_functions) or (node.func.id in builtin_functions["discriminate_tables"])
+    builtin: bool = isinstance(node.func, ast.Name) and ((node.func.id in builtin_functions) or (node.func.id in builtin_functions["discriminate_tables"]))
 
     # if not built-in:
-    if not (isinstance(node.func, ast.Name) and not isinstance(node.func, ast.Attribute) and (builtin)):
-        transpiled_func = transpile_expression(node.func, block)
-        result = result + transpiled_func + "(";
-
-        # Loop through the arguments
-        for i in range(0, len(node.args)):
-            arg = node.args[i];
-            result = result + transpile_expression(arg, block);
-
-            if i != len(node.args) - 1:
-                result = result + ", ";
-        
-        result = result + ")";
-
-        return result;
+    if not builtin:
+        return result + transpile_expression(node.func, block) + "(" + transpile_arguments(node.args, block) + ")";
         
     func_name = node.func.id;
 
     if func_name == "help":
-        # Reformulate help(function) to function([_,_,_,... (depending on #args) ],"help")
+        # Reformulate help(function) to function([nil,nil,nil,... (depending on #args) ],"help")
+        if len(node.args) != 1 or not isinstance(node.args[0], ast.Name): raise TranspilationError("help() takes the name of a function");
+
         func = node.args[0];
         # Get actual function from func (so we can get args length)
-        func = get_function_block_by_name(func.id, block).node
+        func = get_function_by_name(func.id, block)
+        if func is None: raise TranspilationError("help() of " + node.args[0].id + ", which isn't a function of the module");
         # Get amount of possible parameters
         num_args = len(func.args.args);
 
-        result = result + func_name + "(" + ", ".join(["nil"]) * num_args + ",\"help\"";
-
-        # Replace only first instance of "help" with func.name
-        result = result.replace("help", func.name, 1);
+        return result + func.name + "(" + ", ".join(["nil"] * num_args + ["\"help\""]) + ")";
 
-        result = result + ")";
-    elif func_name in builtin_functions["discriminate_tables"]:
+    if func_name in builtin_functions["discriminate_tables"]:
         new_name = builtin_functions["discriminate_tables"][func_name];
         if len(node.args) == 0:
-            result = result + new_name + ".list()";
-        elif isinstance(node.args[0], ast.Dict):
-            result = result + new_name + ".dict(" + transpile_expression(node.args[0], block) + ")";
+            return result + block.context.use_runtime(new_name + ".list") + "()";
+
+        table_type = "tuple";
+
+        if isinstance(node.args[0], ast.Dict):
+            table_type = "dict";
         elif isinstance(node.args[0], ast.Set):
-            result = result + new_name + ".set(" + transpile_expression(node.args[0], block) + ")";
+            table_type = "set";
         elif isinstance(node.args[0], ast.List):
-            result = result + new_name + ".list(" + transpile_expression(node.args[0], block) + ")";
-        elif isinstance(node.args[0], ast.Tuple):
-            result = result + new_name + ".tuple(" + transpile_expression(node.args[0], block) + ")";
-        elif isinstance(node.args[0], ast.GeneratorExp):
-            result = result + new_name + ".tuple(" + transpile_expression(node.args[0], block) + ")";
-        else:
-            result = result + new_name + ".tuple(" + transpile_expression(node.args[0], block) + ")";
-    else:
-        result = result + builtin_functions[func_name];
-        result = result + "(";
-        # Loop through the arguments
-        for i in range(0, len(node.args)):
-        
-        
-            arg = node.args[i];
-            result = result + transpile_expression(arg, block);
+            table_type = "list";
+        elif get_type(node.args[0], block) in attribute_function_types:
+            table_type = get_type(node.args[0], block);
 
-            if i != len(node.args) - 1:
-                result = result + ", ";
+        return result + block.context.use_runtime(new_name + "." + table_type) + "(" + transpile_expression(node.args[0], block) + ")";
 
-        result = result + ")";        
-            
-    return result;
+    if func_name == "len" and len(node.args) == 1:
+        length = get_length(node.args[0], block);
+        if length is not None: return result + length;
+
+    return result + block.context.use_runtime(builtin_functions[func_name]) + "(" + transpile_arguments(node.args, block) + ")";
 
+# Statements with a body write straight into the emitter and return ""
+
+@register_statement(ast.While)
 def transpile_while(node: ast.While, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    emitter = block.context.emitter;
 
-    result = result + "while " + transpile_expression(node.test, block) + " do\n";
+    emitter.write(initialise_string(node, block) + "while " + transpile_expression(node.test, block) + " do\n");
 
-    result = result + transpile_lines(node.body, block.add_child("while"));
+    transpile_lines(node.body, block.add_child("while"));
 
-    result = result + block.get_offset() + "end";
+    emitter.write(block.get_offset() + "end");
 
-    return result;
+    return "";
 
+@register_statement(ast.If)
 def transpile_if(node: ast.If, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    emitter = block.context.emitter;
 
-    if_line = "if " + transpile_expression(node.test, block);
+    emitter.write(initialise_string(node, block) + "if " + transpile_expression(node.test, block) + " then\n");
 
-    result = result + if_line;
-    
-    result = result + " then\n";
+    transpile_lines(node.body, block.add_child("if"));
+
+    # An elif is an if alone in the else, a chain of them is written as elseif rather than nesting an if (and an end) per elif
+    while len(node.orelse) == 1 and type(node.orelse[0]) is ast.If:
+        node = node.orelse[0];
 
-    result = result + transpile_lines(node.body, block.add_child("if"));
+        emitter.write(block.get_offset());
+        if emitter.source_map is not None: emitter.mark(node.lineno, node.col_offset);
+        emitter.write(initialise_string(node, block) + "elseif " + transpile_expression(node.test, block) + " then\n");
+
+        transpile_lines(node.body, block.add_child("if"));
 
     if len(node.orelse) > 0:
-        result = result + block.get_offset() + "else\n";
+        emitter.write(block.get_offset() + "else\n");
 
-        result = result + transpile_lines(node.orelse, block.add_child("else"));
+        transpile_lines(node.orelse, block.add_child("else"));
 
-    result = result + block.get_offset() + "end\n";
+    emitter.write(block.get_offset() + "end\n");
 
-    return result;
+    return "";
 
-def transpile_function(node: ast.FunctionDef, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+# Returns the function's docstring node if it has one, it becomes the function's help string
+def get_docstring_node(node: ast.FunctionDef) -> ast.Constant | None:
+    if len(node.body) == 0: return None;
+
+    first = node.body[0];
+
+    if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+        return first.value;
+
+    return None;
+
+# A function lowered into its parts. The declarations of variables that are first assigned in
+# nested blocks only become known while the body is emitted, so they go into a slot that's
+# reserved before the body and filled in after it, whatever the size of the body
+class FunctionIR:
+    def __init__(self, name: str, parameters: list[str], block: CodeBlock):
+        self.name: str = name;
+        self.parameters: list[str] = parameters;
+        # The function's own block (its body is emitted into it)
+        self.block: CodeBlock = block;
+        # Luau string literal returned by help(function)
+        self.help_string: str | None = None;
+        # Luau type the function returns, from its annotation
+        self.return_type: str | None = None;
+        # Parameter -> the Luau value it gets when it's left out (or nil)
+        self.defaults: dict[str, str] = {};
+        # Written as @native, so Luau compiles the function to native code
+        self.native: bool = False;
+        # Returns a coroutine.wrap iterator that runs the body (one block deeper) a yield at a time
+        self.generator: bool = False;
+        # Variable -> initial value, in order of first assignment
+        self.declarations: dict[str, str] = {};
+        # Variable -> its Luau type, for the declarations that have one
+        self.declaration_types: dict[str, str] = {};
+        self.declaration_slot: tuple[list[str], int] | None = None;
+
+    def declare(self, variable: str, value: str = "nil", type: str | None = None) -> None:
+        if variable in self.declarations: return;
+
+        self.declarations[variable] = value;
+        if type is not None: self.declaration_types[variable] = type;
+
+    def emit_header(self, emitter: Emitter) -> None:
+        parameters = self.parameters;
+
+        if self.help_string is not None: parameters = parameters + ["_ropy_help: string?"];
+
+        return_type = self.return_type;
+        help_string = self.help_string;
+
+        # The help string is returned as any, so it passes for the return type. A function that returns nothing can't return it
+        if help_string is not None and return_type is not None:
+            if return_type == "()": return_type = None;
+            else: help_string = "(" + help_string + " :: any)";
+
+        emitter.write(("@native " if self.native else "") + "function " + self.name + "(" + ", ".join(parameters) + ")" + (": " + return_type if return_type is not None else "") + "\n");
+
+        if help_string is not None:
+            emitter.write(self.block.get_offset() + "if _ropy_help == \"help\" then return " + help_string + " end\n");
 
-    # Get the function name
-    function_name = node.name;
+        for parameter in self.defaults:
+            emitter.write(self.block.get_offset() + "if " + parameter + " == nil then " + parameter + " = " + self.defaults[parameter] + " end\n");
 
-    result = "function " + function_name + "(";
+        # The body's locals are declared inside the coroutine, so every call of the generator gets its own
+        if self.generator: emitter.write(self.block.get_offset() + "return coroutine.wrap(function()\n");
+
+        self.declaration_slot = emitter.reserve();
+
+    def emit_declarations(self, emitter: Emitter) -> None:
+        offset = self.block.get_offset(1 if self.generator else 0);
+        lines = [];
+
+        for variable in self.declarations:
+            # Declarations start out as nil before the assignment they're for
+            type = self.declaration_types.get(variable);
+            type = ": " + luau_types.as_optional(type) if type is not None else "";
+
+            lines.append(offset + "local " + variable + type + " = " + self.declarations[variable] + ";\n");
+
+        emitter.fill(self.declaration_slot, "".join(lines));
+
+# A parameter with its Luau type, if it's annotated. One with a default can be left out, so it can be nil
+def get_parameter(node: ast.arg, default: ast.expr | None = None) -> str:
+    type = luau_types.to_luau_type(node.annotation);
+
+    if type is None: return node.arg;
+    if default is not None: type = luau_types.as_optional(type);
+
+    return node.arg + ": " + type;
+
+# The defaults of a function's parameters, None for the ones without. The last parameters have them
+def get_defaults(arguments: ast.arguments) -> list[ast.expr | None]:
+    defaults = [None] * len(arguments.args) + arguments.defaults;
+
+    return defaults[len(defaults) - len(arguments.args):];
+
+def get_parameters(arguments: ast.arguments) -> list[str]:
+    defaults = get_defaults(arguments);
+
+    return [get_parameter(arguments.args[i], defaults[i]) for i in range(len(arguments.args))];
+
+# Python evaluates defaults once, where the function is defined. Literals are put in the function as they are,
+# anything else is evaluated into a local in front of it
+def write_defaults(node: ast.FunctionDef, function: FunctionIR, block: CodeBlock) -> None:
+    defaults = get_defaults(node.args);
+
+    for i in range(len(node.args.args)):
+        default = defaults[i];
+        if default is None or (type(default) is ast.Constant and default.value is None): continue;
+
+        parameter = node.args.args[i].arg;
+        value = transpile_expression(default, block);
+
+        if type(default) is not ast.Constant:
+            name = "_ropy_default_" + node.name + "_" + parameter;
+            block.context.emitter.write(block.get_offset() + "local " + name + " = " + value + ";\n");
+            value = name;
+
+        function.defaults[parameter] = value;
+
+# Functions decorated with @native are compiled to native code by Luau
+def is_native(node: ast.FunctionDef, block: CodeBlock) -> bool:
+    scope = block.function_block.scope;
+
+    for decorator in node.decorator_list:
+        if isinstance(decorator, ast.Name) and decorator.id == "native" and not (scope is not None and scope.is_bound("native")): return True;
+
+    return False;
+
+@register_statement(ast.FunctionDef)
+def transpile_function(node: ast.FunctionDef, block: CodeBlock) -> str:
+    cache = block.context.function_cache;
 
-    # Loop through the arguments
-    for i in range(0, len(node.args.args)):
-        arg = node.args.args[i];
-        result = result + arg.arg;
-        if i != len(node.args.args) - 1:
-            result = result + ", ";
+    # Only top level functions are cached, nested ones are part of their output
+    if cache is not None and block.parent is None: return cache.transpile(node, block, emit_function);
 
-    result = result + ")";
+    return emit_function(node, block);
+
+def emit_function(node: ast.FunctionDef, block: CodeBlock) -> str:
+    emitter = block.context.emitter;
 
     new_function_block = block.add_child("function", node);
 
-    transpiled_body = transpile_lines(node.body, new_function_block);
-
-    # Get first line of result
-    first_line = transpiled_body.split("\n")[0];
-    # Remove every character that resides between --[[ and ]] (ie remove comments)
-    first_line = re.sub('--\[\[[^>]+\]]', '', first_line)
-    # Remove every character that comes after -- (ie remove comments)
-    first_line = re.sub('--.*', '', first_line)
-    # Strip first line
-    first_line = first_line.strip()
-
-    # If this line is entirely surrounded by " or ', (i.e it is a string) then it's a help string
-    if first_line.startswith('"') and first_line.endswith('"') or first_line.startswith("'") and first_line.endswith("'"):
-        help_string = first_line;
-        new_help_string = new_function_block.get_offset() + "if _ropy_help == \"help\" then return " + help_string + " end\n";
-        # Remove the help_string from transpiled_body
-        transpiled_body = transpiled_body.replace(help_string, "");
-
-        # Add a parameter to the function (i.e replace the last ")" in result with ", _ropy_help)", in case there's =>1 args
-        if len(node.args.args) > 0:
-            result = result[:-1] + ", _ropy_help)";
-        else:
-            result = result + "_ropy_help)";
-        
-        result = result + "\n" + new_help_string
+    function = FunctionIR(node.name, get_parameters(node.args), new_function_block);
+    function.native = is_native(node, block);
+    write_defaults(node, function, block);
 
-    header_length = len(result)
-    result = result + "\n";
+    body = node.body;
+    docstring = get_docstring_node(node);
 
-    result = result + transpiled_body
+    # A docstring is returned when the function is called with "help" as its extra last argument
+    if docstring is not None:
+        function.help_string = transpile_string(docstring, new_function_block);
+        body = body[1:];
 
-    has_yield = False;
+    scope = new_function_block.scope;
+    function.generator = scope is not None and scope.generator;
+    function.return_type = luau_types.to_generator_type(node.returns) if function.generator else luau_types.to_return_type(node.returns);
+    loop = get_generator_loop(body, new_function_block) if function.generator else None;
 
-    # Insert \nlocal variable declarations after header_length characters
-    for variable in new_function_block.deep_variables:
-        header = result[:header_length] + "\n"
+    # Simple generators don't need a coroutine
+    if loop is not None:
+        function.generator = False;
+        function.emit_header(emitter);
+        write_generator_closure(loop, new_function_block);
+        emitter.write(block.get_offset() + "end\n");
 
-        assigned_to = "nil";
+        return "";
 
-        if variable == "yield":
-            has_yield = True;
-            assigned_to = "{}";
-        
-        result = header + new_function_block.get_offset() + "local " + variable + " = " + assigned_to + ";" + result[header_length:]
+    function.emit_header(emitter);
+
+    transpile_lines(body, new_function_block.add_child("generator") if function.generator else new_function_block);
+
+    # How many items the generator has yielded, every yield passes it along as the iterator's key
+    if function.generator: function.declare("_ropy_index", "0");
 
-    # If has_yield, return yield
-    if has_yield:
-        result = result + new_function_block.get_offset() + "return yield\n";
+    if scope is not None:
+        for variable in scope.deep:
+            function.declare(variable, "nil", luau_types.to_luau_type(scope.annotations.get(variable)));
+
+    function.emit_declarations(emitter);
+
+    if function.generator: emitter.write(new_function_block.get_offset() + "end)\n");
 
     # Add end to the end of the function
-    result = result + block.get_offset(-1) + "end\n";
+    emitter.write(block.get_offset() + "end\n");
 
-    return result;
+    return "";
+
+# The yield of a simple generator's loop: the loop's only statement, or the only statement of an if (without an else) that is
+def get_loop_yield(loop: ast.For) -> ast.Yield | None:
+    statements = loop.body;
+
+    if len(statements) == 1 and type(statements[0]) is ast.If and len(statements[0].orelse) == 0: statements = statements[0].body;
+    if len(statements) != 1 or type(statements[0]) is not ast.Expr or type(statements[0].value) is not ast.Yield: return None;
+
+    return statements[0].value;
+
+# A generator whose whole body is a loop over a range with a literal step, or over a list that's a name,
+# that only yields (behind an if or not). Those keep the loop's state in upvalues of a closure, which is
+# far cheaper to call than resuming a coroutine. Returns the loop, None for any other generator
+def get_generator_loop(body: list[ast.stmt], block: CodeBlock) -> ast.For | None:
+    if len(body) != 1 or type(body[0]) is not ast.For: return None;
+
+    loop = body[0];
+    scope = block.function_block.scope;
+
+    if len(loop.orelse) > 0 or not isinstance(loop.target, ast.Name) or not scope.is_loop_only(loop.target.id): return None;
+    if get_loop_yield(loop) is None: return None;
+
+    arguments = get_range_arguments(loop.iter, block);
+
+    if arguments is not None: return loop if get_integer_literal(arguments[2]) is not None else None;
+
+    return loop if isinstance(loop.iter, ast.Name) and get_type(loop.iter, block) == "list" else None;
+
+# Writes the body of a function whose body is a loop from get_generator_loop, e.g for i in range(n): yield i * i:
+#   local i, _ropy_limit, _ropy_index = -1, n - 1, 0;
+#   return function()
+#       i = i + 1
+#       if i > _ropy_limit then return nil end
+#       _ropy_index = _ropy_index + 1
+#       return _ropy_index, i*i
+#   end
+# With an if, the closure loops until the test passes. Like the coroutine, it's an iterator for a generic for
+def write_generator_closure(loop: ast.For, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+    target = transpile_expression(loop.target, block);
+    arguments = get_range_arguments(loop.iter, block);
+
+    if arguments is not None:
+        start, stop, step = arguments;
+        step_value = get_integer_literal(step);
+
+        # Every call steps first, so the target starts a step before start
+        emitter.write(block.get_offset() + "local " + target + ", _ropy_limit, _ropy_index = " + get_range_limit(start, -step_value, block) + ", " + get_range_limit(stop, -1 if step_value > 0 else 1, block) + ", 0;\n");
+        advance = [target + " = " + target + " + " + str(step_value) if step_value > 0 else target + " = " + target + " - " + str(-step_value), "if " + target + (" > " if step_value > 0 else " < ") + "_ropy_limit then return nil end"];
+    else:
+        emitter.write(block.get_offset() + "local _ropy_items, _ropy_position, _ropy_index = " + transpile_expression(loop.iter, block) + ", 0, 0;\n");
+        advance = ["_ropy_position = _ropy_position + 1", "local " + target + " = _ropy_items[_ropy_position]", "if " + target + " == nil then return nil end"];
 
-def transpile_boolop(node: ast.BoolOp, block: CodeBlock):
+    emitter.write(block.get_offset() + "return function()\n");
+
+    closure_block = block.add_child("generator");
+    statement = loop.body[0];
+    filtered = type(statement) is ast.If;
+
+    if filtered:
+        emitter.write(closure_block.get_offset() + "while true do\n");
+        closure_block = closure_block.add_child("while");
+
+    for i in range(0, len(advance)):
+        emitter.write(closure_block.get_offset());
+        if i == 0 and emitter.source_map is not None: emitter.mark(loop.lineno, loop.col_offset);
+        emitter.write(advance[i] + "\n");
+
+    yield_block = closure_block;
+
+    if filtered:
+        emitter.write(closure_block.get_offset());
+        if emitter.source_map is not None: emitter.mark(statement.lineno, statement.col_offset);
+        emitter.write("if " + transpile_expression(statement.test, closure_block) + " then\n");
+
+        yield_block = closure_block.add_child("if");
+        statement = statement.body[0];
+
+    value = transpile_expression(statement.value.value, yield_block) if statement.value.value is not None else "nil";
+
+    emitter.write(yield_block.get_offset());
+    if emitter.source_map is not None: emitter.mark(statement.lineno, statement.col_offset);
+    emitter.write("_ropy_index = _ropy_index + 1\n");
+    emitter.write(yield_block.get_offset() + "return _ropy_index, " + value + "\n");
+
+    if filtered:
+        emitter.write(closure_block.get_offset() + "end\n");
+        emitter.write(closure_block.get_offset(-1) + "end\n");
+
+    emitter.write(block.get_offset() + "end\n");
+
+@register_nested(ast.BoolOp, lambda node, block: node.values)
+def transpile_boolop(node: ast.BoolOp, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
     result = initialise_string(node, block);
 
-    # Loop through the values
-    for i in range(0, len(node.values)):
-        value = node.values[i];
-        result = result + transpile_expression(value);
-        if i != len(node.values) - 1:
-            result = result + " " + transpile_expression(node.op);
+    op = " and " if isinstance(node.op, ast.And) else " or ";
+    precedence = get_precedence(node);
 
-    return result;
+    return result + op.join([wrap(parts[i], node.values[i], precedence) for i in range(0, len(parts))]);
 
+@register_statement(ast.Return)
 def transpile_return(node: ast.Return, block: CodeBlock) -> str:
     result = initialise_string(node, block)
 
-    result = result + "return " + transpile_expression(node.value, block);
+    if node.value is None: return result + "return";
 
-    return result;
+    # What a generator returns would be taken for an item, it only ends the iteration
+    scope = block.function_block.scope;
+    if scope is not None and scope.generator:
+        if isinstance(node.value, ast.Constant): return result + "return";
+        return result + "local _ = " + transpile_expression(node.value, block) + "; return";
+
+    if is_inline_comprehension(node.value, block):
+        block.context.emitter.write(result);
+        write_comprehension_statement(node.value, "return _ropy_result", block);
+        return "";
+
+    return result + "return " + transpile_expression(node.value, block);
+
+@register_statement(ast.AnnAssign)
+def transpile_annassign(node: ast.AnnAssign, block: CodeBlock) -> str:
+    # x: int = 1 -> local x: number = 1
+    result = initialise_string(node, block);
+    target = transpile_expression(node.target, block);
+    value = transpile_expression(node.value, block);
+
+    # Only locals can be annotated in Luau, not e.g attributes
+    if not isinstance(node.target, ast.Name): return result + target + " = " + value;
+
+    if block.add_variable(target, node) == "surface":
+        return result + "local " + target + ": " + luau_types.to_luau_type(node.annotation) + " = " + value;
+
+    return result + target + " = " + value;
+
+def transpile_comprehension_assign(node: ast.Assign, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+    node_target = node.targets[0];
+    target = transpile_expression(node_target, block);
+    added = block.add_variable(target, node) if isinstance(node_target, ast.Name) else None;
+
+    if added == "surface":
+        # A new local is filled directly. If the comprehension refers to the name, it means the old variable
+        # (e.g a parameter), which the local would hide, so it's evaluated before the local exists instead
+        if any(isinstance(child, ast.Name) and child.id == target for child in ast.walk(node.value)):
+            emitter.write("local " + target + " = " + transpile_comprehension(node.value, block) + "\n");
+        else:
+            write_comprehension(node.value, "local " + target, target, block);
+        return;
+
+    write_comprehension_statement(node.value, target + " = _ropy_result", block);
 
+@register_statement(ast.Assign)
 def transpile_assign(node: ast.Assign, block: CodeBlock) -> str:
 
     result = initialise_string(node, block)
 
     # Check if assignment is new (i.e check if we have to append "local" in front of the variable)
 
+    if len(node.targets) == 1 and is_inline_comprehension(node.value, block):
+        block.context.emitter.write(result);
+        transpile_comprehension_assign(node, block);
+        return "";
+
     # Get targets as array
     targets = [];
     added: str = None # None | "surface" | "deep"
@@ -394,538 +920,865 @@ def transpile_assign(node: ast.Assign, block: CodeBlock) -> str:
         targets.append(target);
         
         if not isinstance(node_target, ast.Name): continue;
-        added = block.add_variable(target)
+        added = block.add_variable(target, node)
 
     if added == "surface":
         result = result + "local ";
 
+        # Declared earlier with x: int
+        scope = block.function_block.scope;
+        if len(targets) == 1 and targets[0] in scope.annotations:
+            targets[0] = targets[0] + ": " + luau_types.to_luau_type(scope.annotations[targets[0]]);
+
     # Assigns a variable to a value
+    return result + ", ".join(targets) + " = " + transpile_expression(node.value, block);
+
+# Builtins that reduce a generator to a single value -> the value they start from. These run as a loop
+# over the generator's elements, so no table is built for them
+reductions: dict[str, str] = {
+    "sum": "0",
+    "any": "false",
+    "all": "true",
+    "min": "nil",
+    "max": "nil",
+};
+
+# The reduction node is a call of (e.g sum(x for x in items)), None if it's anything else
+def get_reduction(node: ast.expr, block: CodeBlock) -> str | None:
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in reductions): return None;
+    if len(node.args) != 1 or len(node.keywords) > 0: return None;
+
+    argument = node.args[0];
+    name = node.func.id;
+
+    if isinstance(argument, ast.ListComp):
+        # The list is built before any() and all() look at it, so every element has to be evaluated
+        if name == "any" or name == "all": return None;
+    elif isinstance(argument, ast.GeneratorExp):
+        # any() and all() stop at the first element that decides them, a break only leaves one loop
+        if (name == "any" or name == "all") and len(argument.generators) > 1: return None;
+    else:
+        return None;
 
-    # Loop through the targets
-    for i in range(0, len(targets)):
-        target = targets[i];
-        result = result + target
-        if i != len(node.targets) - 1:
-            result = result + ", ";
+    if any(generator.is_async for generator in argument.generators): return None;
 
-    result = result + " = ";
+    scope = block.function_block.scope;
+    if scope is not None and scope.is_bound(name): return None;
 
-    result = result + transpile_expression(node.value, block);
+    return name;
 
-    return result
+# Whether node is a value that can be written as loops in front of the statement that uses it,
+# i.e a list comprehension or a reduction over a generator
+def is_inline_comprehension(node: ast.expr, block: CodeBlock) -> bool:
+    if isinstance(node, ast.ListComp): return not any(generator.is_async for generator in node.generators);
 
-def transpile_listcomp(node: ast.ListComp, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    return get_reduction(node, block) is not None;
+
+# Whether the node always evaluates to a boolean, so its truth doesn't need ropy.truthy
+def is_boolean(node: ast.expr) -> bool:
+    if isinstance(node, ast.Compare): return True;
+    if isinstance(node, ast.UnaryOp): return isinstance(node.op, ast.Not);
+    if isinstance(node, ast.BoolOp): return all(is_boolean(value) for value in node.values);
+
+    return isinstance(node, ast.Constant) and isinstance(node.value, bool);
+
+# The table a list comprehension starts from. It's created with room for every element when
+# their amount is known before the loop, i.e a single range() without conditions
+def get_comprehension_table(node: ast.ListComp, block: CodeBlock) -> str:
+    if len(node.generators) != 1 or len(node.generators[0].ifs) > 0: return "{}";
+
+    arguments = get_range_arguments(node.generators[0].iter, block);
+    if arguments is None or get_integer_literal(arguments[2]) != 1: return "{}";
 
-    result = result + "(function()\n";
+    start, stop = arguments[0], arguments[1];
+    start_value = get_integer_literal(start);
+    stop_value = get_integer_literal(stop);
 
-    result = result + block.get_offset(1) + "local result = {};\n";
+    # The loop evaluates start and stop again right after, which only names and literals can do
+    if not (start_value is not None or isinstance(start, ast.Name)): return "{}";
+    if not (stop_value is not None or isinstance(stop, ast.Name)): return "{}";
 
-    # Loop through the generators
-    for i in range(0, len(node.generators)):
-        generator = node.generators[i];
-        target = transpile_expression(generator.target, block);
-        iter = transpile_expression(generator.iter, block);
-        ifs = generator.ifs;
+    if start_value is not None and stop_value is not None:
+        size = stop_value - start_value;
+        return "table.create(" + str(size) + ")" if size > 0 else "{}";
 
-        result = result + block.get_offset(1) + "for k, " + target
-        result = result + " in pairs(" + iter + ") do\n";
+    size = transpile_expression(stop, block);
 
-        if len(ifs) == 0:
-            result = result + block.get_offset(2) + "result[k] = " + transpile_expression(node.elt, block) + ";\n";
+    if start_value is None:
+        size = size + " - " + transpile_expression(start, block);
+    elif start_value != 0:
+        size = size + (" - " + str(start_value) if start_value > 0 else " + " + str(-start_value));
+
+    return "table.create(math.max(0, " + size + "))";
+
+# The names a loop target (x, or x, (y, z)) binds
+def get_target_names(target: ast.expr) -> set[str]:
+    if type(target) is ast.Name: return { target.id };
+
+    return { child.id for child in ast.walk(target) if type(child) is ast.Name };
+
+# Writes the loops and conditions of a comprehension, returns the block its element goes into and
+# what has been opened (loop depth, or 0 for an if, along with the block it was opened in)
+def write_comprehension_loops(node: ast.ListComp | ast.GeneratorExp, block: CodeBlock) -> tuple[CodeBlock, list[tuple[int, CodeBlock]]]:
+    emitter = block.context.emitter;
+    opened = [];
+
+    for generator in node.generators:
+        emitter.write(block.get_offset());
+        depth = write_loop_header(transpile_expression(generator.target, block), generator.iter, block);
+        opened.append((depth, block));
+        block = add_loop_block(depth, block);
+        block.bound = get_target_names(generator.target);
+
+        for condition in generator.ifs:
+            emitter.write(block.get_offset() + "if " + transpile_expression(condition, block) + " then\n");
+            opened.append((0, block));
+            block = block.add_child("if");
+
+    return (block, opened);
+
+def write_comprehension_end(opened: list[tuple[int, CodeBlock]]) -> None:
+    for depth, block in reversed(opened):
+        if depth == 0:
+            block.context.emitter.write(block.get_offset() + "end\n");
         else:
-            for j in range(0, len(ifs)):
-                if_ = ifs[j];
-                result = result + block.get_offset(2) + "if " + transpile_expression(if_.test, block) + " then\n";
-                result = result + block.get_offset(3)  + "result[k] = " + target + ";\n";
-                result = result + block.get_offset(2) + "end\n";
-            
-        result = result + block.get_offset(2) + "end\n";
+            write_loop_end(depth, block);
+
+# Writes a list comprehension (or a reduction over a generator) as loops that fill variable, the
+# offset of the current line is already written. declaration is what's assigned the table (or
+# starting value) before the loops, e.g "local x"
+def write_comprehension(node: ast.ListComp | ast.GeneratorExp | ast.Call, declaration: str, variable: str, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+    reduction = get_reduction(node, block);
+    comprehension = node.args[0] if reduction is not None else node;
+
+    if reduction is not None:
+        emitter.write(declaration + " = " + reductions[reduction] + ";\n");
+    else:
+        emitter.write(declaration + " = " + get_comprehension_table(comprehension, block) + ";\n");
+
+    element_block, opened = write_comprehension_loops(comprehension, block);
+    element = transpile_expression(comprehension.elt, element_block);
+    offset = element_block.get_offset();
+
+    if reduction is None:
+        # Elements are appended, so the list has no holes where conditions skip an element
+        emitter.write(offset + "table.insert(" + variable + ", " + element + ");\n");
+    elif reduction == "sum":
+        if not is_atom(comprehension.elt): element = "(" + element + ")";
+        emitter.write(offset + variable + " = " + variable + " + " + element + ";\n");
+    elif reduction == "any" or reduction == "all":
+        test = element if is_boolean(comprehension.elt) else block.context.use_runtime("ropy.truthy") + "(" + element + ")";
+        if reduction == "all": test = "not " + (test if not is_boolean(comprehension.elt) else "(" + test + ")");
+
+        emitter.write(offset + "if " + test + " then " + variable + " = " + ("true" if reduction == "any" else "false") + "; break end\n");
+    else:
+        # The first of equal elements is kept, like python does
+        emitter.write(offset + "local _ropy_element = " + element + ";\n");
+        emitter.write(offset + "if " + variable + " == nil or _ropy_element " + ("<" if reduction == "min" else ">") + " " + variable + " then " + variable + " = _ropy_element end\n");
 
-    result = result + block.get_offset(1) + "return result;\n";
+    write_comprehension_end(opened);
 
-    result = result + block.get_offset(-1) + "end)()";
+    if reduction == "min" or reduction == "max":
+        emitter.write(block.get_offset() + "if " + variable + " == nil then error(\"" + reduction + "() arg is an empty sequence\") end\n");
 
-    return result;
+# Comprehensions that are part of a larger expression are evaluated in a closure that's called right away
+def transpile_comprehension(node: ast.ListComp | ast.GeneratorExp | ast.Call, block: CodeBlock) -> str:
+    emitter = block.context.emitter;
+    function_block = block.add_child("comprehension");
 
+    emitter.begin_capture();
+    emitter.write("(function()\n" + function_block.get_offset());
+    write_comprehension(node, "local _ropy_result", "_ropy_result", function_block);
+    emitter.write(function_block.get_offset() + "return _ropy_result;\n" + block.get_offset() + "end)()");
+
+    return initialise_string(node, block) + emitter.end_capture();
+
+# A comprehension whose value is assigned (or returned) is written as loops in front of the statement,
+# written is what the statement still has to do with _ropy_result once they've run
+def write_comprehension_statement(node: ast.expr, written: str, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+    do_block = block.add_child("do");
+
+    emitter.write("do\n" + do_block.get_offset());
+    write_comprehension(node, "local _ropy_result", "_ropy_result", do_block);
+    emitter.write(do_block.get_offset() + written + ";\n" + block.get_offset() + "end\n");
+
+@register_expression(ast.ListComp)
+def transpile_listcomp(node: ast.ListComp, block: CodeBlock) -> str:
+    return transpile_comprehension(node, block);
+
+@register_expression(ast.GeneratorExp)
 def transpile_generatorexp(node: ast.GeneratorExp, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    return transpile_comprehension(node, block);
 
-    result = result + "(function()\n";
+# The value of an integer literal (e.g 3 or -1), None for anything else
+def get_integer_literal(node: ast.expr) -> int | None:
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = get_integer_literal(node.operand);
+        return -value if value is not None else None;
 
-    result = result + block.get_offset(1) + "local result = {};\n";
+    if isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool):
+        return node.value;
 
-    # Loop through the generators
-    for i in range(0, len(node.generators)):
-        generator = node.generators[i];
-        target = transpile_expression(generator.target, block);
-        iter = transpile_expression(generator.iter, block);
-        ifs = generator.ifs;
+    return None;
 
-        result = result + block.get_offset(1) + "for k, " + target
-        result = result + " in pairs(" + iter + ") do\n";
+# Expressions that can be followed by an operator without being wrapped in parentheses
+def is_atom(node: ast.expr) -> bool:
+    return isinstance(node, (ast.Name, ast.Constant, ast.Call, ast.Attribute, ast.Subscript));
 
-        if len(ifs) == 0:
-            result = result + block.get_offset(2) + "result[k] = " + transpile_expression(node.elt, block) + ";\n";
-        else:
-            for j in range(0, len(ifs)):
-                if_ = ifs[j];
-                result = result + block.get_offset(2) + "if " + transpile_expression(if_.test, block) + " then\n";
-                result = result + block.get_offset(3)  + "result[k] = " + target + ";\n";
-                result = result + block.get_offset(2) + "end\n";
+# Arguments of range() in for loops that can become a numeric for, None if the loop has to go through ropy.range
+def get_range_arguments(iter: ast.expr, block: CodeBlock) -> list[ast.expr] | None:
+    if not (isinstance(iter, ast.Call) and isinstance(iter.func, ast.Name) and iter.func.id == "range"): return None;
+    if len(iter.keywords) > 0 or len(iter.args) < 1 or len(iter.args) > 3: return None;
+    if any(isinstance(arg, ast.Starred) for arg in iter.args): return None;
 
-        result = result + block.get_offset(2) + "end\n";
+    # range() of the module's own isn't the builtin
+    scope = block.function_block.scope;
+    if scope is not None and scope.is_bound("range"): return None;
 
-    result = result + block.get_offset(1) + "return result;\n";
+    arguments = list(iter.args);
 
-    result = result + block.get_offset() + "end)()";
+    if len(arguments) == 1: arguments = [ast.Constant(value=0)] + arguments;
+    if len(arguments) == 2: arguments = arguments + [ast.Constant(value=1)];
 
-    return result;
+    # range(a, b, 0) raises, which ropy.range does too
+    if get_integer_literal(arguments[2]) == 0: return None;
+
+    return arguments;
+
+# The inclusive limit for an exclusive stop, adjustment is -1 when counting up and 1 when counting down
+def get_range_limit(stop: ast.expr, adjustment: int, block: CodeBlock) -> str:
+    stop_value = get_integer_literal(stop);
+
+    if stop_value is not None: return str(stop_value + adjustment);
+
+    # range(n + 1) -> for i = 0, n do
+    if isinstance(stop, ast.BinOp) and isinstance(stop.op, ast.Add) and get_integer_literal(stop.right) is not None:
+        adjustment = adjustment + get_integer_literal(stop.right);
+        stop = stop.left;
+
+    limit = transpile_expression(stop, block);
+
+    if adjustment == 0: return limit;
+    if not is_atom(stop): limit = "(" + limit + ")";
+
+    return limit + (" + " + str(adjustment) if adjustment > 0 else " - " + str(-adjustment));
+
+# Writes the header of for i in range(start, stop, step) as a numeric for, without allocating a table
+# Python's stop is exclusive and Luau's limit isn't, so the limit is stop - 1 (or stop + 1 going down)
+def write_range_header(arguments: list[ast.expr], variable: str, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+    start, stop, step = arguments;
+    step_value = get_integer_literal(step);
+
+    start_string = transpile_expression(start, block);
+
+    if step_value is not None:
+        # The sign of the step is known
+        limit = get_range_limit(stop, -1 if step_value > 0 else 1, block);
+        step_string = "" if step_value == 1 else ", " + str(step_value);
+
+        emitter.write("for " + variable + " = " + start_string + ", " + limit + step_string + " do\n");
+        return;
+
+    stop_string = transpile_expression(stop, block);
+    step_string = transpile_expression(step, block);
 
+    # Python evaluates start, stop and step once and in that order, so a step that isn't a plain
+    # name is stored along with start and stop before the loop (in a do block so the locals don't leak)
+    if not isinstance(step, ast.Name):
+        emitter.write("do\n");
+        emitter.write(block.get_offset(1) + "local _ropy_start, _ropy_stop, _ropy_step = " + start_string + ", " + stop_string + ", " + step_string + ";\n");
+        emitter.write(block.get_offset(1));
+        start_string, stop_string, step_string = "_ropy_start", "_ropy_stop", "_ropy_step";
 
+    emitter.write("for " + variable + " = " + start_string + ", " + block.context.use_runtime("ropy.range_limit") + "(" + stop_string + ", " + step_string + "), " + step_string + " do\n");
+
+# Writes the header of a loop over iter (the line's offset is already written), returns how many blocks
+# deeper than block the loop's body is: 1, or 2 when the range is stored in a do block first
+def write_loop_header(variable: str, iter: ast.expr, block: CodeBlock) -> int:
+    range_arguments = get_range_arguments(iter, block);
+
+    if range_arguments is None:
+        block.context.emitter.write("for _," + variable + " in " + transpile_expression(iter, block) + " do\n");
+        return 1;
+
+    write_range_header(range_arguments, variable, block);
+
+    # Non-literal steps that aren't names get stored before the loop
+    step = range_arguments[2];
+    return 1 if get_integer_literal(step) is not None or isinstance(step, ast.Name) else 2;
+
+# The block a loop's body goes into, for a header written by write_loop_header
+def add_loop_block(depth: int, block: CodeBlock) -> CodeBlock:
+    if depth == 2: block = block.add_child("do");
+
+    return block.add_child("for");
+
+# Closes a loop opened by write_loop_header and add_loop_block
+def write_loop_end(depth: int, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+
+    emitter.write(block.get_offset(depth - 1) + "end\n");
+    if depth == 2: emitter.write(block.get_offset() + "end\n");
+
+@register_statement(ast.For)
 def transpile_for(node: ast.For, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    emitter = block.context.emitter;
+    scope = block.function_block.scope;
 
-    result = result + "for _," + transpile_expression(node.target, block) + " in " + transpile_expression(node.iter, block) + " do\n";
+    emitter.write(initialise_string(node, block));
 
-    for_block = block.add_child("for")
+    # A target that's only ever the loop's own variable is the loop variable itself, otherwise the loop
+    # gets its own variable that's copied into the target, so the target keeps its last value after the loop
+    owns_target = isinstance(node.target, ast.Name) and (scope is None or scope.is_loop_only(node.target.id));
+    target = transpile_expression(node.target, block);
+    variable = target if owns_target else "_ropy_" + (node.target.id if isinstance(node.target, ast.Name) else "target");
 
-    result = result + transpile_lines(node.body, for_block);
+    depth = write_loop_header(variable, node.iter, block);
+    for_block = add_loop_block(depth, block);
 
-    result = result + for_block.get_offset(-1) + "end\n";
+    if not owns_target:
+        emitter.write(for_block.get_offset() + target + " = " + variable + ";\n");
 
-    return result;
+    transpile_lines(node.body, for_block);
 
-def transpile_compare(node: ast.Compare, block: CodeBlock):
-    result = initialise_string(node, block)
+    write_loop_end(depth, block);
 
-    # Loop through the expressions
-    for i in range(0, len(node.ops)):
-        op = node.ops[i];
-        left = transpile_expression(node.left, block);
-        comparator = transpile_expression(node.comparators[i], block);
-
-        if isinstance(op, ast.Eq):
-            result = result + left + " == " + comparator;
-        elif isinstance(op, ast.NotEq):
-            result = result + left + " ~= " + comparator;
-        elif isinstance(op, ast.Lt):
-            result = result + left + " < " + comparator;
-        elif isinstance(op, ast.LtE):
-            result = result + left + " <= " + comparator;
-        elif isinstance(op, ast.Gt):
-            result = result + left + " > " + comparator;
-        elif isinstance(op, ast.GtE):
-            result = result + left + " >= " + comparator;
-        elif isinstance(op, ast.Is):
-            result = result + left + " == " + comparator; # Probably wrong
-        elif isinstance(op, ast.IsNot):
-            result = result + left + " ~= " + comparator; # Probably wrong
-        elif isinstance(op, ast.In):
-            # ropy.operator_in(left, comparator)
-            result = result + "ropy.operator_in(" + left + ", " + comparator + ")";
-        elif isinstance(op, ast.NotIn):
-            # not ropy.operator_in(left, comparator)
-            result = result + "not ropy.operator_in(" + left + ", " + comparator + ")";
+    return "";
 
-    return result;
+# left in comparator for a container of a known type, as a lookup that's nil when it isn't found.
+# Python evaluates left first, the lookups evaluate comparator first, so comparator has to be a name
+def get_membership(left_node: ast.expr, comparator_node: ast.expr, left: str, comparator: str, block: CodeBlock) -> str | None:
+    if not isinstance(comparator_node, ast.Name): return None;
 
-def transpile_unaryop(node: ast.UnaryOp, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    type = get_type(comparator_node, block);
 
-    # Check the operator
-    if isinstance(node.op, ast.UAdd):
-        result = result + "+";
-    elif isinstance(node.op, ast.USub):
-        result = result + "-";
-    elif isinstance(node.op, ast.Not):
-        result = result + "not ";
-    elif isinstance(node.op, ast.Invert):
-        result = result + "not ";
+    # Dicts are looked up by key, lists and sets are arrays
+    if type == "dict": return comparator + "[" + left + "]";
+    if type == "list" or type == "set": return "table.find(" + comparator + ", " + left + ")";
+    if type == "str" and get_type(left_node, block) == "str": return "string.find(" + comparator + ", " + left + ", 1, true)";
 
-    result = result + transpile_expression(node.operand);
+    return None;
 
-    return result;
+comparison_symbols: dict[type, str] = {
+    ast.Eq: " == ",
+    ast.NotEq: " ~= ",
+    ast.Lt: " < ",
+    ast.LtE: " <= ",
+    ast.Gt: " > ",
+    ast.GtE: " >= ",
+    ast.Is: " == ", # Probably wrong
+    ast.IsNot: " ~= ", # Probably wrong
+};
 
-def transpile_list(node: ast.List, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+# left op comparator, for operands that don't need to be evaluated in a particular order
+def get_comparison(op: ast.cmpop, left_node: ast.expr, comparator_node: ast.expr, left: str, comparator: str, block: CodeBlock) -> str:
+    symbol = comparison_symbols.get(type(op));
 
-    result = result + "{";
+    if symbol is not None:
+        return wrap(left, left_node, precedence_compare + 1) + symbol + wrap(comparator, comparator_node, precedence_compare + 1);
 
-    # Loop through the expressions
-    for i in range(0, len(node.elts)):
-        elt = node.elts[i];
-        result = result + transpile_expression(elt, block);
-        if i != len(node.elts) - 1:
-            result = result + ", ";
+    negated = isinstance(op, ast.NotIn);
+    membership = get_membership(left_node, comparator_node, wrap(left, left_node, precedence_compare + 1), wrap(comparator, comparator_node, precedence_compare + 1), block);
 
-    result = result + "}";
+    if membership is not None: return membership + (" == nil" if negated else " ~= nil");
 
-    return result;
+    # ropy.operator_in(left, comparator)
+    return ("not " if negated else "") + block.context.use_runtime("ropy.operator_in") + "(" + left + ", " + comparator + ")";
+
+@register_nested(ast.Compare, lambda node, block: [node.left] + node.comparators)
+def transpile_compare(node: ast.Compare, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    # Most are a single comparison
+    if len(node.ops) == 1: return initialise_string(node, block) + get_comparison(node.ops[0], operands[0], operands[1], parts[0], parts[1], block);
+
+    # Comparisons don't chain in Luau, a < b < c is written as a < b and b < c when b is a name or a constant
+    if all(type(operand) in leaf_types for operand in operands[1:-1]):
+        return initialise_string(node, block) + " and ".join(get_comparison(node.ops[i], operands[i], operands[i + 1], parts[i], parts[i + 1], block) for i in range(0, len(node.ops)));
+
+    # Anything else can't be evaluated twice, so a closure stores the operands in locals, in order. A comparison's
+    # comparator is only evaluated once the comparisons before it held
+    offset = block.get_offset(1);
+    lines = [];
+    nodes = list(operands);
 
+    for i in range(0, len(node.ops)):
+        for j in ([0, 1] if i == 0 else [i + 1]):
+            if j == len(node.ops) or type(operands[j]) in leaf_types: continue;
+
+            variable = "_ropy_compare_" + str(j);
+            nodes[j] = ast.Name(id=variable, ctx=ast.Load());
+            lines.append(offset + "local " + variable + " = " + parts[j] + ";\n");
+
+        left = nodes[i].id if nodes[i] is not operands[i] else parts[i];
+        comparator = nodes[i + 1].id if nodes[i + 1] is not operands[i + 1] else parts[i + 1];
+        comparison = get_comparison(node.ops[i], nodes[i], nodes[i + 1], left, comparator, block);
+
+        if i == len(node.ops) - 1:
+            lines.append(offset + "return " + comparison + ";\n");
+        else:
+            lines.append(offset + "if not (" + comparison + ") then return false end\n");
+
+    return initialise_string(node, block) + "(function()\n" + "".join(lines) + block.get_offset() + "end)()";
+
+# Luau has no unary +, it doesn't change a number anyway
+unary_symbols: dict[type, str] = {
+    ast.UAdd: "",
+    ast.USub: "-",
+    ast.Not: "not ",
+    ast.Invert: "not ",
+};
+
+@register_nested(ast.UnaryOp, lambda node, block: [node.operand])
+def transpile_unaryop(node: ast.UnaryOp, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    symbol = unary_symbols[type(node.op)];
+    text = wrap(parts[0], node.operand, precedence_unary);
+
+    # - -x, as --x would start a comment
+    if symbol == "-" and text.startswith("-"): text = " " + text;
+
+    return initialise_string(node, block) + symbol + text;
+
+@register_nested(ast.List, lambda node, block: node.elts)
+def transpile_list(node: ast.List, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    return initialise_string(node, block) + "{" + ", ".join(parts) + "}";
+
+@register_expression(ast.Lambda)
 def transpile_lamba(node: ast.Lambda, block: CodeBlock) -> str:
     result = initialise_string(node, block)
 
-    # Header
-    result = result + "function (";
+    # A lambda's body is a single expression
+    lambda_block = block.add_child("lambda");
+    arguments = node.args;
+    lambda_block.bound = { argument.arg for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg] if argument is not None };
 
-    # Loop through the arguments
-    for i in range(0, len(node.args.args)):
-        arg = node.args.args[i];
-        result = result + arg.arg;
-        if i != len(node.args.args) - 1:
-            result = result + ", ";
+    return result + "function(" + ", ".join([arg.arg for arg in node.args.args]) + ") return " + transpile_expression(node.body, lambda_block) + " end";
 
-    result = result + ")";
-    result = result + transpile_lines(node.body, block.add_child("lambda"));
+# The operands of a run of operators of the same precedence, e.g a + b - c is [a, b, c]. Python nests a run
+# one operator per level, down the left side (or the right side for **, which groups to the right)
+def get_binop_operands(node: ast.BinOp, block: CodeBlock) -> list[ast.expr]:
+    # Most are a single operator
+    if type(node.left) is not ast.BinOp and type(node.right) is not ast.BinOp: return [node.left, node.right];
 
-    return result;
+    precedence = binary_precedences.get(type(node.op));
 
-def transpile_binop(node: ast.BinOp, block: CodeBlock) -> str:
-    # BinOp(expr left, operator op, expr right)
-    result = initialise_string(node, block)
-    
-    result = result + transpile_expression(node.left, block);
+    if precedence is None: return [node.left, node.right];
 
-    result = result + transpile_operator(node.op, block);
+    operands = [];
 
-    result = result + transpile_expression(node.right, block);
+    if precedence == precedence_power:
+        while type(node) is ast.BinOp and binary_precedences.get(type(node.op)) == precedence:
+            operands.append(node.left);
+            node = node.right;
 
-    return result;
+        operands.append(node);
+
+        return operands;
+
+    while type(node) is ast.BinOp and binary_precedences.get(type(node.op)) == precedence:
+        operands.append(node.right);
+        node = node.left;
+
+    operands.append(node);
+    operands.reverse();
+
+    return operands;
+
+# The operators between a run's operands, e.g [+, -]
+def get_binop_operators(node: ast.BinOp, count: int) -> list[ast.operator]:
+    if count == 1: return [node.op];
+
+    operators = [];
+    power = binary_precedences.get(type(node.op)) == precedence_power;
 
+    for _ in range(0, count):
+        operators.append(node.op);
+        node = node.right if power else node.left;
+
+    if not power: operators.reverse();
+
+    return operators;
+
+@register_nested(ast.BinOp, get_binop_operands)
+def transpile_binop(node: ast.BinOp, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    precedence = binary_precedences.get(type(node.op), precedence_atom);
+    # The side the run groups towards can hold an operator of the same precedence without parentheses
+    grouped = len(operands) - 1 if precedence == precedence_power else 0;
+
+    # Most are a single operator
+    if len(operands) == 2:
+        left = wrap(parts[0], operands[0], precedence if grouped == 0 else precedence + 1);
+        right = wrap(parts[1], operands[1], precedence if grouped == 1 else precedence + 1);
+        symbol = transpile_operator(node.op, block);
+
+        # a - -b would be a comment
+        if symbol.endswith("-") and right.startswith("-"): right = " " + right;
+
+        return initialise_string(node, block) + left + symbol + right;
+
+    operators = get_binop_operators(node, len(operands) - 1);
+    result = [initialise_string(node, block)];
+
+    for i in range(0, len(operands)):
+        text = parts[i];
+        if type(operands[i]) not in atom_types: text = wrap(text, operands[i], precedence if i == grouped else precedence + 1);
+
+        if i > 0:
+            symbol = transpile_operator(operators[i - 1], block);
+            result.append(symbol);
+
+            # a - -b would be a comment
+            if symbol.endswith("-") and text.startswith("-"): text = " " + text;
+
+        result.append(text);
+
+    return "".join(result);
+
+# A yield's value would be what the iterator is resumed with, which a for loop doesn't pass on
+@register_expression(ast.Yield)
 def transpile_yield(node: ast.Yield, block: CodeBlock):
-    result = initialise_string(node, block)
+    raise TranspilationError("yield is only supported as a statement of its own");
 
-    block.add_variable("yield");
+# yield and yield from, as statements of a generator's coroutine. Every item comes with how many came
+# before it plus one, so it's never a nil key (which would end the for loop over the generator)
+def get_yield_statement(node: ast.Yield | ast.YieldFrom, block: CodeBlock) -> str:
+    scope = block.function_block.scope;
 
-    result = result + "yield[#yield+1] = " + transpile_expression(node.value, block);
+    if scope is None or not scope.generator: raise TranspilationError("yield outside of a function");
 
-    return result;
+    if type(node) is ast.YieldFrom:
+        return "for _, _ropy_value in " + transpile_expression(node.value, block) + " do _ropy_index = _ropy_index + 1; coroutine.yield(_ropy_index, _ropy_value) end";
 
-def transpile_subscript(node: ast.Subscript, block: CodeBlock):
-    result = initialise_string(node, block)
+    value = transpile_expression(node.value, block) if node.value is not None else "nil";
 
-    # Build the subscript in lua {} notation
-    result = result + transpile_expression(node.value, block);
-    result = result + "[";
-    result = result + transpile_expression(node.slice, block);
-    result = result + "]";
+    return "_ropy_index = _ropy_index + 1; coroutine.yield(_ropy_index, " + value + ")";
 
-    return result;
+# Every method name of builtin_attribute_functions, calls of those can't be written as they are
+builtin_attribute_names: set[str] = set(name for functions in builtin_attribute_functions.values() for name in functions);
 
-def transpile_delete(node: ast.Delete, block: CodeBlock):
-    result = initialise_string(node, block)
+# Whether the call is written as it is, func(args), rather than as one of the builtins transpile_call knows
+def is_plain_call(node: ast.Call, block: CodeBlock) -> bool:
+    if get_reduction(node, block) is not None: return False;
+    if isinstance(node.func, ast.Attribute): return node.func.attr not in builtin_attribute_names;
+    if isinstance(node.func, ast.Name): return node.func.id not in builtin_functions and node.func.id not in builtin_functions["discriminate_tables"];
 
-    # Loop through the targets and add " = nil" after it
-    for i in range(0, len(node.targets)):
-        target = node.targets[i];
+    return True;
 
-        result = result + transpile_expression(target, block);
+# The expression an attribute, subscript or call is on, wrapped if it can't be indexed or called as it is
+def get_prefix(node: ast.expr, text: str) -> str:
+    return text if type(node) in prefix_types else "(" + text + ")";
 
-        if i != len(node.targets) - 1:
-            result = result + ", ";
+@register_nested(ast.Attribute, lambda node, block: [node.value])
+def transpile_attribute(node: ast.Attribute, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    return initialise_string(node, block) + get_prefix(node.value, parts[0]) + "." + node.attr;
 
-        result = result + " = nil";
+@register_nested(ast.Subscript, lambda node, block: [node.value, node.slice])
+def transpile_subscript(node: ast.Subscript, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    # Build the subscript in lua {} notation
+    return initialise_string(node, block) + get_prefix(node.value, parts[0]) + "[" + parts[1] + "]";
 
-    return result;
+# Calls of builtins (and reductions) are left to transpile_call
+def get_call_operands(node: ast.Call, block: CodeBlock) -> list[ast.expr] | None:
+    if not is_plain_call(node, block): return None;
 
-def transpile_augassign(node: ast.AugAssign, block: CodeBlock) -> str:
+    return [node.func] + node.args;
+
+@register_nested(ast.Call, get_call_operands, transpile_call)
+def transpile_plain_call(node: ast.Call, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    return initialise_string(node, block) + get_prefix(node.func, parts[0]) + "(" + ", ".join(parts[1:]) + ")";
+
+@register_statement(ast.Delete)
+def transpile_delete(node: ast.Delete, block: CodeBlock):
     result = initialise_string(node, block)
 
+    # Loop through the targets and add " = nil" after it
+    return result + ", ".join([transpile_expression(target, block) + " = nil" for target in node.targets]);
+
+@register_statement(ast.AugAssign)
+def transpile_augassign(node: ast.AugAssign, block: CodeBlock) -> str:
     # x += 1
     # x = x + 1
     # target = target op value
 
     target = transpile_expression(node.target, block)
     op = transpile_operator(node.op, block)
-    value = transpile_expression(node.value, block)
-
-    result = target + " = " + target + " " + op + " " + value;
-
-    return result;
+    # x -= a - b is x = x - (a - b)
+    value = wrap(transpile_expression(node.value, block), node.value, binary_precedences.get(type(node.op), precedence_power) + 1)
 
-def transpile_attribute(node: ast.Attribute, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    return target + " = " + target + " " + op + " " + value;
 
-    result = result + transpile_expression(node.value, block);
-    result = result + "." + node.attr;
+# Keys and values, one after the other
+def get_dict_operands(node: ast.Dict, block: CodeBlock) -> list[ast.expr]:
+    operands = [];
 
-    return result;
+    for i in range(0, len(node.keys)):
+        # {**other} has no key
+        if node.keys[i] is None: raise TranspilationError("unpacking in dict literals isn't supported");
 
-def transpile_dict(node: ast.Dict, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+        operands.append(node.keys[i]);
+        operands.append(node.values[i]);
 
-    result = result + "{";
+    return operands;
 
-    # Loop through the keys and values
-    for i in range(0, len(node.keys)):
-        key = node.keys[i];
-        value = node.values[i];
-        result = result + transpile_expression(key);
-        result = result + " = ";
-        result = result + transpile_expression(value);
-        if i != len(node.keys) - 1:
-            result = result + ", ";
-    
-    result = result + "}";
+@register_nested(ast.Dict, get_dict_operands)
+def transpile_dict(node: ast.Dict, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    pairs = ["[" + parts[i] + "] = " + parts[i + 1] for i in range(0, len(parts), 2)];
 
-    return result;
+    return initialise_string(node, block) + "{" + ", ".join(pairs) + "}";
 
+@register_expression(ast.Name)
 def transpile_name(node: ast.Name, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    return initialise_string(node, block) + node.id;
 
-    result = result + node.id;
+def transpile_string(node: ast.Constant, block: CodeBlock) -> str:
+    return initialise_string(node, block) + string_util.to_luau_string(node.value);
 
-    return result;
+@register_expression(ast.Constant)
+def transpile_constant(node: ast.Constant, block: CodeBlock) -> str:
+    if isinstance(node.value, str): return transpile_string(node, block);
 
-def transpile_string(node: ast.Str, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+    # bool has to be checked before int, as it's a subclass of it
+    if node.value is True: return initialise_string(node, block) + "true";
+    if node.value is False: return initialise_string(node, block) + "false";
+    if node.value is None: return initialise_string(node, block) + "nil";
 
-    result = result + "\"" + node.s + "\"";
+    if isinstance(node.value, int) or isinstance(node.value, float):
+        return initialise_string(node, block) + str(node.value);
 
-    return result;
+    raise TranspilationError("unsupported constant " + repr(node.value));
 
-def transpile_set(node: ast.Set, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+@register_expression(ast.NamedExpr)
+def transpile_namedexpr(node: ast.NamedExpr, block: CodeBlock) -> str:
+    return transpile_expression(node.target, block) + " = " + transpile_expression(node.value, block);
 
-    result = result + "{";
+# a if x else b if y else c nests down the else side, it's written with elseif: test, body, test, body, ..., else
+def get_ifexp_operands(node: ast.IfExp, block: CodeBlock) -> list[ast.expr]:
+    operands = [];
 
-    # Loop through the expressions
-    for i in range(0, len(node.elts)):
-        elt = node.elts[i];
-        result = result + transpile_expression(elt, block);
-        if i != len(node.elts) - 1:
-            result = result + ", ";
+    while type(node) is ast.IfExp:
+        operands.append(node.test);
+        operands.append(node.body);
+        node = node.orelse;
 
-    result = result + "}";
+    operands.append(node);
 
-    return result;
+    return operands;
 
-def transpile_starred(node: ast.Starred, block: CodeBlock) -> str:
-    result = initialise_string(node, block)
+@register_nested(ast.IfExp, get_ifexp_operands)
+def transpile_ifexp(node: ast.IfExp, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    branches = [parts[i] + " then " + parts[i + 1] for i in range(0, len(parts) - 1, 2)];
 
-    result = result + "--[[*]]";
-    result = result + transpile_expression(node.value, block);
+    return initialise_string(node, block) + "if " + " elseif ".join(branches) + " else " + parts[-1];
 
-    return result;
+# Await (what is the equivalent in lua?)
+@register_expression(ast.Await)
+def transpile_await(node: ast.Await, block: CodeBlock) -> str:
+    return transpile_expression(node.value, block);
 
-# Selector function
-def transpile_expression(expression: ast.Expr | ast.expr, block: CodeBlock) -> str:
-    # BoolOp
-    if isinstance(expression, ast.BoolOp):
-        return transpile_boolop(expression, block);
+@register_statement(ast.Expr)
+def transpile_expr(node: ast.Expr, block: CodeBlock) -> str:
+    if type(node.value) is ast.Yield or type(node.value) is ast.YieldFrom: return initialise_string(node, block) + get_yield_statement(node.value, block);
 
-    # NamedExpr (probably needs to be a separate function)
-    if isinstance(expression, ast.NamedExpr):
-        return expression.name + " = " + transpile_expression(expression.value, block);
+    statement = get_method_statement(node.value, block);
+    if statement is not None: return initialise_string(node, block) + statement;
 
-    # BinOp
-    if isinstance(expression, ast.BinOp):
-        return transpile_binop(expression, block);
+    return transpile_expression(node.value, block);
 
-    # UnaryOp
-    if isinstance(expression, ast.UnaryOp):
-        return transpile_unaryop(expression.op, block);
-    
-    # Lambda
-    if isinstance(expression, ast.Lambda):
-        return transpile_lamba(expression, block);
+@register_nested(ast.Set, lambda node, block: node.elts)
+def transpile_set(node: ast.Set, operands: list[ast.expr], parts: list[str], block: CodeBlock) -> str:
+    return initialise_string(node, block) + "{" + ", ".join(parts) + "}";
 
-    # IfExp (should be a separate function)
-    if isinstance(expression, ast.IfExp):
-        return transpile_expression(expression.test, block) + " ? " + transpile_expression(expression.body, block) + " : " + transpile_expression(expression.orelse, block);
+@register_expression(ast.Starred)
+def transpile_starred(node: ast.Starred, block: CodeBlock) -> str:
+    return initialise_string(node, block) + "--[[*]]" + transpile_expression(node.value, block);
+
+# Selector function
+def transpile_expression(expression: ast.Expr | ast.expr, block: CodeBlock) -> str:
+    handler = expression_handlers.get(type(expression)) or find_handler(expression_handlers, type(expression));
 
-    # Dict (should be a separate function)
-    if isinstance(expression, ast.Dict):
-        return transpile_dict(expression, block);
+    # Expr is a statement, but it's allowed wherever an expression is
+    if handler is None and isinstance(expression, ast.Expr):
+        return transpile_expr(expression, block);
 
-    # Set (should be a separate function)
-    if isinstance(expression, ast.Set):
-        return transpile_set(expression, block);
+    if handler is None:
+        raise TranspilationError("unknown expression " + expression.__class__.__name__);
 
-    # Await (what is the equivalent in lua?)
-    if isinstance(expression, ast.Await):
-        return transpile_expression(expression.value, block);
+    # transpile_nested times the nodes it handles itself
+    if block.context.profiler is not None and handler is not transpile_nested: return block.context.profiler.call(handler, expression, block);
 
-    # Yield (what is the equivalent in lua?)
-    if isinstance(expression, ast.Yield):
-        return transpile_yield(expression, block);
+    return handler(expression, block);
 
-    # Subscript
-    if isinstance(expression, ast.Subscript):
-        return transpile_subscript(expression, block);
+# Selector function
+def transpile_statement(statement: ast.stmt | list[ast.stmt], block: CodeBlock) -> str:
+    handler = statement_handlers.get(type(statement)) or find_handler(statement_handlers, type(statement));
 
-    # Compare
-    if isinstance(expression, ast.Compare):
-        return transpile_compare(expression, block);
+    if handler is None:
+        raise TranspilationError("unknown statement " + statement.__class__.__name__);
 
-    # List
-    if isinstance(expression, ast.List):
-        return transpile_list(expression, block);
+    if block.context.profiler is not None: return block.context.profiler.call(handler, statement, block);
 
-    # ListComp
-    if isinstance(expression, ast.ListComp):
-        return transpile_listcomp(expression, block);
+    return handler(statement, block);
 
-    # GeneratorExpr
-    if isinstance(expression, ast.GeneratorExp):
-        return transpile_generatorexp(expression, block);
+# Selector function
+def transpile_operator(operator: ast.operator, block: CodeBlock) -> str:
+    symbol = operator_symbols.get(type(operator));
 
-    # Attribute
-    if isinstance(expression, ast.Attribute):
-        return transpile_attribute(expression, block);
-    
-    # Call
-    if isinstance(expression, ast.Call):
-        return transpile_call(expression, block);
+    if symbol is None:
+        raise TranspilationError("unknown operator " + operator.__class__.__name__);
 
-    # Name
-    if isinstance(expression, ast.Name):
-        return transpile_name(expression, block);
+    return initialise_string(operator, block) + symbol;
 
-    # Num (should be a separate function)
-    if isinstance(expression, ast.Num):
-        return str(expression.n);
+def transpile_statements(statements: list[ast.stmt], block: CodeBlock) -> str:
+    emitter = block.context.emitter;
 
-    # Str
-    if isinstance(expression, ast.Str):
-        return transpile_string(expression, block);
+    emitter.begin_capture();
 
-    # Expr
-    if isinstance(expression, ast.Expr):
-        return transpile_expression(expression.value, block);
+    for statement in statements:
+        emitter.write(transpile_statement(statement, block));
 
-    # Starred
-    if isinstance(expression, ast.Starred):
-        return transpile_starred(expression, block);
+    return emitter.end_capture();
 
-    print("Warning: unknown expression " + expression.__class__.__name__);
-    exit();
+def transpile_expressions(expressions: list[ast.expr], block: CodeBlock) -> str:
+    return "".join([transpile_expression(expression, block) for expression in expressions]);
 
 # Selector function
-def transpile_statement(statement: ast.stmt | list[ast.stmt], block: CodeBlock) -> str:
-    # If the statement is a FunctionDef
-    if isinstance(statement, ast.FunctionDef):
-        return transpile_function(statement, block);
+def transpile_line(node: ast.Expr | ast.expr | ast.stmt, block: CodeBlock) -> None:
+    emitter = block.context.emitter;
+
+    # Check if statement or expression
+    if not (isinstance(node, ast.expr) or isinstance(node, ast.stmt) or isinstance(node, ast.operator)):
+        raise TranspilationError("unknown node " + node.__class__.__name__ + " which inherits from " + node.__class__.__bases__[0].__name__);
 
-    # If the statement is a If
-    if isinstance(statement, ast.If):
-        return transpile_if(statement, block);
+    emitter.write(block.get_offset());
 
-    # Return
-    if isinstance(statement, ast.Return):
-        return transpile_return(statement, block);
+    if emitter.source_map is not None and hasattr(node, "lineno"): emitter.mark(node.lineno, node.col_offset);
 
-    # Delete
-    if isinstance(statement, ast.Delete):
-        return transpile_delete(statement, block);
+    # Statements with a body are written while they're transpiled, the rest is returned
+    if isinstance(node, ast.expr):
+        emitter.write(transpile_expression(node, block));
+    elif isinstance(node, ast.stmt):
+        emitter.write(transpile_statement(node, block));
+    else:
+        emitter.write(transpile_operator(node, block));
 
-    # While
-    if isinstance(statement, ast.While):
-        return transpile_while(statement, block);
+    emitter.write((" -- Line " + str(node.lineno) + "\n") if toggle_line_of_code else "\n");
 
-    # Assign
-    if isinstance(statement, ast.Assign):
-        return transpile_assign(statement, block);
+# Modules that only exist for annotations, importing them does nothing in Luau
+annotation_modules: set[str] = { "typing", "__future__" };
 
-    # AugAssign
-    if isinstance(statement, ast.AugAssign):
-        return transpile_augassign(statement, block);
+# Statements that only matter to annotations: x: int (without a value), and imports from typing
+def is_annotation_only(node: ast.stmt) -> bool:
+    if type(node) is ast.AnnAssign: return node.value is None;
+    if type(node) is ast.ImportFrom: return node.module in annotation_modules;
+    if type(node) is ast.Import: return all(alias.name in annotation_modules for alias in node.names);
 
-    # For
-    if isinstance(statement, ast.For):
-        return transpile_for(statement, block);
+    return False;
 
-    # Expr
-    if isinstance(statement, ast.Expr):
-        return transpile_expression(statement.value, block);
+def transpile_lines(node: list[ast.expr | ast.Expr | ast.stmt | ast.operator], block: CodeBlock) -> None:
+    # If statement is a list of statements/expressions
+    if node.__class__.__name__ != "list":
+        return;
 
-    print("Warning: unknown statement " + statement.__class__.__name__)
-    exit();
+    for line in node:
+        # Only the scope analysis needs these
+        if type(line) in declaration_statements: continue;
+        if is_annotation_only(line): continue;
 
-# Selector function
-def transpile_operator(operator: ast.operator, block: CodeBlock) -> str:
-    result = initialise_string(operator, block)
+        transpile_line(line, block);
 
-    # Check the operator
-    if isinstance(operator, ast.Add):
-        return result + "+";
+# Words of a "# ropy: ..." comment -> the Luau directive they stand for
+module_directives: dict[str, str] = {
+    "strict": "--!strict",
+    "nonstrict": "--!nonstrict",
+    "optimize": "--!optimize 2",
+    "native": "--!native",
+};
 
-    if isinstance(operator, ast.Sub):
-        return result + "-";
+# Directives a module opts into with a comment before its code, e.g "# ropy: strict, optimize, native"
+def get_directives(source: str) -> list[str]:
+    directives = [];
 
-    if isinstance(operator, ast.Mult):
-        return result + "*";
+    for line in source.splitlines():
+        line = line.strip();
 
-    if isinstance(operator, ast.Div):
-        return result + "/";
+        if line == "": continue;
+        if not line.startswith("#"): break;
 
-    if isinstance(operator, ast.Mod):
-        return result + "%";
+        comment = line[1:].strip();
+        if not comment.startswith("ropy:"): continue;
 
-    if isinstance(operator, ast.Pow):
-        return result + "^";
-    
-    print("Warning: Unknown operator " + operator.__class__.__name__);
-    exit();
+        for word in comment[len("ropy:"):].replace(",", " ").split():
+            if word not in module_directives: raise TranspilationError("unknown directive \"" + word + "\" (expected one of " + ", ".join(module_directives) + ")");
+            if module_directives[word] not in directives: directives.append(module_directives[word]);
 
-def transpile_statements(statements: list[ast.stmt], block: CodeBlock) -> str:
-    result = "";
+    return directives;
 
-    for statement in statements:
-        result = result + transpile_statement(statement, block);
+# Returns the Luau code, or "" if the context streams its output
+# The module's source is only needed for the directives in its comments
+def transpile_module(module: ast.Module, context: TranspilationContext | None = None, source: str | None = None) -> str:
+    # Every module gets a fresh context unless the caller wants to inspect it afterwards
+    if context is None: context = TranspilationContext();
 
-    return result;
+    folder = constant_folding.ConstantFolder(module);
+    # Functions dead code elimination removed every yield of
+    generators = set();
+    eliminator = None;
 
-def transpile_expressions(expressions: list[ast.expr], block: CodeBlock) -> str:
-    result = "";
+    # Before folding, so that what's removed isn't folded first. It folds the tests it decides on itself
+    if context.options.get("dead_code", True):
+        eliminator = dead_code.DeadCodeEliminator(module, folder, source, context.script);
+        eliminator.eliminate();
+        context.dead_code_size = eliminator.removed_size;
+        context.constants = eliminator.constants;
+        generators = eliminator.generators;
 
-    for expression in expressions:
-        result = result + transpile_expression(expression, block);
+    # Before folding, which folds what constant arguments make constant (lerp(0, 10, 0.5) -> 5)
+    inline_budget = context.options.get("inline_budget", inlining.default_budget);
 
-    return result;
+    if inline_budget > 0:
+        inliner = inlining.Inliner(module, inline_budget, source);
+        inliner.inline();
+        context.inlined_calls = inliner.inlined;
+        context.inlined = inliner.fingerprints;
 
-# Selector function
-def transpile_line(node: ast.Expr | ast.expr | ast.stmt, block: CodeBlock) -> str:
-    # Check if statement or expression
-    result = "";
+        # Functions whose every call was inlined are left unused
+        if eliminator is not None and inliner.inlined > 0 and source is not None:
+            eliminator.remove_functions(inliner.get_mentions());
+            context.dead_code_size = eliminator.removed_size;
 
-    if isinstance(node, ast.Expr) or isinstance(node, ast.expr):
-        result = transpile_expression(node, block);
+    if context.options.get("constant_folding", True):
+        module = constant_folding.fold_constants(module, folder);
 
-    if isinstance(node, ast.stmt):
-        result = transpile_statement(node, block);
+    context.shadowed_names = folder.shadowed;
 
-    if isinstance(node, ast.operator):
-        result = transpile_operator(node, block);
+    if context.options.get("rename_locals", False):
+        context.renamed_size = renaming.shorten_locals(module, context.renames);
 
-    if result == "":
-        print("Warning: unknown node " + node.__class__.__name__ + " which inherits from " + node.__class__.__bases__[0].__name__);
-        exit();
-    
-    return (
-        block.get_offset() + result + 
-        ( (" -- Line " + str(node.lineno) + "\n") if toggle_line_of_code else "\n" )
-    );
+    # Names are resolved once up front, emission only looks them up
+    context.symbols = scope_util.analyse(module);
 
-def transpile_lines(node: list[ast.expr | ast.Expr | ast.stmt | ast.operator], block: CodeBlock) -> str:
-    # If statement is a list of statements/expressions
-    result: str = "";
+    for function in generators: context.symbols.get_scope(function).generator = True;
+    context.top_block.scope = context.symbols.module;
 
-    if node.__class__.__name__ != "list":
-        return result;
+    # Directives have to come before any code
+    if source is not None:
+        for directive in get_directives(source):
+            context.emitter.write(directive + "\n");
 
-    for i in range(0, len(node)):
-        result = result + transpile_line(node[i], block);
+    # The ropy members the module uses are only known once it's been emitted,
+    # a module that doesn't use any doesn't require ropy at all
+    runtime_slot = context.emitter.reserve_head();
 
-    return result;
+    transpile_lines(module.body, context.top_block);
+
+    aliases = context.runtime_aliases;
+    header = "";
 
-def transpile_module(module: ast.Module) -> str:
-    global top_block
-    result = 'local ropy = require(game:FindFirstChild("ropy", true))\n\n';
-    result = result + transpile_lines(module.body, top_block);
+    if len(aliases) > 0:
+        header = 'local ropy = require(game:FindFirstChild("ropy", true))\n';
+        header = header + "".join(["local " + aliases[member] + " = " + member + ";\n" for member in aliases]) + "\n";
 
-    # Reset top block
-    top_block = CodeBlock("0", "module", [], []);
+    context.emitter.fill(runtime_slot, header);
 
-    return result
\ No newline at end of file
+    return context.emitter.getvalue();
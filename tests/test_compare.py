@@ -0,0 +1,28 @@
+from src.roblox_py import api
+
+def transpile(source: str) -> str:
+    luau, diagnostics = api.transpile(source, options={ "inline_budget": 0 });
+    assert diagnostics == [];
+
+    return luau;
+
+def test_single_comparison():
+    assert "print(a < b)" in transpile("a = 1\nb = 2\nprint(a < b)\n");
+
+def test_chain_of_names():
+    assert "print(a < b and b < c)" in transpile("a = 1\nb = 2\nc = 3\nprint(a < b < c)\n");
+
+def test_chain_calls_middle_once():
+    luau = transpile("def f():\n    return 2\na = 1\nprint(a < f() < 3)\n");
+
+    assert luau.count("= f()") == 1 and "< f()" not in luau;
+    assert "local _ropy_compare_1 = f();" in luau;
+    assert "if not (a < _ropy_compare_1) then return false end" in luau;
+    assert "return _ropy_compare_1 < 3;" in luau;
+
+def test_chain_keeps_order():
+    luau = transpile("def f():\n    return 2\ndef g():\n    return 1\ndef h():\n    return 3\nprint(g() < f() < h())\n");
+
+    assert luau.index("local _ropy_compare_0 = g();") < luau.index("local _ropy_compare_1 = f();");
+    # h() is only called once g() < f() held
+    assert luau.index("then return false end") < luau.index("return _ropy_compare_1 < h();");
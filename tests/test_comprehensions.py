@@ -0,0 +1,31 @@
+from src.roblox_py.transpiler import transpiler
+
+def transpile(source: str) -> str:
+    attempt = transpiler.transpile_source("items = [1, 2, 3]\n" + source, "main.server.py", options={ "dead_code": False, "inline_budget": 0 });
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+def test_assigned_comprehensions_are_loops():
+    luau = transpile("squares = [x * x for x in items if x > 1]\n");
+
+    assert "local squares = {};\nfor _,x in items do\n\tif x > 1 then\n\t\ttable.insert(squares, x*x);\n\tend\nend\n" in luau;
+    assert "function" not in luau;
+
+def test_sized_comprehensions_are_preallocated():
+    luau = transpile("print([x for x in range(10)])\n");
+
+    assert "table.create(10)" in luau;
+    assert "for x = 0, 9 do" in luau;
+
+def test_consumed_generators_dont_materialize():
+    luau = transpile("total = sum(x for x in items)\n");
+
+    assert "local total = 0;\nfor _,x in items do\n\ttotal = total + x;\nend\n" in luau;
+    assert "{}" not in luau.split("\n", 1)[1];
+
+def test_any_stops_at_the_first_match():
+    luau = transpile("print(any(x > 2 for x in items))\n");
+
+    assert "if x > 2 then _ropy_result = true; break end" in luau;
+    assert "table.insert" not in luau;
@@ -0,0 +1,54 @@
+from src.roblox_py.transpiler import transpiler
+
+def transpile(source: str, path: str = "main.server.py") -> str:
+    attempt = transpiler.transpile_source(source, path);
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+helpers = """
+def clamp(x, lo, hi):
+    return max(lo, min(x, hi))
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+"""
+
+def test_inlined_functions_are_removed():
+    luau = transpile(helpers + "def g(n):\n    x = clamp(n, 0, 10)\n    return x + lerp(0, n, 0.5)\nprint(g(5))\n");
+
+    assert "function clamp" not in luau;
+    assert "function lerp" not in luau;
+
+def test_functions_with_calls_left_are_kept():
+    # A call that's a statement of its own isn't inlined
+    luau = transpile(helpers + "def g(n):\n    lerp(0, n, 0.5)\n    return clamp(n, 0, 10)\nprint(g(5))\n");
+
+    assert "function clamp" not in luau;
+    assert "function lerp" in luau;
+
+def test_what_inlined_functions_use_is_kept():
+    luau = transpile("def _square(x):\n    print(x)\n    return x * x\ndef _norm(x):\n    return _square(x) + 1\nprint(_norm(2))\n", "main.py");
+
+    assert "function _norm" not in luau;
+    assert "function _square" in luau;
+
+def test_public_functions_of_modules_are_kept():
+    luau = transpile(helpers + "print(clamp(5, 0, 1))\n", "main.py");
+
+    assert "function clamp" in luau;
+
+def test_constant_rebound_by_walrus():
+    luau = transpile("DEBUG = False\nprint(DEBUG := True)\nif DEBUG:\n    print(1)\n");
+
+    assert "if DEBUG then" in luau;
+
+def test_constant_rebound_by_walrus_in_function():
+    luau = transpile("DEBUG = False\ndef f():\n    if (DEBUG := True):\n        print(2)\n    if DEBUG:\n        print(1)\nf()\n");
+
+    assert "print(1)" in luau;
+
+def test_constant():
+    luau = transpile("DEBUG = False\nif DEBUG:\n    print(1)\n");
+
+    assert "print(1)" not in luau;
@@ -0,0 +1,50 @@
+import io
+import ast
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.util import transpilation as transpilation_util
+
+source = """# ropy: strict
+def total(items: list[int]) -> int:
+    result = 0
+    for item in items:
+        result += item
+    return result
+
+values = [1, 2, 3]
+values.append(len(values))
+print(total(values), 3 in values, input() in input())
+"""
+
+def transpile(stream: io.StringIO | None, options: dict, buffer_size: int = 64 * 1024) -> tuple[str, dict | None]:
+    context = transpilation_util.TranspilationContext(stream, options);
+    context.emitter.buffer_size = buffer_size;
+    result = transpilation_util.transpile_module(ast.parse(source), context, source);
+    source_map = context.emitter.source_map.to_dict() if context.emitter.source_map is not None else None;
+
+    return (result if stream is None else stream.getvalue(), source_map);
+
+def test_streamed_output_matches():
+    for options in [{}, { "source_maps": True }, { "release": True }]:
+        expected = transpile(None, options);
+
+        # A buffer of one character spills every fragment before the runtime aliases at the top are known
+        for buffer_size in [1, 64 * 1024]:
+            stream = io.StringIO();
+            assert transpile(stream, options, buffer_size) == expected, (options, buffer_size);
+
+    assert expected[0].startswith("--!strict\nlocal ropy=require(");
+
+def test_stdin_writes_nothing_on_error():
+    output = io.StringIO();
+
+    assert transpiler.transpile_source("print(1)\nx = help(print)\n", "<stdin>", output)["error"] is not None;
+    assert output.getvalue() == "";
+
+def test_getvalue_is_idempotent():
+    context = transpilation_util.TranspilationContext(None, { "release": True });
+    result = transpilation_util.transpile_module(ast.parse(source), context, source);
+    sizes = (context.emitter.unminified_size, context.emitter.minified_size);
+
+    assert context.emitter.getvalue() == result;
+    assert (context.emitter.unminified_size, context.emitter.minified_size) == sizes;
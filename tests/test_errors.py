@@ -0,0 +1,36 @@
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.util import transpilation as transpilation_util
+
+import os
+
+def write_sources(folder: str, sources: dict[str, str]) -> None:
+    for name in sources:
+        with open(os.path.join(folder, name), "w") as f:
+            f.write(sources[name]);
+
+def test_help_errors_are_per_file(tmp_path):
+    source = tmp_path / "source";
+    source.mkdir();
+    write_sources(str(source), { "good.py": "print(1)\n", "builtin.py": "help(print)\n", "empty.py": "x = help()\n" });
+
+    build = transpiler.transpile_folder(str(source), str(tmp_path / "output"));
+
+    assert sorted(os.path.basename(name) for name in build["errors"]) == ["builtin.py", "empty.py"];
+    assert all("help()" in error for error in build["errors"].values());
+    assert [os.path.basename(name) for name in build["results"]] == ["good.py"];
+
+def test_help_of_a_function():
+    attempt = transpiler.transpile_source("def f(a, b):\n    \"\"\"Adds\"\"\"\n    return a + b\nhelp(f)\n");
+
+    assert "f(nil, nil, \"help\")" in attempt["result"];
+
+def test_unexpected_exceptions_are_per_file(monkeypatch):
+    def broken(node, block):
+        raise ValueError("broken handler");
+
+    monkeypatch.setitem(transpilation_util.expression_handlers, transpilation_util.ast.Lambda, broken);
+
+    attempts = list(transpiler.transpile_sources([("a.py", "f = lambda: 1\n"), ("b.py", "print(1)\n")]));
+
+    assert "ValueError: broken handler" in attempts[0]["error"];
+    assert attempts[1]["result"] is not None;
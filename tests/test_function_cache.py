@@ -0,0 +1,70 @@
+import os
+import time
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.transpiler import function_cache as function_cache_util
+
+source = """def double(x):
+    return x * 2
+
+def triple(x):
+    return x * 3
+
+print(double(1), triple(2))
+"""
+
+def transpile(source: str, folder: str, options: dict | None = None) -> dict:
+    return transpiler.transpile_source(source, "main.py", options={ "function_cache": folder, "inline_budget": 0, **(options or {}) });
+
+def test_hits_match_emitted_output(tmp_path):
+    folder = str(tmp_path / "functions");
+    os.makedirs(folder);
+
+    first = transpile(source, folder);
+    assert first["function_cache"] == { "hits": 0, "misses": 2 };
+
+    second = transpile(source, folder);
+    assert second["function_cache"] == { "hits": 2, "misses": 0 };
+    assert second["result"] == first["result"];
+    assert second["result"] == transpiler.transpile_source(source, "main.py", options={ "inline_budget": 0 })["result"];
+
+    # Only the edited function is emitted again
+    edited = transpile(source.replace("x * 3", "x * 4"), folder);
+    assert edited["function_cache"] == { "hits": 1, "misses": 1 };
+    assert "x*4" in edited["result"];
+
+def test_source_maps_from_hits(tmp_path):
+    folder = str(tmp_path / "functions");
+    os.makedirs(folder);
+    options = { "source_maps": True };
+
+    transpile(source, folder, options);
+
+    # Moved down a line, the reused function's mappings have to follow it
+    moved = "\n" + source;
+    hit = transpile(moved, folder, options);
+    expected = transpiler.transpile_source(moved, "main.py", options={ "inline_budget": 0, **options });
+
+    assert hit["function_cache"]["hits"] == 2;
+    assert hit["source_map"] == expected["source_map"];
+
+def test_evict_removes_least_recently_used(tmp_path):
+    folder = str(tmp_path);
+
+    for i, name in enumerate(["old", "used", "new"]):
+        path = os.path.join(folder, name + ".json");
+
+        with open(path, "w") as f:
+            f.write("x" * 100);
+
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i));
+
+    # A hit touches its entry
+    os.utime(os.path.join(folder, "used.json"));
+
+    assert function_cache_util.evict(folder, 250) == 1;
+    assert sorted(os.listdir(folder)) == ["new.json", "used.json"];
+
+    assert function_cache_util.evict(folder, 250) == 0;
+    assert function_cache_util.evict(folder, 0) == 2;
+    assert function_cache_util.evict(os.path.join(folder, "missing"), 0) == 0;
@@ -0,0 +1,32 @@
+from src.roblox_py.transpiler import transpiler
+
+def transpile(source: str) -> str:
+    attempt = transpiler.transpile_source(source, "main.server.py", options={ "dead_code": False, "inline_budget": 0 });
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+def test_generators_return_an_iterator_function():
+    # A loop over a range is a closure, anything else a coroutine, both are iterator functions
+    luau = transpile("from typing import Iterator, Generator\ndef count(n: int) -> Iterator[int]:\n    for i in range(n):\n        yield i\ndef names() -> Generator[str, None, None]:\n    yield 'a'\n    yield 'b'\n");
+
+    assert "function count(n: number): (...any) -> (number?, number?)\n" in luau;
+    assert "function names(): (...any) -> (number?, string?)\n" in luau;
+
+def test_iterables_are_still_arrays_elsewhere():
+    luau = transpile("from typing import Iterable\ndef first(items: Iterable[int]) -> Iterable[int]:\n    return items\n");
+
+    assert "function first(items: {number}): {number}\n" in luau;
+
+def test_range_loops_are_closures():
+    luau = transpile("def evens(n: int):\n    for i in range(2, n, 3):\n        if i % 2 == 0:\n            yield i * i\n");
+
+    assert luau == "function evens(n: number)\n\tlocal i, _ropy_limit, _ropy_index = -1, n - 1, 0;\n\treturn function()\n\t\twhile true do\n\t\t\ti = i + 3\n\t\t\tif i > _ropy_limit then return nil end\n\t\t\tif i%2 == 0 then\n\t\t\t\t_ropy_index = _ropy_index + 1\n\t\t\t\treturn _ropy_index, i*i\n\t\t\tend\n\t\tend\n\tend\nend\n\n";
+    assert "coroutine" not in luau;
+
+def test_other_loops_are_coroutines():
+    # Not a range or a list, so the loop's state can't be kept in upvalues
+    luau = transpile("def truthy(items):\n    for item in items:\n        if item:\n            yield item\n");
+
+    assert "\treturn coroutine.wrap(function()\n\t\tlocal _ropy_index = 0;\n" in luau;
+    assert "coroutine.yield(_ropy_index, item)" in luau;
@@ -0,0 +1,45 @@
+from src.roblox_py.transpiler import transpiler
+
+def transpile(source: str, options: dict | None = None) -> str:
+    attempt = transpiler.transpile_source(source, "main.server.py", options=options);
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+clamp = "def clamp(x, lo=0, hi=10):\n    return max(lo, min(x, hi))\n";
+
+def test_calls_before_the_definition_are_kept():
+    luau = transpile("print(clamp(5))\n" + clamp + "print(clamp(7))\n");
+
+    assert luau.startswith("print(clamp(5))\n");
+    assert "print(max(0, min(7, 10)))" in luau;
+
+def test_functions_defined_earlier_keep_their_calls():
+    luau = transpile("def g(x):\n    y = clamp(x)\n    return y\n" + clamp + "print(g(1), clamp(2))\n");
+
+    assert "local y = clamp(x)" in luau;
+    assert "max(0, min(2, 10))" in luau;
+
+def test_defaults_are_the_same_inlined_or_not():
+    luau = transpile(clamp + "print(clamp(5, None, 3))\nprint(clamp)\n");
+
+    # Called normally, nil gets the default too
+    assert "if lo == nil then lo = 0 end" in luau;
+    assert "if hi == nil then hi = 10 end" in luau;
+    assert "print(max(0, min(5, 3)))" in luau;
+
+def test_defaults_that_arent_literals_are_evaluated_once():
+    luau = transpile("def f(a, items=[1, 2]):\n    print(a, items)\nf(1)\n", { "inline_budget": 0 });
+
+    assert "local _ropy_default_f_items = {1, 2};\nfunction f(a, items)\n\tif items == nil then items = _ropy_default_f_items end\n" in luau;
+
+def test_inline_budget():
+    source = clamp + "print(clamp(7))\n";
+
+    # max(lo, min(x, hi)) is 7 expression nodes: two calls and five names
+    assert transpile(source, { "inline_budget": 7 }).endswith("print(max(0, min(7, 10)))\n");
+    assert transpile(source, { "inline_budget": 6 }).endswith("print(clamp(7))\n");
+
+    # 0 turns inlining off, even for the smallest bodies
+    assert transpile("def one():\n    return 1\nprint(one())\n", { "inline_budget": 0 }).endswith("print(one())\n");
+    assert transpile("def one():\n    return 1\nprint(one())\n").endswith("print(1)\n");
@@ -0,0 +1,36 @@
+from src.roblox_py import api
+
+def transpile(source: str) -> str:
+    luau, diagnostics = api.transpile(source);
+    assert diagnostics == [];
+
+    return luau;
+
+def test_loop_owns_its_variable():
+    luau = transpile("def f(n):\n    for i in range(n):\n        print(i)\n");
+
+    assert "for i = 0, n - 1 do" in luau;
+
+def test_variable_read_after_the_loop():
+    luau = transpile("def f():\n    for i in range(3):\n        print(i)\n    return i\n");
+
+    assert "local i = nil;" in luau;
+    assert "for _ropy_i = 0, 2 do" in luau;
+    assert "i = _ropy_i;" in luau;
+
+def test_variable_read_by_a_closure():
+    luau = transpile("def f():\n    for i in range(3):\n        g = lambda: i\n    return g\n");
+
+    assert "i = _ropy_i;" in luau;
+
+def test_parameter_as_variable():
+    luau = transpile("def f(i):\n    for i in range(3):\n        print(i)\n    return i\n");
+
+    assert "local i" not in luau;
+    assert "i = _ropy_i;" in luau;
+
+def test_variable_read_after_a_list_loop():
+    luau = transpile("def f(items):\n    for x in items:\n        print(x)\n    return x\n");
+
+    assert "for _,_ropy_x in items do" in luau;
+    assert "x = _ropy_x;" in luau;
@@ -0,0 +1,53 @@
+import os
+
+from src.roblox_py.transpiler import transpiler
+
+def write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True);
+
+    with open(path, "w") as f:
+        f.write(text);
+
+def build(tmp_path) -> dict:
+    return transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"), 1, str(tmp_path / ".ropy" / "manifest.json"));
+
+def test_unchanged_files_are_skipped(tmp_path):
+    first = str(tmp_path / "ropy" / "shared" / "first.py");
+    second = str(tmp_path / "ropy" / "shared" / "second.py");
+    write(first, "print(1)\n");
+    write(second, "print(2)\n");
+
+    assert sorted(build(tmp_path)["results"]) == [first, second];
+
+    build_result = build(tmp_path);
+    assert build_result["results"] == {};
+    assert sorted(build_result["skipped"]) == [first, second];
+
+    write(first, "print(3)\n");
+    build_result = build(tmp_path);
+
+    assert list(build_result["results"]) == [first];
+    assert build_result["skipped"] == [second];
+    assert open(str(tmp_path / "src" / "shared" / "first.lua")).read() == "print(3)\n";
+
+def test_outputs_of_removed_files_are_deleted(tmp_path):
+    first = str(tmp_path / "ropy" / "shared" / "first.py");
+    write(first, "print(1)\n");
+    write(str(tmp_path / "ropy" / "shared" / "second.py"), "print(2)\n");
+    build(tmp_path);
+
+    os.remove(first);
+    build_result = build(tmp_path);
+
+    assert not os.path.exists(str(tmp_path / "src" / "shared" / "first.lua"));
+    assert os.path.exists(str(tmp_path / "src" / "shared" / "second.lua"));
+    assert build_result["results"] == {};
+
+def test_edited_outputs_are_transpiled_again(tmp_path):
+    first = str(tmp_path / "ropy" / "shared" / "first.py");
+    write(first, "print(1)\n");
+    build(tmp_path);
+
+    write(str(tmp_path / "src" / "shared" / "first.lua"), "edited\n");
+
+    assert list(build(tmp_path)["results"]) == [first];
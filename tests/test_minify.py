@@ -0,0 +1,47 @@
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.util import minify as minify_util
+
+source = """# ropy: strict
+def total(values: list[int], scale: int) -> int:
+    result = 0
+    for value in values:
+        # add it
+        result = result + value * scale
+    return result
+
+names = ["a", "b -- not a comment"]
+print(total([1, 2], 3), -(-total([], 1)), names, 1.5 + 2)
+"""
+
+def transpile(options: dict) -> str:
+    attempt = transpiler.transpile_source(source, "main.server.py", options=dict(options, inline_budget=0, dead_code=False));
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+# What the Luau means: its tokens, without comments, line breaks and the semicolons minifying drops
+def get_tokens(luau: str) -> list[str]:
+    return [text for kind, text in minify_util.tokenize(luau) if kind not in ["newline", "comment"] and text != ";"];
+
+def test_minified_output_has_the_same_tokens():
+    luau = transpile({});
+    minified = transpile({ "release": True });
+
+    assert len(minified) < len(luau);
+    assert get_tokens(minified) == get_tokens(luau);
+    # Every statement keeps its own line, and directives are kept
+    assert minified.startswith("--!strict\n");
+    assert minified.count("\n") == len([line for line in luau.splitlines() if line.strip() != ""]);
+    assert "\t" not in minified;
+
+def test_locals_are_renamed():
+    luau = transpile({});
+    renamed = transpile({ "release": True, "rename_locals": True });
+    names = set(text for kind, text in minify_util.tokenize(renamed) if kind == "name");
+
+    for name in ["values", "scale", "result", "value"]: assert name not in names, name;
+    # Module level names and globals keep theirs
+    for name in ["total", "names", "print"]: assert name in names, name;
+
+    assert len(get_tokens(renamed)) == len(get_tokens(luau));
+    assert "function total(" in renamed;
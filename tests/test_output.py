@@ -0,0 +1,47 @@
+import os
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.transpiler import output as output_util
+
+# Set an old modification time, so a write would show even on file systems with coarse timestamps
+def age(path: str) -> int:
+    os.utime(path, ns=(10 ** 18, 10 ** 18));
+
+    return os.stat(path).st_mtime_ns;
+
+def test_unchanged_content_keeps_the_mtime(tmp_path):
+    path = str(tmp_path / "out" / "main.lua");
+
+    assert output_util.write_if_changed(path, "print(1)\n");
+    mtime = age(path);
+
+    assert not output_util.write_if_changed(path, "print(1)\n");
+    assert os.stat(path).st_mtime_ns == mtime;
+
+    assert output_util.write_if_changed(path, "print(2)\n");
+    assert os.stat(path).st_mtime_ns != mtime;
+    assert open(path).read() == "print(2)\n";
+    # Nothing is left of the temporary file
+    assert os.listdir(str(tmp_path / "out")) == ["main.lua"];
+
+def test_rebuilds_only_touch_changed_outputs(tmp_path):
+    os.makedirs(str(tmp_path / "ropy"));
+
+    for name in ["first", "second"]:
+        with open(str(tmp_path / "ropy" / (name + ".py")), "w") as f:
+            f.write("print(\"" + name + "\")\n");
+
+    transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"));
+    first = age(str(tmp_path / "src" / "first.lua"));
+
+    # A changed comment leaves the output as it was
+    with open(str(tmp_path / "ropy" / "first.py"), "w") as f:
+        f.write("# comment\nprint(\"first\")\n");
+
+    with open(str(tmp_path / "ropy" / "second.py"), "w") as f:
+        f.write("print(\"changed\")\n");
+
+    written = transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"), rebuild=True)["written"];
+
+    assert written == [str(tmp_path / "src" / "second.lua")];
+    assert os.stat(str(tmp_path / "src" / "first.lua")).st_mtime_ns == first;
@@ -0,0 +1,27 @@
+import sys
+import threading
+import concurrent.futures
+
+from src.roblox_py.transpiler import transpiler
+
+deep_source = "x = 1\ny = " + " + ".join(["x"] * 100000) + "\n";
+
+def test_deep_sources_parse_concurrently():
+    transpiler.parse_source("x = 1\n", "warm.py");
+    recursion_limit = sys.getrecursionlimit();
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        trees = list(executor.map(lambda i: transpiler.parse_source(deep_source if i % 2 == 0 else "x = 1\n", str(i) + ".py"), range(8)));
+
+    assert all(tree is not None for tree in trees);
+    # Neither is changed per parse, nor is the stack of threads made meanwhile
+    assert sys.getrecursionlimit() == recursion_limit;
+    assert threading.stack_size() == 0;
+
+def test_syntax_errors_are_raised_to_the_caller():
+    try:
+        transpiler.parse_source("x = (\n", "broken.py");
+    except SyntaxError as e:
+        assert e.filename == "broken.py";
+    else:
+        assert False;
@@ -0,0 +1,32 @@
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.util import profiling as profiling_util
+
+source = """
+def f(x):
+    return x
+
+items = [1, 2, 3]
+table = {"a": 1}
+y = f(items[0]) + table["a"] * -items[1]
+z = 1 if y < 3 else len(items.count)
+"""
+
+def get_handlers(source: str) -> dict:
+    attempt = transpiler.get_source_tree(source, "test.py", None, { "constant_folding": False, "inline_budget": 0 }, profiling_util.Profiler());
+    assert attempt["error"] is None;
+
+    return attempt["profile"]["handlers"];
+
+def test_nested_handlers_are_named():
+    handlers = get_handlers(source);
+
+    for name in ["transpile_binop", "transpile_unaryop", "transpile_subscript", "transpile_attribute", "transpile_plain_call", "transpile_call", "transpile_compare", "transpile_ifexp", "transpile_list", "transpile_dict"]:
+        assert name in handlers, name;
+
+    assert "transpile_nested" not in handlers;
+
+def test_deep_expression_counts_every_level():
+    # Deeper than nesting_limit, so it's written from transpile_nested's own stack
+    handlers = get_handlers("x = 1\ny = " + "-" * 300 + "x\n");
+
+    assert handlers["transpile_unaryop"]["calls"] == 300;
@@ -0,0 +1,53 @@
+import os
+import json
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.transpiler import manifest as manifest_util
+from src.roblox_py.transpiler import remap
+
+source = """def update(dt):
+    speed = dt * 2
+    print("update", speed)
+
+for i in range(3):
+    update(i)
+"""
+
+# Build with source maps, returns the remapper, the Python file and the Luau line of the print
+def build(tmp_path) -> tuple[remap.Remapper, str, int]:
+    full_name = str(tmp_path / "ropy" / "server" / "combat" / "main.server.py");
+    os.makedirs(os.path.dirname(full_name));
+
+    with open(full_name, "w") as f:
+        f.write(source);
+
+    manifest_path = str(tmp_path / "manifest.json");
+    transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"), 1, manifest_path, options={ "source_maps": True });
+
+    with open(str(tmp_path / "src" / "server" / "combat" / "main.server.lua")) as f:
+        lines = f.read().splitlines();
+
+    line = [i for i in range(len(lines)) if "print(\"update\"" in lines[i]][0] + 1;
+
+    return (remap.Remapper(manifest_util.load_manifest(manifest_path, str(tmp_path / "src"))), full_name, line);
+
+def test_stack_traces_point_at_python(tmp_path):
+    remapper, full_name, line = build(tmp_path);
+
+    text = remapper.remap("ServerScriptService.Combat.main:" + str(line) + ": attempt to call a nil value\n");
+
+    assert text == full_name + ":3: attempt to call a nil value\n";
+
+def test_profiler_exports_get_python_locations(tmp_path):
+    remapper, full_name, line = build(tmp_path);
+
+    data = json.loads(remapper.remap(json.dumps([{ "Source": "ServerScriptService.combat.main", "Line": line }])));
+
+    assert data[0]["PythonSource"] == full_name;
+    assert data[0]["PythonLine"] == 3;
+    assert data[0]["PythonFunction"] == "update";
+
+def test_unknown_scripts_are_left_alone(tmp_path):
+    remapper, full_name, line = build(tmp_path);
+
+    assert remapper.remap("Workspace.Other:4: oops\n") == "Workspace.Other:4: oops\n";
@@ -0,0 +1,29 @@
+import os
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.transpiler import runtime as runtime_util
+
+def get_members(runtime: str) -> set[str]:
+    return set(line.split(" ")[0][len("ropy."):] for line in runtime.splitlines() if line.startswith("ropy.") and " = " in line and "." not in line.split(" ")[0][len("ropy."):]);
+
+def test_only_used_members_are_kept():
+    runtime = runtime_util.build_runtime({ "ropy.append.list", "ropy.len" });
+
+    assert get_members(runtime) == { "append", "len" };
+    assert runtime.startswith("-- roblox-py");
+    assert runtime.rstrip().endswith("return ropy;");
+
+def test_dependencies_are_kept():
+    # all() checks its items with truthy()
+    assert get_members(runtime_util.build_runtime({ "ropy.all" })) == { "all", "truthy" };
+
+def test_folder_runtime_has_what_the_outputs_use(tmp_path):
+    os.makedirs(str(tmp_path / "ropy"));
+
+    with open(str(tmp_path / "ropy" / "main.py"), "w") as f:
+        f.write("print(input() in input())\n");
+
+    transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"));
+
+    with open(str(tmp_path / "src" / "ropy.lua")) as f:
+        assert get_members(f.read()) == { "operator_in" };
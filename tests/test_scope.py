@@ -0,0 +1,65 @@
+from src.roblox_py import api
+from src.roblox_py.util import scope as scope_util
+
+import ast
+
+# A module level string that the name is bound to again somewhere else
+header = "s = \"abc\"\nlists = [[1], [2, 3]]\n";
+
+def transpile(source: str) -> str:
+    luau, diagnostics = api.transpile(header + source);
+    assert diagnostics == [];
+
+    return luau;
+
+# The type s has in the first function of the module
+def get_function_type(source: str) -> str | None:
+    table = scope_util.analyse(ast.parse(header + source));
+
+    return table.module.children[0].get_type("s");
+
+def test_module_string():
+    assert "utf8.len(s)" in transpile("print(len(s))\n");
+
+def test_comprehension_target():
+    luau = transpile("a = [len(s) for s in lists]\n");
+    assert "utf8.len" not in luau;
+
+def test_nested_comprehension_target():
+    luau = transpile("a = [len(s) for t in lists for s in t if len(s)]\n");
+    assert "utf8.len" not in luau;
+
+def test_generator_target():
+    luau = transpile("b = sum(len(s) for s in lists)\n");
+    assert "utf8.len" not in luau;
+
+def test_lambda_parameter():
+    luau = transpile("f = lambda s: len(s)\n");
+    assert "utf8.len" not in luau;
+
+def test_comprehension_outside_name():
+    luau = transpile("a = [len(s) for x in lists]\n");
+    assert "utf8.len(s)" in luau;
+
+def test_with_target():
+    assert get_function_type("def f():\n    with open(\"x\") as s:\n        return len(s)\n") is None;
+
+def test_except_name():
+    assert get_function_type("def f():\n    try:\n        pass\n    except Exception as s:\n        return len(s)\n") is None;
+
+def test_import():
+    assert get_function_type("def f():\n    import s\n    return len(s)\n") is None;
+
+def test_import_from():
+    assert get_function_type("def f():\n    from x import y as s\n    return len(s)\n") is None;
+
+def test_outer_type():
+    assert get_function_type("def f():\n    return len(s)\n") == "str";
+
+def test_assigned_parameters_are_not_declared_again():
+    luau = transpile("def f(n, m):\n    if n:\n        n = n + 1\n    m = 2\n    return n + m\nprint(f(1, 2))\n");
+
+    assert "local n" not in luau;
+    assert "local m" not in luau;
+    assert "\t\tn = n+1\n" in luau;
+    assert "\tm = 2\n" in luau;
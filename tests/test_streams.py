@@ -0,0 +1,60 @@
+import io
+import tarfile
+
+from src.roblox_py.transpiler import streams
+
+def make_tar(files: dict[str, str]) -> io.BytesIO:
+    data = io.BytesIO();
+
+    with tarfile.open(fileobj=data, mode="w") as archive:
+        for name in files:
+            streams.add_file(archive, name, files[name]);
+
+    data.seek(0);
+
+    return data;
+
+def read_tar(data: bytes) -> dict[str, str]:
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r") as archive:
+        return { member.name: archive.extractfile(member).read().decode("utf-8") for member in archive };
+
+def test_stdin_to_stdout():
+    output = io.StringIO();
+    errors = io.StringIO();
+
+    assert streams.transpile_stdin(io.StringIO("x = 1\nprint(x)\n"), output, errors) == 0;
+    assert output.getvalue() == "local x = 1\nprint(x)\n";
+    assert errors.getvalue() == "";
+
+def test_stdin_errors():
+    output = io.StringIO();
+    errors = io.StringIO();
+
+    assert streams.transpile_stdin(io.StringIO("x = (\n"), output, errors) == 1;
+    assert output.getvalue() == "";
+    assert errors.getvalue().startswith("Error parsing file");
+
+def test_tar_round_trip():
+    for workers in [1, 2]:
+        output = io.BytesIO();
+        errors = io.StringIO();
+        sources = { "server/main.server.py": "print(input() in input())\n", "shared/util.py": "def f(x):\n    return x\n", "README.md": "not python" };
+
+        assert streams.transpile_tar(make_tar(sources), output, errors, workers) == 0;
+
+        files = read_tar(output.getvalue());
+
+        assert sorted(files) == ["ropy.lua", "server/main.server.lua", "shared/util.lua"];
+        assert "ropy.operator_in" in files["server/main.server.lua"];
+        assert "function f(x)" in files["shared/util.lua"];
+        # ropy.lua comes last, with what the outputs use
+        assert list(files)[-1] == "ropy.lua";
+        assert "ropy.operator_in = " in files["ropy.lua"];
+
+def test_tar_reports_failed_files():
+    output = io.BytesIO();
+    errors = io.StringIO();
+
+    assert streams.transpile_tar(make_tar({ "a.py": "x = (\n", "b.py": "print(1)\n" }), output, errors) == 1;
+    assert errors.getvalue().startswith("a.py: ");
+    assert sorted(read_tar(output.getvalue())) == ["b.lua", "ropy.lua"];
@@ -0,0 +1,18 @@
+from src.roblox_py.util import strings as strings_util
+from src.roblox_py import api
+
+def test_escapes():
+    assert strings_util.to_luau_string("say \"hi\"\n") == "\"say \\\"hi\\\"\\n\"";
+
+def test_control_characters():
+    assert strings_util.to_luau_string("\x07") == "\"\\007\"";
+    assert strings_util.to_luau_string("\x1b[0m") == "\"\\027[0m\"";
+    assert strings_util.to_luau_string("\x7f") == "\"\\127\"";
+
+def test_control_character_before_digit():
+    assert strings_util.to_luau_string("\x075") == "\"\\0075\"";
+    assert strings_util.to_luau_string("\x001") == "\"\\0001\"";
+
+def test_folded_control_character():
+    luau, diagnostics = api.transpile("x = \"\\x07\" + \"5\"\n");
+    assert "\"\\0075\"" in luau;
@@ -0,0 +1,27 @@
+from src.roblox_py.transpiler import transpiler
+
+def transpile(source: str) -> str:
+    attempt = transpiler.transpile_source(source, "main.server.py", options={ "dead_code": False, "inline_budget": 0 });
+    assert "error" not in attempt, attempt.get("error");
+
+    return attempt["result"];
+
+def test_docstrings_keep_the_return_type():
+    luau = transpile("def f(n: int) -> int:\n    \"\"\"Doubles n\"\"\"\n    return n * 2\n");
+
+    assert "function f(n: number, _ropy_help: string?): number\n" in luau;
+    assert "return (\"Doubles n\" :: any)" in luau;
+
+def test_docstrings_of_functions_returning_nothing():
+    luau = transpile("def f(n: int) -> None:\n    \"\"\"Prints n\"\"\"\n    print(n)\n");
+
+    assert "function f(n: number, _ropy_help: string?)\n" in luau;
+
+def test_parameters_with_defaults_are_optional():
+    luau = transpile("def f(part: Part = None, count: int = 2, name: str | None = None, first: int = 0):\n    print(part, count, name, first)\n");
+
+    assert "function f(part: Part?, count: number?, name: string?, first: number?)" in luau;
+
+    luau = transpile("def f(a: int, b: int = 1):\n    print(a, b)\n");
+
+    assert "function f(a: number, b: number?)" in luau;
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+from typing import Callable
+
+from src.roblox_py.transpiler import transpiler
+from src.roblox_py.transpiler import manifest as manifest_util
+from src.roblox_py.transpiler import watch
+
+def write(path: str, text: str) -> None:
+    with open(path, "w") as f:
+        f.write(text);
+
+# Build the folder like watch() does first, returns the source, its output and the manifest
+def start(tmp_path) -> tuple[str, str, dict]:
+    os.makedirs(str(tmp_path / "ropy"));
+    source = str(tmp_path / "ropy" / "main.py");
+    write(source, "print(1)\n");
+
+    manifest_path = str(tmp_path / "manifest.json");
+    transpiler.transpile_folder(str(tmp_path / "ropy"), str(tmp_path / "src"), 1, manifest_path);
+
+    return (source, str(tmp_path / "src" / "main.lua"), manifest_util.load_manifest(manifest_path, str(tmp_path / "src"), {}));
+
+def check_rebuild(tmp_path, get_watcher: Callable) -> None:
+    source, output, manifest = start(tmp_path);
+    watcher = get_watcher(str(tmp_path / "ropy"));
+
+    try:
+        write(source, "print(22)\n");
+        changed = watcher.wait(5);
+    finally:
+        watcher.close();
+
+    assert source in changed;
+
+    reports = watch.transpile_changes(changed, str(tmp_path / "ropy"), str(tmp_path / "src"), manifest);
+
+    assert reports[source]["status"] == "transpiled";
+    assert open(output).read() == "print(22)\n";
+
+    # Saved again without changes, nothing to do
+    assert watch.transpile_changes(changed, str(tmp_path / "ropy"), str(tmp_path / "src"), manifest) == {};
+
+def test_polling_rebuilds_on_modify(tmp_path):
+    check_rebuild(tmp_path, lambda folder: watch.PollingWatcher(folder, 0.01));
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_rebuilds_on_modify(tmp_path):
+    check_rebuild(tmp_path, watch.InotifyWatcher);
+
+def test_removed_sources_take_their_output(tmp_path):
+    source, output, manifest = start(tmp_path);
+    os.remove(source);
+
+    reports = watch.transpile_changes({ source }, str(tmp_path / "ropy"), str(tmp_path / "src"), manifest);
+
+    assert reports[source]["status"] == "removed";
+    assert not os.path.exists(output);
+    assert source not in manifest["files"];